@@ -1,354 +1,941 @@
-import streamlit as st
-import requests
-import base64
-import json
-import io
-from gtts import gTTS
-from duckduckgo_search import DDGS
-import speech_recognition as sr
-
-
-# --- Constants ---
-OLLAMA_HOST = "http://192.168.0.119:11434"  # Replace with your Ollama server address
-OLLAMA_MODEL = "llama3.2-vision"
-SYSTEM_PROMPT = """
-You are an expert analyst. Analyze the given information and question.
-Provide a response in JSON format with the following keys:
-
-- "probability": A percentage (0-100) indicating the likelihood of "yes" (should do/buy) vs. "no" (should not do/buy).
-                   Higher percentage means "yes", lower percentage means "no".
-- "reason": A concise explanation of your analysis and reasoning, citing sources if applicable.
-
-Example:
-{"probability": 75, "reason": "Based on the current market trends and expert opinions, the stock shows strong potential for growth."}
-"""
-
-
-# --- Helper Functions ---
-
-def text_to_speech(text, language="en"):
-    """Converts text to speech using gTTS and returns bytes."""
-    try:
-        tts = gTTS(text=text, lang=language, slow=False)
-        buffer = io.BytesIO()
-        tts.write_to_fp(buffer)
-        buffer.seek(0)
-        return buffer.read()
-    except Exception as e:
-        st.error(f"gTTS Error: {e}")
-        return None
-
-def encode_image(image_bytes):
-    """Encodes image bytes to base64."""
-    return base64.b64encode(image_bytes).decode("utf-8")
-
-def perform_ddg_search(query, max_results=3):
-    """Performs DuckDuckGo search and returns concatenated results."""
-    try:
-        with DDGS() as ddgs:
-            results = [r["body"] for r in ddgs.text(query, max_results=max_results)]
-        return "\n\n".join(results)
-    except Exception as e:
-        st.error(f"DuckDuckGo Search Error: {e}")
-        return ""
-
-def call_ollama_api(messages, stream=False, format="json"):
-    """Calls the Ollama API with the given messages."""
-    data = {
-        "model": OLLAMA_MODEL,
-        "messages": messages,
-        "stream": stream,
-        "format": format,
-        "options": {
-            "temperature": st.session_state.temperature,
-            "num_predict": st.session_state.max_tokens,
-        }
-    }
-    try:
-        response = requests.post(f"{OLLAMA_HOST}/api/chat", json=data)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"Ollama API Error: {e}")
-        return None
-
-def transcribe_audio(language_code):
-    """Transcribes audio from the microphone using speech_recognition."""
-    r = sr.Recognizer()
-    with sr.Microphone() as source:
-        st.toast("Listening...", icon="🎙️")
-        audio = r.listen(source, timeout=5, phrase_time_limit=10)
-        st.toast("Processing...", icon="⏳")
-        try:
-            text = r.recognize_google(audio, language=language_code)
-            return text
-        except sr.UnknownValueError:
-            st.warning("Could not understand audio")
-            return None
-        except sr.RequestError as e:
-            st.error(f"Could not request results from Google Speech Recognition; {e}")
-            return None
-
-
-# --- Analysis Functions ---
-
-def analyze_image(image_data, question, language):
-    """Analyzes image and question using Ollama and returns probability, reason, and audio."""
-    search_results = perform_ddg_search(question, max_results=2)
-    combined_input = f"{question}\n\nRelevant information:\n{search_results}"
-
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": combined_input, "images": [image_data]},
-    ]
-    response_json = call_ollama_api(messages)
-    if response_json:
-        return process_ollama_response(response_json, language)
-    else:
-        return None, "Error: Ollama API call failed.", None
-
-def analyze_text(question, language):
-    """Analyzes text question using Ollama and returns probability, reason, and audio."""
-    search_results = perform_ddg_search(question)
-    combined_input = f"{question}\n\nRelevant information:\n{search_results}"
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": combined_input},
-    ]
-    response_json = call_ollama_api(messages)
-    if response_json:
-        return process_ollama_response(response_json, language)
-    else:
-        return None, "Error: Ollama API call failed.", None
-
-
-def process_ollama_response(response_json, language):
-    """Processes the Ollama API response, extracts data, and generates TTS."""
-    try:
-        content_str = response_json['message']['content']
-        content_json = json.loads(content_str)
-        probability = content_json.get("probability", None)
-        reason = content_json.get("reason", None)
-
-        if probability is not None and not (0 <= probability <= 100):
-            raise ValueError("Probability is not within the range 0-100")
-
-        audio_bytes = text_to_speech(reason, language) if reason else None
-
-        return probability, reason, audio_bytes
-    except (json.JSONDecodeError, KeyError, ValueError) as e:
-        st.error(f"Error processing Ollama response: {e}")
-        return None, "Error: Invalid response from Ollama.", None
-
-
-# --- Streamlit App ---
-
-st.set_page_config(page_title="Should I...?", page_icon="🤔", layout="wide")
-
-# --- Custom CSS ---
-st.markdown("""
-<style>
-/* (Your CSS styles here -  from the previous response,  unchanged) */
-/* Main container */
-.main {
-    padding: 2rem;
-    font-family: sans-serif; /* Modern font */
-}
-
-/* Title */
-.title {
-    font-size: 3rem;
-    font-weight: bold;
-    margin-bottom: 1rem;
-    color: #333;  /* Darker title color */
-}
-
-/* Subtitle/Description */
-.subtitle {
-    font-size: 1.25rem;
-    color: #555;
-    margin-bottom: 2rem;
-}
-
-/* Input area */
-.stTextInput, .stFileUploader, .stCameraInput, .stRadio {
-    margin-bottom: 1rem;
-}
-
-/* Buttons */
-.stButton>button {
-    background-color: #007bff; /* Primary blue color */
-    color: white;
-    border: none;
-    padding: 0.75rem 1.5rem;
-    border-radius: 0.5rem; /* Rounded corners */
-    font-weight: bold;
-    transition: background-color 0.2s ease; /* Smooth hover effect */
-}
-.stButton>button:hover {
-    background-color: #0056b3; /* Darker blue on hover */
-}
-.stButton>button:focus {
-    outline: none;  /* Remove the focus outline */
-    box-shadow: 0 0 0 3px rgba(0, 123, 255, 0.25); /* Add a subtle focus ring */
-}
-
-/* Radio buttons */
-.stRadio > div > label { /* Target radio button labels */
-  margin-right: 1rem; /* Add spacing */
-  padding: 0.5rem 1rem;
-  border-radius: 0.5rem; /* Rounded */
-  border: 1px solid #ccc;
-  transition: all 0.2s ease;  /* Smooth transition */
-}
-/* Style the selected radio option */
-.stRadio > div > label[data-baseweb="radio"] > div:first-child {
-    background-color: #007bff !important;  /* Override to ensure color */
-    border-color: #007bff !important;
-}
-.stRadio > div > label[data-baseweb="radio"] {
-    background-color: #f0f2f6;
-    border-color: #f0f2f6;
-}
-
-
-/* Result area */
-.result-area {
-    padding: 1.5rem;
-    border-radius: 0.75rem;
-    background-color: #f8f9fa; /* Light background */
-    border: 1px solid #e9ecef;  /* Subtle border */
-}
-
-/* Success/Error messages */
-.st-success, .st-error {
-    padding: 1rem;
-    border-radius: 0.5rem;
-    margin-bottom: 1rem;
-    font-weight: bold;
-    color: white;
-    display: flex;
-    align-items: center;
-}
-.st-success {
-    background-color: #28a745; /* Green */
-}
-.st-error {
-    background-color: #dc3545; /* Red */
-}
-.st-success svg, .st-error svg { /* Icons within success/error */
-    margin-right: 0.5rem;  /* Space the icon */
-    font-size: 1.2em;
-}
-
-
-/* Expander */
-.st-expander {
-  border: none !important; /* No borders */
-}
-.st-expanderHeader {
-    font-weight: bold;
-    background-color: transparent;
-    padding: 0.5rem 0;
-}
-.st-expanderContent {
-    padding: 0.5rem 0;
-}
-
-/* Gauge/Progress */
-.stProgress > div > div > div > div {
-    background-color: #007bff; /* Consistent blue */
-}
-
-/* Sidebar */
-.sidebar .sidebar-content {
-    padding: 1rem;
-    background-color: #f0f2f6; /* Lighter background */
-}
-</style>
-""", unsafe_allow_html=True)
-
-# --- Session State ---
-if "language" not in st.session_state:
-    st.session_state["language"] = "en"
-if "max_tokens" not in st.session_state:
-    st.session_state["max_tokens"] = 256
-if "temperature" not in st.session_state:
-    st.session_state["temperature"] = 0.7
-
-# --- Sidebar ---
-with st.sidebar:
-    st.header("⚙️ Settings")
-    st.session_state.language = st.selectbox("Language", ["en", "ko", "ja", "zh-CN", "fr", "de"], index=0)
-    language_code = st.session_state.language.split("-")[0]
-
-    with st.expander("LLM Settings"):
-        st.session_state.max_tokens = st.slider("Max Tokens", 1, 2048, 256, 1)
-        st.session_state.temperature = st.slider("Temperature", 0.1, 4.0, 0.7, 0.1)
-
-# --- Main App ---
-st.markdown("<h1 class='title'>Should I...? 🤔</h1>", unsafe_allow_html=True)
-st.markdown("<p class='subtitle'>Ask a question and get a probability-based analysis!</p>", unsafe_allow_html=True)
-
-col1, col2 = st.columns([3, 1])
-
-with col1:
-    input_type = st.radio("Input Type", ["Text", "Voice", "Upload Image", "Take Photo"], horizontal=True)
-    question = ""  # Initialize question outside the conditional blocks
-
-    if input_type == "Text":
-        question = st.text_input("Ask a question:", placeholder="e.g., Should I buy this stock?")
-
-    elif input_type == "Voice":
-        if st.button("🎤 Record Question"):
-            question = transcribe_audio(language_code)
-            if question:
-                st.write("You said:", question)
-
-    uploaded_image = None
-    camera_image = None
-
-    if input_type == "Upload Image":
-        uploaded_image = st.file_uploader("Upload Image", type=["jpg", "jpeg", "png"], label_visibility='collapsed')
-
-    elif input_type == "Take Photo":
-        camera_image = st.camera_input("Take Photo", label_visibility="collapsed")
-
-    if st.button("Analyze", type="primary", use_container_width=True):
-        if not question and input_type in ("Text", "Voice") and not uploaded_image and not camera_image:
-            st.warning("Please enter a question, record audio, or upload/take an image.")
-        else: # No need to use continue. Use else.
-            with st.spinner("Analyzing..."):
-                if input_type in ("Text", "Voice") and question:
-                    probability, reason, audio = analyze_text(question, st.session_state.language)
-
-                elif input_type == "Upload Image" and uploaded_image:
-                    image_bytes = uploaded_image.getvalue()
-                    image_base64 = encode_image(image_bytes)
-                    probability, reason, audio = analyze_image(image_base64, question, st.session_state.language)
-
-                elif input_type == "Take Photo" and camera_image:
-                    image_bytes = camera_image.getvalue()
-                    image_base64 = encode_image(image_bytes)
-                    probability, reason, audio = analyze_image(image_base64, question, st.session_state.language)
-
-                else:
-                    probability, reason, audio = None, "No input provided.", None  # Handle no input case
-
-                with col2:
-                    if probability is not None and reason:
-                        st.subheader("Analysis Result")
-                        with st.container(border=True):
-                            if probability >= 50:
-                                st.success(f"✅ Yes! ({probability}%)")
-                                #st.balloons() # Moved outside, so no conflict.
-
-                            else:
-                                st.error(f"❌ No! ({probability}%)")
-                            st.progress(probability / 100.0)
-                            with st.expander("Reason", expanded=True):
-                                st.markdown(reason)
-                            if audio:
-                                st.audio(audio, format="audio/mp3")
-                    elif reason:  # Display error message
-                        st.error(reason)
\ No newline at end of file
+import streamlit as st
+import requests
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from duckduckgo_search import DDGS
+import speech_recognition as sr
+from context_packer import pack_context, context_budget
+from local_index import LocalIndex, split_passages
+from vector_index import VectorIndex, index_version
+from deep_search import fetch_page_texts
+from image_prep import wire_bytes, prepare_image
+from image_worker import ImageWorkerPool, ImagePoolBusy
+from ocr_route import log_route, report as ocr_route_report
+from tts_engines import report as tts_engine_report
+from search_gate import needs_search, log_decision, report as search_gate_report
+from ollama_payload import EncodedImage
+from ollama_pool import BackendPool
+from document_analysis import iter_pdf_pages, chunk_pages, chunk_budget, map_chunks, reduce_findings, DOC_NUM_CTX
+from speech import SpeechJob, SentenceSpeech, JsonStringField, VerdictClips, json_number, clip_player_html, TTS_MODE, TTS_WORKERS, BROWSER_TTS_DIR
+
+
+# --- Constants ---
+OLLAMA_HOST = "http://192.168.0.119:11434"  # Replace with your Ollama server address
+OLLAMA_HOSTS = os.environ.get("OLLAMA_HOSTS", OLLAMA_HOST).split(",")  # Comma-separated; gallery analyses spread over these
+OLLAMA_MODEL = "llama3.2-vision"
+OLLAMA_TEXT_MODEL = "llama3.2"  # Fast text-only model for the OCR path
+LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR", "local_index")  # python local_index.py build <docs_dir>
+VECTOR_INDEX_DIR = os.environ.get("VECTOR_INDEX_DIR", "vector_index")  # python vector_index.py build <docs_dir>
+GALLERY_COLUMNS = 3
+GALLERY_MAX_THREADS = 16
+SYSTEM_PROMPT = """
+You are an expert analyst. Analyze the given information and question.
+Provide a response in JSON format with the following keys:
+
+- "probability": A percentage (0-100) indicating the likelihood of "yes" (should do/buy) vs. "no" (should not do/buy).
+                   Higher percentage means "yes", lower percentage means "no".
+- "spoken_summary" (optional): The verdict and its main reason in one short sentence, to be read aloud.
+- "reason": A concise explanation of your analysis and reasoning, citing sources if applicable.
+
+Example:
+{"probability": 75, "spoken_summary": "Yes, the stock looks set to keep growing.", "reason": "Based on the current market trends and expert opinions, the stock shows strong potential for growth."}
+"""
+
+
+# --- Helper Functions ---
+
+@st.cache_resource
+def load_speech_executor():
+    """Background TTS threads, shared by every session in the server process."""
+    return ThreadPoolExecutor(max_workers=TTS_WORKERS)
+
+def start_speech(text, language, speech=None):
+    """Creates the speech job for a result and starts it as TTS_MODE says (None if there is no text).
+
+    speech is the sentence pipeline a streamed answer has already started (pipelined mode).
+    """
+    if not text:
+        return None
+    if TTS_MODE == "pipelined":
+        return (speech or SentenceSpeech(language, load_speech_executor())).finish(text)
+    speech = SpeechJob(text, language)
+    if TTS_MODE == "eager":
+        speech.start()
+    elif TTS_MODE == "background":
+        speech.start(load_speech_executor())
+    return speech
+
+def play_speech(speech):
+    """Shows the audio player once the speech is ready, or a Listen button if it was never started
+    (in browser mode the browser reads it aloud instead)."""
+    if speech is None:
+        return
+    if isinstance(speech, SentenceSpeech):
+        try:
+            with st.spinner("Preparing audio..."):
+                queue_clips(speech, speech.clips())
+        except Exception as e:
+            st.error(f"TTS Error: {e}")
+            return
+        st.audio(speech.audio(), format="audio/mp3")
+        st.caption(f"First audio after {speech.first_audio_ms / 1000:.1f} s ({len(speech.sentences)} sentences)")
+        return
+    if not speech.started:
+        if TTS_MODE == "browser":
+            browser_speech(speech)
+        else:
+            listen_button(speech)
+        return
+    try:
+        with st.spinner("Preparing audio..."):
+            audio = speech.audio()
+    except Exception as e:
+        st.error(f"TTS Error: {e}")
+        return
+    st.audio(audio, format="audio/mp3")
+    st.caption(f"Speech synthesized in {speech.synth_ms / 1000:.1f} s by {speech.engine} (real-time factor {speech.rtf:.2f})")
+
+@st.cache_resource
+def load_verdict_clips():
+    """Pre-rendered verdict clips, shared by every session; missing languages render on the TTS threads."""
+    return VerdictClips(executor=load_speech_executor())
+
+def queue_verdict(speech, probability, language):
+    """Plays the verdict ("Yes, 75 percent") right away, ahead of the spoken summary or reason."""
+    clip = load_verdict_clips().verdict(language, probability)
+    if clip and speech is not None:
+        st.components.v1.html(clip_player_html(speech.id, None, clip), height=0)
+
+def queue_clips(speech, clips):
+    """Hands finished clips to the page's Web Audio queue, which plays them back to back."""
+    for index, clip in clips:
+        st.components.v1.html(clip_player_html(speech.id, index, clip), height=0)
+
+@st.fragment
+def listen_button(speech):
+    """Synthesizes on click; only this fragment reruns, so the result stays on screen."""
+    if st.button("🔊 Listen", key=f"listen_{id(speech)}"):
+        play_speech(speech.start())
+
+browser_tts = st.components.v1.declare_component("browser_tts", path=BROWSER_TTS_DIR)
+
+@st.fragment
+def browser_speech(speech):
+    """Reads the text aloud with the browser's Web Speech API; server TTS only if the browser has no voice for the language."""
+    spoken = browser_tts(id=speech.id, text=speech.text, language=speech.language, rate=st.session_state.speech_rate,
+                         voice=st.session_state.browser_voice, key=f"browser_tts_{speech.id}", default=None)
+    if spoken is None:  # the browser has not answered yet
+        return
+    if spoken["voices"]:
+        st.session_state.browser_voices = spoken["voices"]
+    if spoken["voice"]:
+        st.caption(f"Read aloud by the browser ({spoken['voice']})")
+    else:
+        play_speech(speech.start())
+
+def encode_image(image_bytes):
+    """Encodes image bytes to base64 once, into a preallocated buffer (no intermediate str)."""
+    return EncodedImage(image_bytes)
+
+def preprocess_image(image_bytes, crop=None):
+    """Starts shrinking (and cropping) the image to the model's tile geometry in the worker pool (if enabled).
+
+    Returns a job for finish_preprocess; the caller can do other work (e.g. search) meanwhile.
+    """
+    size = wire_bytes(len(image_bytes))
+    st.session_state.image_stats = {"wire_bytes_in": size, "wire_bytes_out": size, "encode_ms": 0.0}
+    if not st.session_state.optimize_images:
+        return image_bytes, None, crop
+    try:
+        return image_bytes, load_image_pool().submit(image_bytes, OLLAMA_MODEL, crop=crop), crop
+    except ImagePoolBusy:
+        st.toast("Image workers are busy; sending the image without optimization.")
+        return image_bytes, None, crop
+    except BrokenProcessPool:
+        return prepare_here(image_bytes, crop), None, crop
+
+def finish_preprocess(image_job):
+    """Waits for the worker and returns the bytes to send (the original if preprocessing failed)."""
+    image_bytes, future, crop = image_job
+    if future is None:
+        return image_bytes
+    try:
+        processed, st.session_state.image_stats = future.result()
+    except BrokenProcessPool:
+        return prepare_here(image_bytes, crop)
+    except Exception as e:  # any error inside the worker (e.g. DecompressionBombError): send the original
+        st.error(f"Image preprocessing error: {e}")
+        return image_bytes
+    st.session_state.tiles_saved += st.session_state.image_stats["tiles_uncropped"] - st.session_state.image_stats["tiles"]
+    return processed
+
+def prepare_here(image_bytes, crop):
+    """Fallback when the image worker pool died: drops the cached pool (the next upload starts a new
+    one) and preprocesses this image on the script thread."""
+    load_image_pool.clear()
+    st.toast("The image workers stopped; preprocessing this image here.")
+    try:
+        processed, st.session_state.image_stats = prepare_image(image_bytes, OLLAMA_MODEL, crop=crop)
+    except Exception as e:
+        st.error(f"Image preprocessing error: {e}")
+        return image_bytes
+    st.session_state.tiles_saved += st.session_state.image_stats["tiles_uncropped"] - st.session_state.image_stats["tiles"]
+    return processed
+
+@st.cache_resource
+def load_image_pool():
+    """Starts the image worker processes once per server process; every session shares them."""
+    pool = ImageWorkerPool()
+    pool.warm()
+    return pool
+
+def start_ocr(image_bytes):
+    """Starts OCR of a text-heavy image in the worker pool (if the fast path is enabled)."""
+    if not st.session_state.ocr_fast_path:
+        return None
+    try:
+        return load_image_pool().read_text(image_bytes)
+    except ImagePoolBusy:
+        return None
+    except BrokenProcessPool:
+        load_image_pool.clear()
+        return None
+
+def finish_ocr(ocr_job):
+    """Returns the OCR text if it is confident enough to skip the vision model, else None."""
+    if ocr_job is None:
+        return None
+    try:
+        result = ocr_job.result()
+    except BrokenProcessPool:
+        load_image_pool.clear()
+        return None
+    except Exception:  # OCR is only a shortcut; the vision model reads the image instead
+        return None
+    st.session_state.ocr_stats = result
+    return result["text"]
+
+def perform_ddg_search(query, max_results=3):
+    """Performs DuckDuckGo search and returns concatenated results."""
+    try:
+        with DDGS() as ddgs:
+            hits = list(ddgs.text(query, max_results=max_results))
+        results = [r["body"] for r in hits]
+        if st.session_state.deep_search:
+            pages, _ = fetch_page_texts([r["href"] for r in hits if r.get("href")])
+            results += [passage for _, text in pages for passage in split_passages(text)]
+        context, stats = pack_context(query, results, context_budget(OLLAMA_MODEL))
+        st.session_state.context_stats = stats
+        return context
+    except Exception as e:
+        st.error(f"DuckDuckGo Search Error: {e}")
+        return ""
+
+@st.cache_resource
+def load_local_index(index_dir, version):
+    """Opens the memory-mapped local index once per process (version busts the cache after rebuilds)."""
+    return LocalIndex(index_dir)
+
+def perform_local_search(query, max_results=5):
+    """Searches the local document index and returns packed passages."""
+    manifest = os.path.join(LOCAL_INDEX_DIR, "manifest.json")
+    if not query or not os.path.exists(manifest):
+        return ""
+    index = load_local_index(LOCAL_INDEX_DIR, os.path.getmtime(manifest))
+    context, stats = pack_context(query, index.context_for(query, k=max_results), context_budget(OLLAMA_MODEL))
+    st.session_state.context_stats = stats
+    return context
+
+@st.cache_resource
+def load_vector_index(index_dir, version):
+    """Opens the memory-mapped embedding matrix once per process (version: index_version, so any index rewrite busts the cache)."""
+    return VectorIndex(index_dir)
+
+def perform_vector_search(query, max_results=5):
+    """Retrieves semantically similar chunks from the local vector index."""
+    meta = os.path.join(VECTOR_INDEX_DIR, "meta.json")
+    if not query or not os.path.exists(meta):
+        return ""
+    try:
+        index = load_vector_index(VECTOR_INDEX_DIR, index_version(VECTOR_INDEX_DIR))
+        chunks = index.search(OLLAMA_HOST, query, k=max_results)
+    except requests.exceptions.RequestException as e:
+        st.error(f"Ollama API Error: {e}")
+        return ""
+    context, stats = pack_context(query, chunks, context_budget(OLLAMA_MODEL))
+    st.session_state.context_stats = stats
+    return context
+
+def search_context(query, max_results=3):
+    """Returns search context from the selected source, falling back to local documents offline."""
+    if st.session_state.search_source == "local":
+        return perform_local_search(query)
+    if st.session_state.search_source == "vector":
+        return perform_vector_search(query)
+    return perform_ddg_search(query, max_results) or perform_local_search(query)
+
+def chat_request(messages, stream=False, format="json", model=OLLAMA_MODEL):
+    """Builds the /api/chat body, reading the generation options from the session."""
+    return {
+        "model": model,
+        "messages": messages,
+        "stream": stream,
+        "format": format,
+        "options": {
+            "temperature": st.session_state.temperature,
+            "num_predict": st.session_state.max_tokens,
+        }
+    }
+
+def call_ollama_api(messages, stream=False, format="json", model=OLLAMA_MODEL, host=None, options=None):
+    """Calls the Ollama API with the given messages (on host, if the conversation is pinned).
+
+    options are added to the session's generation options (e.g. num_ctx).
+    """
+    data = chat_request(messages, stream, format, model)
+    data["options"].update(options or {})
+    try:
+        if TTS_MODE == "pipelined" and format == "json":
+            return stream_with_speech(data, host)
+        # The body is streamed from the image buffers instead of being built with json=data.
+        return load_backend_pool().chat(data, host)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        st.error(f"Ollama API Error: {e}")
+        return None
+
+def stream_with_speech(data, host=None):
+    """Streams the answer, plays the verdict as soon as the probability is in and speaks each sentence
+    of the spoken summary (or the reason, if there is none) as soon as the sentence is complete."""
+    speech = SentenceSpeech(st.session_state.language, load_speech_executor())
+    summary, reason = JsonStringField("spoken_summary"), JsonStringField("reason")
+    spoken = None  # the summary, or the reason if it comes first (no summary)
+    probability = None
+    content = []
+    chunk = None
+    data["stream"] = True
+    for chunk in load_backend_pool().chat_stream(data, host):
+        delta = chunk.get("message", {}).get("content", "")
+        content.append(delta)
+        if probability is None:
+            probability = json_number("".join(content), "probability")
+            if probability is not None and 0 <= probability <= 100:
+                queue_verdict(speech, probability, st.session_state.language)
+        summary_text, reason_text = summary.feed(delta), reason.feed(delta)
+        if spoken is None and (summary_text or reason_text):
+            spoken = summary if summary_text else reason
+        speech.feed(summary_text if spoken is summary else reason_text)
+        queue_clips(speech, speech.ready_clips())
+    if chunk is None or not chunk.get("done"):
+        # An empty or cut-off stream is a failed call (handled by call_ollama_api).
+        raise requests.exceptions.RequestException("Ollama stream ended without a final chunk")
+    # The last chunk carries the timings (prompt_eval_duration, ...); it gets the whole message.
+    chunk["message"] = {"role": "assistant", "content": "".join(content)}
+    chunk["speech"] = speech
+    return chunk
+
+@st.cache_resource
+def load_backend_pool():
+    """One backend pool per server process so the per-backend limit holds across sessions."""
+    return BackendPool(OLLAMA_HOSTS)
+
+def transcribe_audio(language_code):
+    """Transcribes audio from the microphone using speech_recognition."""
+    r = sr.Recognizer()
+    with sr.Microphone() as source:
+        st.toast("Listening...", icon="🎙️")
+        audio = r.listen(source, timeout=5, phrase_time_limit=10)
+        st.toast("Processing...", icon="⏳")
+        try:
+            text = r.recognize_google(audio, language=language_code)
+            return text
+        except sr.UnknownValueError:
+            st.warning("Could not understand audio")
+            return None
+        except sr.RequestError as e:
+            st.error(f"Could not request results from Google Speech Recognition; {e}")
+            return None
+
+
+# --- Analysis Functions ---
+
+def analyze_image(image_job, question, language, ocr_job=None):
+    """Analyzes image and question using Ollama and returns probability, reason, and audio.
+
+    Text-heavy images whose OCR reading is confident go to the text model instead (ocr_job).
+    """
+    start = time.perf_counter()
+    search_results = search_context(question, max_results=2)
+    combined_input = f"{question}\n\nRelevant information:\n{search_results}"
+
+    ocr_text = finish_ocr(ocr_job)
+    if ocr_text:
+        route = "ocr"
+        if image_job[1] is not None:
+            image_job[1].cancel()
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"{combined_input}\n\nText in the image:\n{ocr_text}"},
+        ]
+        model = OLLAMA_TEXT_MODEL
+    else:
+        route = "vision"
+        image_data = encode_image(finish_preprocess(image_job))
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": combined_input, "images": [image_data]},
+        ]
+        model = OLLAMA_MODEL
+    host = load_backend_pool().least_busy()
+    response_json = call_ollama_api(messages, model=model, host=host)
+    st.session_state.image_route = route
+    if response_json:
+        log_route(route, (time.perf_counter() - start) * 1000)
+        probability, reason, audio = process_ollama_response(response_json, language)
+        start_conversation(messages, response_json, model, host)
+        record_turn(question, response_json, probability, reason)
+        return probability, reason, audio
+    else:
+        return None, "Error: Ollama API call failed.", None
+
+def start_conversation(messages, response_json, model, host):
+    """Keeps an image analysis as a conversation pinned to the backend holding its prompt cache.
+
+    The encoded image stays in the first user message, so follow-ups neither re-encode it nor
+    change the prompt prefix; Ollama then only prefills the new turn.
+    """
+    st.session_state.conversation = {
+        "messages": messages + [response_json["message"]],
+        "model": model,
+        "host": host,
+        "turns": [],
+    }
+
+def record_turn(question, response_json, probability, reason):
+    """Records a turn with the prefill time and prompt tokens Ollama reports for it."""
+    st.session_state.conversation["turns"].append({
+        "question": question,
+        "probability": probability,
+        "reason": reason,
+        "prefill_ms": response_json.get("prompt_eval_duration", 0) / 1e6,
+        "prompt_tokens": response_json.get("prompt_eval_count", 0),
+    })
+
+def ask_follow_up(question, language):
+    """Asks a follow-up in the current conversation, on the same backend and model."""
+    conversation = st.session_state.conversation
+    messages = conversation["messages"] + [{"role": "user", "content": question}]
+    response_json = call_ollama_api(messages, model=conversation["model"], host=conversation["host"])
+    if not response_json:
+        return None, "Error: Ollama API call failed.", None
+    conversation["messages"] = messages + [response_json["message"]]
+    probability, reason, audio = process_ollama_response(response_json, language)
+    record_turn(question, response_json, probability, reason)
+    return probability, reason, audio
+
+def show_turn(turn):
+    """Shows one conversation turn as a chat exchange."""
+    with st.chat_message("user"):
+        st.write(turn["question"] or "(image)")
+    with st.chat_message("assistant"):
+        if turn["probability"] is not None:
+            st.write(f"**{turn['probability']}%** · {turn['reason']}")
+        st.caption(f"Prefill {turn['prefill_ms']:.0f} ms ({turn['prompt_tokens']} prompt tokens)")
+
+def analyze_text(question, language, search_mode="auto"):
+    """Analyzes text question using Ollama and returns probability, reason, and audio."""
+    searched, decided_by = needs_search(question, search_mode)
+    search_ms = None
+    if searched:
+        start = time.perf_counter()
+        search_results = search_context(question)
+        search_ms = (time.perf_counter() - start) * 1000
+        combined_input = f"{question}\n\nRelevant information:\n{search_results}"
+    else:
+        combined_input = question
+    log_decision(question, searched, decided_by, search_ms)
+    st.session_state.search_decision = (searched, decided_by)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": combined_input},
+    ]
+    response_json = call_ollama_api(messages)
+    if response_json:
+        return process_ollama_response(response_json, language)
+    else:
+        return None, "Error: Ollama API call failed.", None
+
+
+def analyze_document(pdf_bytes, question, language):
+    """Analyzes a PDF by map-reduce: per-chunk findings (cached) are merged against the question."""
+    template = chat_request([], model=OLLAMA_TEXT_MODEL)
+    backends = load_backend_pool()
+    try:
+        chunks = chunk_pages(iter_pdf_pages(pdf_bytes), chunk_budget())
+        findings, doc_stats = map_chunks(chunks, backends.chat, template, backends.capacity)
+        notes, doc_stats["reduce_rounds"] = reduce_findings(findings, question, backends.chat, template,
+                                                            chunk_budget(), backends.capacity)
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+        st.error(f"Document analysis error: {e}")
+        return None, "Error: Document analysis failed.", None
+    st.session_state.document_stats = doc_stats
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"{question}\n\nFindings from the document:\n{notes}"},
+    ]
+    response_json = call_ollama_api(messages, model=OLLAMA_TEXT_MODEL, options={"num_ctx": DOC_NUM_CTX})  # the notes were packed for this context window
+    if response_json:
+        return process_ollama_response(response_json, language)
+    else:
+        return None, "Error: Ollama API call failed.", None
+
+def parse_probability(value):
+    """The model's probability as a number in 0-100; accepts 75, 75.0, "75" and "75%" (raises ValueError otherwise)."""
+    if isinstance(value, str):
+        value = value.strip().rstrip("%")
+    try:
+        probability = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Probability is not a number: {value!r}") from None
+    if not 0 <= probability <= 100:
+        raise ValueError("Probability is not within the range 0-100")
+    return int(probability) if probability.is_integer() else probability
+
+def analyze_gallery_image(backends, images, image_bytes, crop, data):
+    """Runs in a gallery thread (no st calls): preprocesses one image, then analyzes it.
+
+    Returns (probability, reason); probability is None when the analysis failed.
+    """
+    try:
+        if images is not None:
+            try:
+                image_bytes, _ = images.submit(image_bytes, OLLAMA_MODEL, crop=crop, timeout=None).result()
+            except BrokenProcessPool:  # the pool died: preprocess in this thread
+                load_image_pool.clear()
+                image_bytes, _ = prepare_image(image_bytes, OLLAMA_MODEL, crop=crop)
+        system, user = data["messages"]
+        response_json = backends.chat({**data, "messages": [system, {**user, "images": [EncodedImage(image_bytes)]}]})
+        content_json = json.loads(response_json["message"]["content"])
+        return parse_probability(content_json.get("probability")), content_json.get("reason")
+    except (requests.exceptions.RequestException, OSError, ValueError, KeyError) as e:
+        return None, f"Error: {e}"
+
+def analyze_gallery(files, question, crop):
+    """Analyzes the images concurrently (bounded per backend) and fills a grid as results arrive.
+
+    Returns [(name, probability, reason)] ranked by probability, highest first.
+    """
+    search_results = search_context(question, max_results=2)
+    data = chat_request([
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"{question}\n\nRelevant information:\n{search_results}"},
+    ])
+    images = load_image_pool() if st.session_state.optimize_images else None
+    backends = load_backend_pool()
+
+    columns = st.columns(GALLERY_COLUMNS)
+    slots = []
+    for index, file in enumerate(files):
+        with columns[index % GALLERY_COLUMNS]:
+            st.image(file.getvalue(), caption=file.name, use_container_width=True)
+            slots.append(st.empty())
+            slots[index].caption("Waiting...")
+
+    results = []
+    # Threads beyond the backends' capacity just wait for a slot; the pools enforce the limits.
+    with ThreadPoolExecutor(max_workers=min(len(files), GALLERY_MAX_THREADS)) as executor:
+        futures = {executor.submit(analyze_gallery_image, backends, images, file.getvalue(), crop, data): index
+                   for index, file in enumerate(files)}
+        for future in as_completed(futures):
+            index = futures[future]
+            probability, reason = future.result()
+            with slots[index].container():
+                if probability is None:
+                    st.error(reason)
+                else:
+                    if probability >= 50:
+                        st.success(f"✅ Yes ({probability}%)")
+                    else:
+                        st.error(f"❌ No ({probability}%)")
+                    st.caption(reason)
+            results.append((files[index].name, probability, reason))
+    return sorted(results, key=lambda r: -1 if r[1] is None else r[1], reverse=True)
+
+
+def process_ollama_response(response_json, language):
+    """Processes the Ollama API response and extracts data; speech is only started (see TTS_MODE)."""
+    try:
+        content_str = response_json['message']['content']
+        content_json = json.loads(content_str)
+        probability = content_json.get("probability", None)
+        reason = content_json.get("reason", None)
+        summary = content_json.get("spoken_summary") or reason
+
+        if probability is not None:
+            probability = parse_probability(probability)
+
+        return probability, reason, start_speech(summary, language, response_json.get("speech"))
+    except (json.JSONDecodeError, KeyError, ValueError) as e:
+        st.error(f"Error processing Ollama response: {e}")
+        return None, "Error: Invalid response from Ollama.", None
+
+
+# --- Streamlit App ---
+
+st.set_page_config(page_title="Should I...?", page_icon="🤔", layout="wide")
+
+# --- Custom CSS ---
+st.markdown("""
+<style>
+/* (Your CSS styles here -  from the previous response,  unchanged) */
+/* Main container */
+.main {
+    padding: 2rem;
+    font-family: sans-serif; /* Modern font */
+}
+
+/* Title */
+.title {
+    font-size: 3rem;
+    font-weight: bold;
+    margin-bottom: 1rem;
+    color: #333;  /* Darker title color */
+}
+
+/* Subtitle/Description */
+.subtitle {
+    font-size: 1.25rem;
+    color: #555;
+    margin-bottom: 2rem;
+}
+
+/* Input area */
+.stTextInput, .stFileUploader, .stCameraInput, .stRadio {
+    margin-bottom: 1rem;
+}
+
+/* Buttons */
+.stButton>button {
+    background-color: #007bff; /* Primary blue color */
+    color: white;
+    border: none;
+    padding: 0.75rem 1.5rem;
+    border-radius: 0.5rem; /* Rounded corners */
+    font-weight: bold;
+    transition: background-color 0.2s ease; /* Smooth hover effect */
+}
+.stButton>button:hover {
+    background-color: #0056b3; /* Darker blue on hover */
+}
+.stButton>button:focus {
+    outline: none;  /* Remove the focus outline */
+    box-shadow: 0 0 0 3px rgba(0, 123, 255, 0.25); /* Add a subtle focus ring */
+}
+
+/* Radio buttons */
+.stRadio > div > label { /* Target radio button labels */
+  margin-right: 1rem; /* Add spacing */
+  padding: 0.5rem 1rem;
+  border-radius: 0.5rem; /* Rounded */
+  border: 1px solid #ccc;
+  transition: all 0.2s ease;  /* Smooth transition */
+}
+/* Style the selected radio option */
+.stRadio > div > label[data-baseweb="radio"] > div:first-child {
+    background-color: #007bff !important;  /* Override to ensure color */
+    border-color: #007bff !important;
+}
+.stRadio > div > label[data-baseweb="radio"] {
+    background-color: #f0f2f6;
+    border-color: #f0f2f6;
+}
+
+
+/* Result area */
+.result-area {
+    padding: 1.5rem;
+    border-radius: 0.75rem;
+    background-color: #f8f9fa; /* Light background */
+    border: 1px solid #e9ecef;  /* Subtle border */
+}
+
+/* Success/Error messages */
+.st-success, .st-error {
+    padding: 1rem;
+    border-radius: 0.5rem;
+    margin-bottom: 1rem;
+    font-weight: bold;
+    color: white;
+    display: flex;
+    align-items: center;
+}
+.st-success {
+    background-color: #28a745; /* Green */
+}
+.st-error {
+    background-color: #dc3545; /* Red */
+}
+.st-success svg, .st-error svg { /* Icons within success/error */
+    margin-right: 0.5rem;  /* Space the icon */
+    font-size: 1.2em;
+}
+
+
+/* Expander */
+.st-expander {
+  border: none !important; /* No borders */
+}
+.st-expanderHeader {
+    font-weight: bold;
+    background-color: transparent;
+    padding: 0.5rem 0;
+}
+.st-expanderContent {
+    padding: 0.5rem 0;
+}
+
+/* Gauge/Progress */
+.stProgress > div > div > div > div {
+    background-color: #007bff; /* Consistent blue */
+}
+
+/* Sidebar */
+.sidebar .sidebar-content {
+    padding: 1rem;
+    background-color: #f0f2f6; /* Lighter background */
+}
+</style>
+""", unsafe_allow_html=True)
+
+# --- Session State ---
+if "language" not in st.session_state:
+    st.session_state["language"] = "en"
+if "max_tokens" not in st.session_state:
+    st.session_state["max_tokens"] = 256
+if "temperature" not in st.session_state:
+    st.session_state["temperature"] = 0.7
+if "search_source" not in st.session_state:
+    st.session_state["search_source"] = "web"
+if "deep_search" not in st.session_state:
+    st.session_state["deep_search"] = False
+if "search_decision" not in st.session_state:
+    st.session_state["search_decision"] = None
+if "optimize_images" not in st.session_state:
+    st.session_state["optimize_images"] = True
+if "image_stats" not in st.session_state:
+    st.session_state["image_stats"] = None
+if "tiles_saved" not in st.session_state:
+    st.session_state["tiles_saved"] = 0
+if "ocr_fast_path" not in st.session_state:
+    st.session_state["ocr_fast_path"] = True
+if "image_route" not in st.session_state:
+    st.session_state["image_route"] = None
+if "ocr_stats" not in st.session_state:
+    st.session_state["ocr_stats"] = None
+if "conversation" not in st.session_state:
+    st.session_state["conversation"] = None
+if "document_stats" not in st.session_state:
+    st.session_state["document_stats"] = None
+if "context_stats" not in st.session_state:
+    st.session_state["context_stats"] = None
+if "speech_rate" not in st.session_state:
+    st.session_state["speech_rate"] = 1.0
+if "browser_voice" not in st.session_state:
+    st.session_state["browser_voice"] = None
+if "browser_voices" not in st.session_state:
+    st.session_state["browser_voices"] = []
+
+# --- Sidebar ---
+with st.sidebar:
+    st.header("⚙️ Settings")
+    st.session_state.language = st.selectbox("Language", ["en", "ko", "ja", "zh-CN", "fr", "de"], index=0)
+    language_code = st.session_state.language.split("-")[0]
+
+    st.session_state.search_source = st.selectbox(
+        "Search Source", ["web", "local", "vector"],
+        format_func={"web": "Web (DuckDuckGo)", "local": "Local documents", "vector": "Local documents (semantic)"}.get,
+    )
+
+    st.session_state.deep_search = st.checkbox("Deep Search (read result pages)", value=False, help="Fetches the top result pages for richer context; adds up to a few seconds.")
+
+    with st.expander("Search Stats"):
+        gate_stats = search_gate_report()
+        st.write(f"Skipped searches: {gate_stats['skip_rate']:.0%} of {gate_stats['questions']} questions")
+        st.write(f"Estimated latency saved: {gate_stats['latency_saved_s']:.1f} s")
+
+    st.session_state.optimize_images = st.checkbox("Optimize Images", value=True, help="Resize to the vision model's tile grid and re-encode before upload.")
+    st.session_state.ocr_fast_path = st.checkbox("OCR Fast Path", value=True, help="Read text-heavy images (receipts, charts, spec pages) with OCR and answer with the text model.")
+    with st.expander("Image Routing"):
+        for route_name, route_stats in ocr_route_report().items():
+            st.write(f"{route_name.upper()}: {route_stats['share']:.0%} of images, mean {route_stats['mean_ms'] / 1000:.1f} s, p95 {route_stats['p95_ms'] / 1000:.1f} s")
+
+    with st.expander("Speech Engines"):
+        for engine_name, engine_stats in tts_engine_report().items():
+            rtf = f"real-time factor {engine_stats['rtf']:.2f}" if engine_stats["rtf"] is not None else "no audio yet"
+            st.write(f"{engine_name}: {engine_stats['runs']} runs, {engine_stats['failures']} failures, {rtf}")
+
+    if TTS_MODE == "browser":
+        with st.expander("Browser Speech"):
+            st.session_state.speech_rate = st.slider("Speech Rate", 0.5, 2.0, 1.0, 0.1)
+            st.session_state.browser_voice = st.selectbox("Voice", [None] + st.session_state.browser_voices,
+                                                          format_func=lambda name: name or "Default",
+                                                          help="Voices this browser has for the language (listed after the first result).")
+
+    with st.expander("LLM Settings"):
+        st.session_state.max_tokens = st.slider("Max Tokens", 1, 2048, 256, 1)
+        st.session_state.temperature = st.slider("Temperature", 0.1, 4.0, 0.7, 0.1)
+
+# --- Main App ---
+st.markdown("<h1 class='title'>Should I...? 🤔</h1>", unsafe_allow_html=True)
+st.markdown("<p class='subtitle'>Ask a question and get a probability-based analysis!</p>", unsafe_allow_html=True)
+
+col1, col2 = st.columns([3, 1])
+
+with col1:
+    input_type = st.radio("Input Type", ["Text", "Voice", "Upload Image", "Take Photo", "Gallery", "Document"], horizontal=True)
+    question = ""  # Initialize question outside the conditional blocks
+
+    if input_type == "Text":
+        question = st.text_input("Ask a question:", placeholder="e.g., Should I buy this stock?")
+
+    elif input_type == "Voice":
+        if st.button("🎤 Record Question"):
+            question = transcribe_audio(language_code)
+            if question:
+                st.write("You said:", question)
+
+    search_mode = "auto"
+    if input_type in ("Text", "Voice"):
+        search_mode = st.radio("Web Search", ["auto", "always", "never"], horizontal=True,
+                               format_func={"auto": "Auto", "always": "Always", "never": "Skip"}.get)
+
+    uploaded_image = None
+    camera_image = None
+
+    if input_type == "Upload Image":
+        uploaded_image = st.file_uploader("Upload Image", type=["jpg", "jpeg", "png"], label_visibility='collapsed')
+
+    elif input_type == "Take Photo":
+        camera_image = st.camera_input("Take Photo", label_visibility="collapsed")
+
+    gallery_images = None
+    if input_type == "Gallery":
+        question = st.text_input("What are you choosing between?", placeholder="e.g., Which of these laptops should I buy?")
+        gallery_images = st.file_uploader("Upload Images", type=["jpg", "jpeg", "png"], accept_multiple_files=True, label_visibility='collapsed')
+
+    document = None
+    if input_type == "Document":
+        question = st.text_input("Ask about the document:", placeholder="e.g., Should I sign this contract?")
+        document = st.file_uploader("Upload PDF", type=["pdf"], label_visibility='collapsed')
+
+    crop = None
+    if input_type in ("Upload Image", "Take Photo", "Gallery") and st.session_state.optimize_images:
+        with st.expander("Crop"):
+            crop_mode = st.radio("Crop mode", ["auto", "manual", "off"], horizontal=True, help="Auto crops to the region with detail when that saves image tiles.",
+                                 format_func={"auto": "Auto", "manual": "Manual", "off": "Off"}.get)
+            if crop_mode == "auto":
+                crop = "auto"
+            elif crop_mode == "manual":
+                left, right = st.slider("Horizontal (%)", 0, 100, (0, 100))
+                top, bottom = st.slider("Vertical (%)", 0, 100, (0, 100))
+                crop = (left / 100, top / 100, right / 100, bottom / 100)
+
+    if st.button("Analyze", type="primary", use_container_width=True):
+        if not question and input_type in ("Text", "Voice") and not uploaded_image and not camera_image and not gallery_images and not document:
+            st.warning("Please enter a question, record audio, or upload/take an image.")
+        else: # No need to use continue. Use else.
+            st.session_state.context_stats = None
+            st.session_state.search_decision = None
+            st.session_state.image_stats = None
+            st.session_state.image_route = None
+            st.session_state.ocr_stats = None
+            st.session_state.conversation = None
+            st.session_state.document_stats = None
+            start = time.perf_counter()
+            with st.spinner("Analyzing..."):
+                if input_type in ("Text", "Voice") and question:
+                    probability, reason, audio = analyze_text(question, st.session_state.language, search_mode)
+
+                elif input_type == "Upload Image" and uploaded_image:
+                    image_bytes = uploaded_image.getbuffer()
+                    ocr_job = start_ocr(image_bytes)
+                    image_job = preprocess_image(image_bytes, crop)
+                    probability, reason, audio = analyze_image(image_job, question, st.session_state.language, ocr_job)
+
+                elif input_type == "Take Photo" and camera_image:
+                    image_bytes = camera_image.getbuffer()
+                    ocr_job = start_ocr(image_bytes)
+                    image_job = preprocess_image(image_bytes, crop)
+                    probability, reason, audio = analyze_image(image_job, question, st.session_state.language, ocr_job)
+
+                elif input_type == "Document" and document:
+                    probability, reason, audio = analyze_document(document.getvalue(), question, st.session_state.language)
+
+                elif input_type == "Gallery" and gallery_images:
+                    ranking = analyze_gallery(gallery_images, question, crop)
+                    st.subheader("Ranking")
+                    for rank, (name, probability, _) in enumerate(ranking, 1):
+                        st.markdown(f"{rank}. **{name}**: " + (f"{probability}%" if probability is not None else "failed"))
+                    probability, reason, audio = None, None, None
+
+                else:
+                    probability, reason, audio = None, "No input provided.", None  # Handle no input case
+
+                elapsed_ms = (time.perf_counter() - start) * 1000
+
+                with col2:
+                    if probability is not None and reason:
+                        st.subheader("Analysis Result")
+                        with st.container(border=True):
+                            if probability >= 50:
+                                st.success(f"✅ Yes! ({probability}%)")
+                                #st.balloons() # Moved outside, so no conflict.
+
+                            else:
+                                st.error(f"❌ No! ({probability}%)")
+                            st.progress(probability / 100.0)
+                            if TTS_MODE not in ("pipelined", "browser"):  # pipelined: played while streaming
+                                queue_verdict(audio, probability, st.session_state.language)
+                            with st.expander("Reason", expanded=True):
+                                st.markdown(reason)
+                            audio_slot = st.empty()
+                            decision = st.session_state.search_decision
+                            if decision and not decision[0]:
+                                st.caption(f"Web search skipped ({decision[1]})")
+                            if st.session_state.image_route == "ocr":
+                                ocr_stats = st.session_state.ocr_stats
+                                st.caption(f"Answered from the text read off the image (OCR fast path): {ocr_stats['words']} words, mean confidence {ocr_stats['confidence']:.0f}%, OCR {ocr_stats['ocr_ms']:.0f} ms")
+                            image_stats = st.session_state.image_stats
+                            if image_stats and st.session_state.image_route != "ocr":   # describes the vision payload only
+                                st.caption(f"Image: {image_stats['wire_bytes_in'] / 1024:.0f} KiB → {image_stats['wire_bytes_out'] / 1024:.0f} KiB on the wire, preprocessing {image_stats['encode_ms']:.0f} ms, end-to-end {elapsed_ms / 1000:.1f} s")
+                                if "tiles" in image_stats:
+                                    st.caption(f"Tiles: {image_stats['tiles_uncropped']} → {image_stats['tiles']} ({st.session_state.tiles_saved} saved this session)")
+                            doc_stats = st.session_state.document_stats
+                            if doc_stats:
+                                st.caption(f"Document: {doc_stats['chunks']} chunks ({doc_stats['cached']} cached), map {doc_stats['map_ms'] / 1000:.1f} s, {doc_stats['reduce_rounds']} merge rounds")
+                            stats = st.session_state.context_stats
+                            if stats:
+                                st.caption(f"Search context: {stats['tokens_before']} → {stats['tokens_after']} prompt tokens ({stats['duplicates']} duplicate snippets removed)")
+                            st.caption(f"Result in {elapsed_ms / 1000:.1f} s (speech: {TTS_MODE})")
+                            with audio_slot.container():
+                                play_speech(audio)
+                    elif reason:  # Display error message
+                        st.error(reason)
+
+with col1:
+    conversation = st.session_state.conversation
+    if conversation:
+        with st.expander("Conversation", expanded=True):
+            for turn in conversation["turns"]:
+                show_turn(turn)
+            follow_up = st.text_input("Ask a follow-up about this image:", key="follow_up")
+            if st.button("Ask") and follow_up:
+                with st.spinner("Analyzing..."):
+                    probability, reason, audio = ask_follow_up(follow_up, st.session_state.language)
+                if probability is None and reason:
+                    st.error(reason)
+                else:
+                    show_turn(conversation["turns"][-1])
+                    play_speech(audio)
\ No newline at end of file
@@ -1,350 +1,936 @@
-import streamlit as st
-import requests
-import base64
-import json
-import io
-from gtts import gTTS
-from duckduckgo_search import DDGS
-import speech_recognition as sr
-
-# --- 상수 ---
-OLLAMA_HOST = "http://192.168.0.119:11434"  # Ollama 서버 주소로 변경
-OLLAMA_MODEL = "llama3.2-vision"
-SYSTEM_PROMPT = """
-당신은 전문 분석가입니다. 주어진 정보와 질문을 분석하세요.
-다음 키를 사용하여 JSON 형식으로 응답을 제공하세요:
-
-- "probability": "예" (해야 함/구매해야 함) 대 "아니오" (하지 말아야 함/구매하지 말아야 함)의 가능성을 나타내는 백분율 (0-100)입니다.
-                   더 높은 백분율은 "예"를 의미하고, 더 낮은 백분율은 "아니오"를 의미합니다.
-- "reason": 해당되는 경우 출처를 인용하여 분석 및 추론에 대한 간결한 설명.
-
-예시:
-{"probability": 75, "reason": "현재 시장 동향과 전문가 의견에 따르면, 해당 주식은 강력한 성장 잠재력을 보입니다."}
-"""
-
-# --- 도우미 함수 ---
-
-def text_to_speech(text, language="ko"):  # 기본 언어를 한국어로
-    """gTTS를 사용하여 텍스트를 음성으로 변환하고 바이트를 반환합니다."""
-    try:
-        tts = gTTS(text=text, lang=language, slow=False)
-        buffer = io.BytesIO()
-        tts.write_to_fp(buffer)
-        buffer.seek(0)
-        return buffer.read()
-    except Exception as e:
-        st.error(f"gTTS 오류: {e}")
-        return None
-
-def encode_image(image_bytes):
-    """이미지 바이트를 base64로 인코딩합니다."""
-    return base64.b64encode(image_bytes).decode("utf-8")
-
-def perform_ddg_search(query, max_results=3):
-    """DuckDuckGo 검색을 수행하고 연결된 결과를 반환합니다."""
-    try:
-        with DDGS() as ddgs:
-            results = [r["body"] for r in ddgs.text(query, max_results=max_results)]
-        return "\n\n".join(results)
-    except Exception as e:
-        st.error(f"DuckDuckGo 검색 오류: {e}")
-        return ""
-
-def call_ollama_api(messages, stream=False, format="json"):
-    """주어진 메시지로 Ollama API를 호출합니다."""
-    data = {
-        "model": OLLAMA_MODEL,
-        "messages": messages,
-        "stream": stream,
-        "format": format,
-        "options": {
-            "temperature": st.session_state.temperature,
-            "num_predict": st.session_state.max_tokens,
-        }
-    }
-    try:
-        response = requests.post(f"{OLLAMA_HOST}/api/chat", json=data)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"Ollama API 오류: {e}")
-        return None
-
-def transcribe_audio(language_code):
-    """speech_recognition을 사용하여 마이크에서 오디오를 텍스트로 변환합니다."""
-    r = sr.Recognizer()
-    with sr.Microphone() as source:
-        st.toast("듣고 있습니다...", icon="🎙️")
-        audio = r.listen(source, timeout=5, phrase_time_limit=10)
-        st.toast("처리 중...", icon="⏳")
-        try:
-            text = r.recognize_google(audio, language=language_code)
-            return text
-        except sr.UnknownValueError:
-            st.warning("음성을 이해할 수 없습니다.")
-            return None
-        except sr.RequestError as e:
-            st.error(f"Google 음성 인식 서비스에서 결과를 요청할 수 없습니다: {e}")
-            return None
-
-
-# --- 분석 함수 ---
-
-def analyze_image(image_data, question, language):
-    """Ollama를 사용하여 이미지와 질문을 분석하고 확률, 이유 및 오디오를 반환합니다."""
-    search_results = perform_ddg_search(question, max_results=2)
-    combined_input = f"{question}\n\n관련 정보:\n{search_results}"
-
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": combined_input, "images": [image_data]},
-    ]
-    response_json = call_ollama_api(messages)
-    if response_json:
-        return process_ollama_response(response_json, language)
-    else:
-        return None, "오류: Ollama API 호출 실패.", None
-
-def analyze_text(question, language):
-    """Ollama를 사용하여 텍스트 질문을 분석하고 확률, 이유 및 오디오를 반환합니다."""
-    search_results = perform_ddg_search(question)
-    combined_input = f"{question}\n\n관련 정보:\n{search_results}"
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": combined_input},
-    ]
-    response_json = call_ollama_api(messages)
-    if response_json:
-        return process_ollama_response(response_json, language)
-    else:
-        return None, "오류: Ollama API 호출 실패.", None
-
-def process_ollama_response(response_json, language):
-    """Ollama API 응답을 처리하고, 데이터를 추출하고, TTS를 생성합니다."""
-    try:
-        content_str = response_json['message']['content']
-        content_json = json.loads(content_str)
-        probability = content_json.get("probability", None)
-        reason = content_json.get("reason", None)
-
-        if probability is not None and not (0 <= probability <= 100):
-            raise ValueError("확률이 0-100 범위 내에 있지 않습니다.")
-
-        audio_bytes = text_to_speech(reason, language) if reason else None
-
-        return probability, reason, audio_bytes
-    except (json.JSONDecodeError, KeyError, ValueError) as e:
-        st.error(f"Ollama 응답 처리 오류: {e}")
-        return None, "오류: Ollama로부터 유효하지 않은 응답.", None
-
-
-# --- Streamlit 앱 ---
-
-st.set_page_config(page_title="해야 할까요...?", page_icon="🤔", layout="wide")
-
-# --- Custom CSS ---
-st.markdown("""
-<style>
-/* (이전 응답의 CSS 스타일 - 변경 없음) */
-/* Main container */
-.main {
-    padding: 2rem;
-    font-family: sans-serif; /* Modern font */
-}
-
-/* Title */
-.title {
-    font-size: 3rem;
-    font-weight: bold;
-    margin-bottom: 1rem;
-    color: #333;  /* Darker title color */
-}
-
-/* Subtitle/Description */
-.subtitle {
-    font-size: 1.25rem;
-    color: #555;
-    margin-bottom: 2rem;
-}
-
-/* Input area */
-.stTextInput, .stFileUploader, .stCameraInput, .stRadio {
-    margin-bottom: 1rem;
-}
-
-/* Buttons */
-.stButton>button {
-    background-color: #007bff; /* Primary blue color */
-    color: white;
-    border: none;
-    padding: 0.75rem 1.5rem;
-    border-radius: 0.5rem; /* Rounded corners */
-    font-weight: bold;
-    transition: background-color 0.2s ease; /* Smooth hover effect */
-}
-.stButton>button:hover {
-    background-color: #0056b3; /* Darker blue on hover */
-}
-.stButton>button:focus {
-    outline: none;  /* Remove the focus outline */
-    box-shadow: 0 0 0 3px rgba(0, 123, 255, 0.25); /* Add a subtle focus ring */
-}
-
-/* Radio buttons */
-.stRadio > div > label { /* Target radio button labels */
-  margin-right: 1rem; /* Add spacing */
-  padding: 0.5rem 1rem;
-  border-radius: 0.5rem; /* Rounded */
-  border: 1px solid #ccc;
-  transition: all 0.2s ease;  /* Smooth transition */
-}
-/* Style the selected radio option */
-.stRadio > div > label[data-baseweb="radio"] > div:first-child {
-    background-color: #007bff !important;  /* Override to ensure color */
-    border-color: #007bff !important;
-}
-.stRadio > div > label[data-baseweb="radio"] {
-    background-color: #f0f2f6;
-    border-color: #f0f2f6;
-}
-
-
-/* Result area */
-.result-area {
-    padding: 1.5rem;
-    border-radius: 0.75rem;
-    background-color: #f8f9fa; /* Light background */
-    border: 1px solid #e9ecef;  /* Subtle border */
-}
-
-/* Success/Error messages */
-.st-success, .st-error {
-    padding: 1rem;
-    border-radius: 0.5rem;
-    margin-bottom: 1rem;
-    font-weight: bold;
-    color: white;
-    display: flex;
-    align-items: center;
-}
-.st-success {
-    background-color: #28a745; /* Green */
-}
-.st-error {
-    background-color: #dc3545; /* Red */
-}
-.st-success svg, .st-error svg { /* Icons within success/error */
-    margin-right: 0.5rem;  /* Space the icon */
-    font-size: 1.2em;
-}
-
-
-/* Expander */
-.st-expander {
-  border: none !important; /* No borders */
-}
-.st-expanderHeader {
-    font-weight: bold;
-    background-color: transparent;
-    padding: 0.5rem 0;
-}
-.st-expanderContent {
-    padding: 0.5rem 0;
-}
-
-/* Gauge/Progress */
-.stProgress > div > div > div > div {
-    background-color: #007bff; /* Consistent blue */
-}
-
-/* Sidebar */
-.sidebar .sidebar-content {
-    padding: 1rem;
-    background-color: #f0f2f6; /* Lighter background */
-}
-</style>
-""", unsafe_allow_html=True)
-
-# --- 세션 상태 ---
-if "language" not in st.session_state:
-    st.session_state["language"] = "ko"  # 기본 언어를 한국어로 설정
-if "max_tokens" not in st.session_state:
-    st.session_state["max_tokens"] = 256
-if "temperature" not in st.session_state:
-    st.session_state["temperature"] = 0.7
-
-# --- 사이드바 ---
-with st.sidebar:
-    st.header("⚙️ 설정")
-    st.session_state.language = st.selectbox("언어", ["ko", "en", "ja", "zh-CN", "fr", "de"], index=0)
-    language_code = st.session_state.language.split("-")[0]
-
-    with st.expander("LLM 설정"):
-        st.session_state.max_tokens = st.slider("최대 토큰 수", 1, 2048, 256, 1)
-        st.session_state.temperature = st.slider("온도", 0.1, 4.0, 0.7, 0.1)
-
-# --- 메인 앱 ---
-st.markdown("<h1 class='title'>해야 할까요...? 🤔</h1>", unsafe_allow_html=True)
-st.markdown("<p class='subtitle'>질문을 하고 확률 기반 분석을 받으세요!</p>", unsafe_allow_html=True)
-
-col1, col2 = st.columns([3, 1])
-
-with col1:
-    input_type = st.radio("입력 유형", ["텍스트", "음성", "이미지 업로드", "사진 촬영"], horizontal=True)
-    question = ""
-
-    if input_type == "텍스트":
-        question = st.text_input("질문을 입력하세요:", placeholder="예: 이 주식을 사야 할까요?")
-
-    elif input_type == "음성":
-        if st.button("🎤 질문 녹음"):
-            question = transcribe_audio(language_code)
-            if question:
-                st.write("당신의 질문:", question)
-
-    uploaded_image = None
-    camera_image = None
-
-    if input_type == "이미지 업로드":
-        uploaded_image = st.file_uploader("이미지 업로드", type=["jpg", "jpeg", "png"], label_visibility='collapsed')
-
-    elif input_type == "사진 촬영":
-        camera_image = st.camera_input("사진 촬영", label_visibility="collapsed")
-
-    if st.button("분석", type="primary", use_container_width=True):
-        if not question and input_type in ("텍스트", "음성") and not uploaded_image and not camera_image:
-            st.warning("질문을 입력하거나, 음성을 녹음하거나, 이미지를 업로드/촬영해주세요.")
-        else:
-            with st.spinner("분석 중..."):
-                if input_type in ("텍스트", "음성") and question:
-                    probability, reason, audio = analyze_text(question, st.session_state.language)
-
-                elif input_type == "이미지 업로드" and uploaded_image:
-                    image_bytes = uploaded_image.getvalue()
-                    image_base64 = encode_image(image_bytes)
-                    probability, reason, audio = analyze_image(image_base64, question, st.session_state.language)
-
-                elif input_type == "사진 촬영" and camera_image:
-                    image_bytes = camera_image.getvalue()
-                    image_base64 = encode_image(image_bytes)
-                    probability, reason, audio = analyze_image(image_base64, question, st.session_state.language)
-                else:
-                    probability, reason, audio = None, "입력이 제공되지 않았습니다.", None
-
-                with col2:
-                    if probability is not None and reason:
-                        st.subheader("분석 결과")
-                        with st.container(border=True):
-
-                            if probability >= 50:
-                                st.success(f"✅ 예! ({probability}%)")
-                            else:
-                                st.error(f"❌ 아니오! ({probability}%)")
-                            st.progress(probability / 100.0)
-
-                            with st.expander("이유", expanded=True):
-                                st.markdown(reason)
-                            if audio:
-                                st.audio(audio, format="audio/mp3")
-                    elif reason:
-                        st.error(reason)
\ No newline at end of file
+import streamlit as st
+import requests
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from duckduckgo_search import DDGS
+import speech_recognition as sr
+from context_packer import pack_context, context_budget
+from local_index import LocalIndex, split_passages
+from vector_index import VectorIndex, index_version
+from deep_search import fetch_page_texts
+from image_prep import wire_bytes, prepare_image
+from image_worker import ImageWorkerPool, ImagePoolBusy
+from ocr_route import log_route, report as ocr_route_report
+from tts_engines import report as tts_engine_report
+from search_gate import needs_search, log_decision, report as search_gate_report
+from ollama_payload import EncodedImage
+from ollama_pool import BackendPool
+from document_analysis import iter_pdf_pages, chunk_pages, chunk_budget, map_chunks, reduce_findings, DOC_NUM_CTX
+from speech import SpeechJob, SentenceSpeech, JsonStringField, VerdictClips, json_number, clip_player_html, TTS_MODE, TTS_WORKERS, BROWSER_TTS_DIR
+
+# --- 상수 ---
+OLLAMA_HOST = "http://192.168.0.119:11434"  # Ollama 서버 주소로 변경
+OLLAMA_HOSTS = os.environ.get("OLLAMA_HOSTS", OLLAMA_HOST).split(",")  # 쉼표로 구분; 갤러리 분석이 이 서버들에 분산됩니다
+OLLAMA_MODEL = "llama3.2-vision"
+OLLAMA_TEXT_MODEL = "llama3.2"  # OCR 경로용 빠른 텍스트 전용 모델
+LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR", "local_index")  # python local_index.py build <문서 폴더>
+VECTOR_INDEX_DIR = os.environ.get("VECTOR_INDEX_DIR", "vector_index")  # python vector_index.py build <문서 폴더>
+GALLERY_COLUMNS = 3
+GALLERY_MAX_THREADS = 16
+SYSTEM_PROMPT = """
+당신은 전문 분석가입니다. 주어진 정보와 질문을 분석하세요.
+다음 키를 사용하여 JSON 형식으로 응답을 제공하세요:
+
+- "probability": "예" (해야 함/구매해야 함) 대 "아니오" (하지 말아야 함/구매하지 말아야 함)의 가능성을 나타내는 백분율 (0-100)입니다.
+                   더 높은 백분율은 "예"를 의미하고, 더 낮은 백분율은 "아니오"를 의미합니다.
+- "spoken_summary" (선택 사항): 소리 내어 읽을, 판단과 핵심 이유를 담은 짧은 한 문장.
+- "reason": 해당되는 경우 출처를 인용하여 분석 및 추론에 대한 간결한 설명.
+
+예시:
+{"probability": 75, "spoken_summary": "예, 해당 주식은 계속 성장할 것으로 보입니다.", "reason": "현재 시장 동향과 전문가 의견에 따르면, 해당 주식은 강력한 성장 잠재력을 보입니다."}
+"""
+
+# --- 도우미 함수 ---
+
+@st.cache_resource
+def load_speech_executor():
+    """백그라운드 TTS 스레드입니다. 서버 프로세스의 모든 세션이 공유합니다."""
+    return ThreadPoolExecutor(max_workers=TTS_WORKERS)
+
+def start_speech(text, language, speech=None):
+    """결과의 음성 작업을 만들고 TTS_MODE에 따라 시작합니다 (텍스트가 없으면 None).
+
+    speech는 스트리밍 응답이 이미 시작한 문장 파이프라인입니다 (pipelined 모드).
+    """
+    if not text:
+        return None
+    if TTS_MODE == "pipelined":
+        return (speech or SentenceSpeech(language, load_speech_executor())).finish(text)
+    speech = SpeechJob(text, language)
+    if TTS_MODE == "eager":
+        speech.start()
+    elif TTS_MODE == "background":
+        speech.start(load_speech_executor())
+    return speech
+
+def play_speech(speech):
+    """음성이 준비되면 오디오 플레이어를, 시작되지 않았으면 듣기 버튼을 표시합니다.
+    (브라우저 모드에서는 대신 브라우저가 읽어 줍니다.)"""
+    if speech is None:
+        return
+    if isinstance(speech, SentenceSpeech):
+        try:
+            with st.spinner("음성 준비 중..."):
+                queue_clips(speech, speech.clips())
+        except Exception as e:
+            st.error(f"TTS 오류: {e}")
+            return
+        st.audio(speech.audio(), format="audio/mp3")
+        st.caption(f"첫 음성까지 {speech.first_audio_ms / 1000:.1f}초 (문장 {len(speech.sentences)}개)")
+        return
+    if not speech.started:
+        if TTS_MODE == "browser":
+            browser_speech(speech)
+        else:
+            listen_button(speech)
+        return
+    try:
+        with st.spinner("음성 준비 중..."):
+            audio = speech.audio()
+    except Exception as e:
+        st.error(f"TTS 오류: {e}")
+        return
+    st.audio(audio, format="audio/mp3")
+    st.caption(f"음성 합성 {speech.synth_ms / 1000:.1f}초, 엔진 {speech.engine} (실시간 배율 {speech.rtf:.2f})")
+
+@st.cache_resource
+def load_verdict_clips():
+    """미리 렌더링한 판단 음성 클립입니다 (모든 세션이 공유). 없는 언어는 TTS 스레드에서 렌더링합니다."""
+    return VerdictClips(executor=load_speech_executor())
+
+def queue_verdict(speech, probability, language):
+    """판단 음성("예, 75퍼센트")을 음성 요약이나 이유보다 먼저 바로 재생합니다."""
+    clip = load_verdict_clips().verdict(language, probability)
+    if clip and speech is not None:
+        st.components.v1.html(clip_player_html(speech.id, None, clip), height=0)
+
+def queue_clips(speech, clips):
+    """완성된 클립을 페이지의 Web Audio 대기열에 넘깁니다. 대기열은 클립을 끊김 없이 이어서 재생합니다."""
+    for index, clip in clips:
+        st.components.v1.html(clip_player_html(speech.id, index, clip), height=0)
+
+@st.fragment
+def listen_button(speech):
+    """클릭하면 합성합니다. 이 프래그먼트만 다시 실행되므로 결과는 화면에 남습니다."""
+    if st.button("🔊 듣기", key=f"listen_{id(speech)}"):
+        play_speech(speech.start())
+
+browser_tts = st.components.v1.declare_component("browser_tts", path=BROWSER_TTS_DIR)
+
+@st.fragment
+def browser_speech(speech):
+    """브라우저의 Web Speech API로 텍스트를 읽습니다. 브라우저에 해당 언어 음성이 없을 때만 서버 TTS를 사용합니다."""
+    spoken = browser_tts(id=speech.id, text=speech.text, language=speech.language, rate=st.session_state.speech_rate,
+                         voice=st.session_state.browser_voice, key=f"browser_tts_{speech.id}", default=None)
+    if spoken is None:  # 브라우저가 아직 응답하지 않음
+        return
+    if spoken["voices"]:
+        st.session_state.browser_voices = spoken["voices"]
+    if spoken["voice"]:
+        st.caption(f"브라우저가 읽는 중 ({spoken['voice']})")
+    else:
+        play_speech(speech.start())
+
+def encode_image(image_bytes):
+    """이미지 바이트를 미리 할당된 버퍼에 한 번만 base64로 인코딩합니다 (중간 문자열 없음)."""
+    return EncodedImage(image_bytes)
+
+def preprocess_image(image_bytes, crop=None):
+    """워커 풀에서 이미지를 모델 타일 크기에 맞게 자르고 줄이기 시작합니다 (활성화된 경우).
+
+    finish_preprocess에 넘길 작업을 반환하며, 그동안 호출자는 다른 작업(예: 검색)을 할 수 있습니다.
+    """
+    size = wire_bytes(len(image_bytes))
+    st.session_state.image_stats = {"wire_bytes_in": size, "wire_bytes_out": size, "encode_ms": 0.0}
+    if not st.session_state.optimize_images:
+        return image_bytes, None, crop
+    try:
+        return image_bytes, load_image_pool().submit(image_bytes, OLLAMA_MODEL, crop=crop), crop
+    except ImagePoolBusy:
+        st.toast("이미지 워커가 모두 사용 중이라 최적화 없이 이미지를 보냅니다.")
+        return image_bytes, None, crop
+    except BrokenProcessPool:
+        return prepare_here(image_bytes, crop), None, crop
+
+def finish_preprocess(image_job):
+    """워커를 기다려 전송할 바이트를 반환합니다 (전처리에 실패하면 원본)."""
+    image_bytes, future, crop = image_job
+    if future is None:
+        return image_bytes
+    try:
+        processed, st.session_state.image_stats = future.result()
+    except BrokenProcessPool:
+        return prepare_here(image_bytes, crop)
+    except Exception as e:  # 워커 안의 어떤 오류든 (예: DecompressionBombError) 원본을 보냅니다
+        st.error(f"이미지 전처리 오류: {e}")
+        return image_bytes
+    st.session_state.tiles_saved += st.session_state.image_stats["tiles_uncropped"] - st.session_state.image_stats["tiles"]
+    return processed
+
+def prepare_here(image_bytes, crop):
+    """이미지 워커 풀이 죽었을 때의 대안: 풀을 다시 만들도록 캐시를 비우고 이 요청은 스크립트 스레드에서 전처리합니다."""
+    load_image_pool.clear()
+    st.toast("이미지 워커가 중지되어 이 이미지는 여기서 전처리합니다.")
+    try:
+        processed, st.session_state.image_stats = prepare_image(image_bytes, OLLAMA_MODEL, crop=crop)
+    except Exception as e:
+        st.error(f"이미지 전처리 오류: {e}")
+        return image_bytes
+    st.session_state.tiles_saved += st.session_state.image_stats["tiles_uncropped"] - st.session_state.image_stats["tiles"]
+    return processed
+
+@st.cache_resource
+def load_image_pool():
+    """서버 프로세스당 한 번 이미지 워커 프로세스를 시작하며, 모든 세션이 공유합니다."""
+    pool = ImageWorkerPool()
+    pool.warm()
+    return pool
+
+def start_ocr(image_bytes):
+    """텍스트 위주 이미지의 OCR을 워커 풀에서 시작합니다 (빠른 경로가 활성화된 경우)."""
+    if not st.session_state.ocr_fast_path:
+        return None
+    try:
+        return load_image_pool().read_text(image_bytes)
+    except ImagePoolBusy:
+        return None
+    except BrokenProcessPool:
+        load_image_pool.clear()
+        return None
+
+def finish_ocr(ocr_job):
+    """비전 모델을 건너뛸 만큼 OCR 결과가 확실하면 텍스트를, 아니면 None을 반환합니다."""
+    if ocr_job is None:
+        return None
+    try:
+        result = ocr_job.result()
+    except BrokenProcessPool:
+        load_image_pool.clear()
+        return None
+    except Exception:  # OCR는 지름길일 뿐이므로 실패하면 비전 모델이 이미지를 읽습니다
+        return None
+    st.session_state.ocr_stats = result
+    return result["text"]
+
+def perform_ddg_search(query, max_results=3):
+    """DuckDuckGo 검색을 수행하고 연결된 결과를 반환합니다."""
+    try:
+        with DDGS() as ddgs:
+            hits = list(ddgs.text(query, max_results=max_results))
+        results = [r["body"] for r in hits]
+        if st.session_state.deep_search:
+            pages, _ = fetch_page_texts([r["href"] for r in hits if r.get("href")])
+            results += [passage for _, text in pages for passage in split_passages(text)]
+        context, stats = pack_context(query, results, context_budget(OLLAMA_MODEL))
+        st.session_state.context_stats = stats
+        return context
+    except Exception as e:
+        st.error(f"DuckDuckGo 검색 오류: {e}")
+        return ""
+
+@st.cache_resource
+def load_local_index(index_dir, version):
+    """Opens the memory-mapped local index once per process (version busts the cache after rebuilds)."""
+    return LocalIndex(index_dir)
+
+def perform_local_search(query, max_results=5):
+    """로컬 문서 인덱스를 검색하고 압축된 구절을 반환합니다."""
+    manifest = os.path.join(LOCAL_INDEX_DIR, "manifest.json")
+    if not query or not os.path.exists(manifest):
+        return ""
+    index = load_local_index(LOCAL_INDEX_DIR, os.path.getmtime(manifest))
+    context, stats = pack_context(query, index.context_for(query, k=max_results), context_budget(OLLAMA_MODEL))
+    st.session_state.context_stats = stats
+    return context
+
+@st.cache_resource
+def load_vector_index(index_dir, version):
+    """Opens the memory-mapped embedding matrix once per process (version: index_version, so any index rewrite busts the cache)."""
+    return VectorIndex(index_dir)
+
+def perform_vector_search(query, max_results=5):
+    """로컬 벡터 인덱스에서 의미적으로 유사한 청크를 검색합니다."""
+    meta = os.path.join(VECTOR_INDEX_DIR, "meta.json")
+    if not query or not os.path.exists(meta):
+        return ""
+    try:
+        index = load_vector_index(VECTOR_INDEX_DIR, index_version(VECTOR_INDEX_DIR))
+        chunks = index.search(OLLAMA_HOST, query, k=max_results)
+    except requests.exceptions.RequestException as e:
+        st.error(f"Ollama API 오류: {e}")
+        return ""
+    context, stats = pack_context(query, chunks, context_budget(OLLAMA_MODEL))
+    st.session_state.context_stats = stats
+    return context
+
+def search_context(query, max_results=3):
+    """선택한 소스에서 검색 컨텍스트를 반환합니다 (오프라인이면 로컬 문서로 대체)."""
+    if st.session_state.search_source == "local":
+        return perform_local_search(query)
+    if st.session_state.search_source == "vector":
+        return perform_vector_search(query)
+    return perform_ddg_search(query, max_results) or perform_local_search(query)
+
+def chat_request(messages, stream=False, format="json", model=OLLAMA_MODEL):
+    """세션의 생성 옵션으로 /api/chat 요청 본문을 만듭니다."""
+    return {
+        "model": model,
+        "messages": messages,
+        "stream": stream,
+        "format": format,
+        "options": {
+            "temperature": st.session_state.temperature,
+            "num_predict": st.session_state.max_tokens,
+        }
+    }
+
+def call_ollama_api(messages, stream=False, format="json", model=OLLAMA_MODEL, host=None, options=None):
+    """주어진 메시지로 Ollama API를 호출합니다 (대화가 고정된 경우 해당 host에서).
+
+    options는 세션의 생성 옵션에 더해집니다 (예: num_ctx).
+    """
+    data = chat_request(messages, stream, format, model)
+    data["options"].update(options or {})
+    try:
+        if TTS_MODE == "pipelined" and format == "json":
+            return stream_with_speech(data, host)
+        # The body is streamed from the image buffers instead of being built with json=data.
+        return load_backend_pool().chat(data, host)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        st.error(f"Ollama API 오류: {e}")
+        return None
+
+def stream_with_speech(data, host=None):
+    """응답을 스트리밍하고, 확률이 나오는 즉시 판단 음성을 재생하며, 음성 요약(없으면 이유)의
+    각 문장이 완성되는 즉시 음성으로 읽습니다."""
+    speech = SentenceSpeech(st.session_state.language, load_speech_executor())
+    summary, reason = JsonStringField("spoken_summary"), JsonStringField("reason")
+    spoken = None  # 음성 요약, 또는 이유가 먼저 나오면 (요약 없음) 이유
+    probability = None
+    content = []
+    chunk = None
+    data["stream"] = True
+    for chunk in load_backend_pool().chat_stream(data, host):
+        delta = chunk.get("message", {}).get("content", "")
+        content.append(delta)
+        if probability is None:
+            probability = json_number("".join(content), "probability")
+            if probability is not None and 0 <= probability <= 100:
+                queue_verdict(speech, probability, st.session_state.language)
+        summary_text, reason_text = summary.feed(delta), reason.feed(delta)
+        if spoken is None and (summary_text or reason_text):
+            spoken = summary if summary_text else reason
+        speech.feed(summary_text if spoken is summary else reason_text)
+        queue_clips(speech, speech.ready_clips())
+    if chunk is None or not chunk.get("done"):
+        # 빈 스트림이나 중간에 끊긴 스트림은 호출 실패로 처리합니다 (call_ollama_api가 처리)
+        raise requests.exceptions.RequestException("Ollama 스트림이 마지막 청크 없이 끝났습니다")
+    # 마지막 청크에 시간 정보(prompt_eval_duration 등)가 있으므로 전체 메시지를 여기에 담습니다.
+    chunk["message"] = {"role": "assistant", "content": "".join(content)}
+    chunk["speech"] = speech
+    return chunk
+
+@st.cache_resource
+def load_backend_pool():
+    """백엔드별 제한이 모든 세션에 적용되도록 서버 프로세스당 하나의 백엔드 풀을 만듭니다."""
+    return BackendPool(OLLAMA_HOSTS)
+
+def transcribe_audio(language_code):
+    """speech_recognition을 사용하여 마이크에서 오디오를 텍스트로 변환합니다."""
+    r = sr.Recognizer()
+    with sr.Microphone() as source:
+        st.toast("듣고 있습니다...", icon="🎙️")
+        audio = r.listen(source, timeout=5, phrase_time_limit=10)
+        st.toast("처리 중...", icon="⏳")
+        try:
+            text = r.recognize_google(audio, language=language_code)
+            return text
+        except sr.UnknownValueError:
+            st.warning("음성을 이해할 수 없습니다.")
+            return None
+        except sr.RequestError as e:
+            st.error(f"Google 음성 인식 서비스에서 결과를 요청할 수 없습니다: {e}")
+            return None
+
+
+# --- 분석 함수 ---
+
+def analyze_image(image_job, question, language, ocr_job=None):
+    """Ollama를 사용하여 이미지와 질문을 분석하고 확률, 이유 및 오디오를 반환합니다.
+
+    OCR 결과가 확실한 텍스트 위주 이미지는 대신 텍스트 모델로 보냅니다 (ocr_job).
+    """
+    start = time.perf_counter()
+    search_results = search_context(question, max_results=2)
+    combined_input = f"{question}\n\n관련 정보:\n{search_results}"
+
+    ocr_text = finish_ocr(ocr_job)
+    if ocr_text:
+        route = "ocr"
+        if image_job[1] is not None:
+            image_job[1].cancel()
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"{combined_input}\n\n이미지 속 텍스트:\n{ocr_text}"},
+        ]
+        model = OLLAMA_TEXT_MODEL
+    else:
+        route = "vision"
+        image_data = encode_image(finish_preprocess(image_job))
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": combined_input, "images": [image_data]},
+        ]
+        model = OLLAMA_MODEL
+    host = load_backend_pool().least_busy()
+    response_json = call_ollama_api(messages, model=model, host=host)
+    st.session_state.image_route = route
+    if response_json:
+        log_route(route, (time.perf_counter() - start) * 1000)
+        probability, reason, audio = process_ollama_response(response_json, language)
+        start_conversation(messages, response_json, model, host)
+        record_turn(question, response_json, probability, reason)
+        return probability, reason, audio
+    else:
+        return None, "오류: Ollama API 호출 실패.", None
+
+def start_conversation(messages, response_json, model, host):
+    """이미지 분석을 프롬프트 캐시가 있는 백엔드에 고정된 대화로 유지합니다.
+
+    인코딩된 이미지는 첫 사용자 메시지에 그대로 남으므로, 후속 질문은 이미지를 다시 인코딩하지 않고
+    프롬프트 앞부분도 바뀌지 않습니다. Ollama는 새 턴만 프리필합니다.
+    """
+    st.session_state.conversation = {
+        "messages": messages + [response_json["message"]],
+        "model": model,
+        "host": host,
+        "turns": [],
+    }
+
+def record_turn(question, response_json, probability, reason):
+    """Ollama가 보고한 프리필 시간과 프롬프트 토큰 수와 함께 턴을 기록합니다."""
+    st.session_state.conversation["turns"].append({
+        "question": question,
+        "probability": probability,
+        "reason": reason,
+        "prefill_ms": response_json.get("prompt_eval_duration", 0) / 1e6,
+        "prompt_tokens": response_json.get("prompt_eval_count", 0),
+    })
+
+def ask_follow_up(question, language):
+    """현재 대화에서 같은 백엔드와 모델로 후속 질문을 합니다."""
+    conversation = st.session_state.conversation
+    messages = conversation["messages"] + [{"role": "user", "content": question}]
+    response_json = call_ollama_api(messages, model=conversation["model"], host=conversation["host"])
+    if not response_json:
+        return None, "오류: Ollama API 호출 실패.", None
+    conversation["messages"] = messages + [response_json["message"]]
+    probability, reason, audio = process_ollama_response(response_json, language)
+    record_turn(question, response_json, probability, reason)
+    return probability, reason, audio
+
+def show_turn(turn):
+    """대화 턴 하나를 채팅 형식으로 표시합니다."""
+    with st.chat_message("user"):
+        st.write(turn["question"] or "(이미지)")
+    with st.chat_message("assistant"):
+        if turn["probability"] is not None:
+            st.write(f"**{turn['probability']}%** · {turn['reason']}")
+        st.caption(f"프리필 {turn['prefill_ms']:.0f} ms (프롬프트 토큰 {turn['prompt_tokens']}개)")
+
+def analyze_text(question, language, search_mode="auto"):
+    """Ollama를 사용하여 텍스트 질문을 분석하고 확률, 이유 및 오디오를 반환합니다."""
+    searched, decided_by = needs_search(question, search_mode)
+    search_ms = None
+    if searched:
+        start = time.perf_counter()
+        search_results = search_context(question)
+        search_ms = (time.perf_counter() - start) * 1000
+        combined_input = f"{question}\n\n관련 정보:\n{search_results}"
+    else:
+        combined_input = question
+    log_decision(question, searched, decided_by, search_ms)
+    st.session_state.search_decision = (searched, decided_by)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": combined_input},
+    ]
+    response_json = call_ollama_api(messages)
+    if response_json:
+        return process_ollama_response(response_json, language)
+    else:
+        return None, "오류: Ollama API 호출 실패.", None
+
+def analyze_document(pdf_bytes, question, language):
+    """PDF를 맵-리듀스로 분석합니다: 청크별 결과(캐시됨)를 질문에 맞춰 합칩니다."""
+    template = chat_request([], model=OLLAMA_TEXT_MODEL)
+    backends = load_backend_pool()
+    try:
+        chunks = chunk_pages(iter_pdf_pages(pdf_bytes), chunk_budget())
+        findings, doc_stats = map_chunks(chunks, backends.chat, template, backends.capacity)
+        notes, doc_stats["reduce_rounds"] = reduce_findings(findings, question, backends.chat, template,
+                                                            chunk_budget(), backends.capacity)
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+        st.error(f"문서 분석 오류: {e}")
+        return None, "오류: 문서 분석 실패.", None
+    st.session_state.document_stats = doc_stats
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"{question}\n\n문서에서 찾은 내용:\n{notes}"},
+    ]
+    response_json = call_ollama_api(messages, model=OLLAMA_TEXT_MODEL, options={"num_ctx": DOC_NUM_CTX})  # 요약 노트는 이 컨텍스트 크기에 맞춰 채워짐
+    if response_json:
+        return process_ollama_response(response_json, language)
+    else:
+        return None, "오류: Ollama API 호출 실패.", None
+
+def parse_probability(value):
+    """모델이 준 확률을 0-100 사이의 숫자로 바꿉니다. 75, 75.0, "75", "75%"를 받고, 그 외에는 ValueError를 냅니다."""
+    if isinstance(value, str):
+        value = value.strip().rstrip("%")
+    try:
+        probability = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"확률이 숫자가 아닙니다: {value!r}") from None
+    if not 0 <= probability <= 100:
+        raise ValueError("확률이 0-100 범위 내에 있지 않습니다.")
+    return int(probability) if probability.is_integer() else probability
+
+def analyze_gallery_image(backends, images, image_bytes, crop, data):
+    """갤러리 스레드에서 실행됩니다 (st 호출 없음): 이미지 하나를 전처리한 뒤 분석합니다.
+
+    (확률, 이유)를 반환하며, 분석에 실패하면 확률은 None입니다.
+    """
+    try:
+        if images is not None:
+            try:
+                image_bytes, _ = images.submit(image_bytes, OLLAMA_MODEL, crop=crop, timeout=None).result()
+            except BrokenProcessPool:  # 풀이 죽었으면 이 스레드에서 전처리합니다
+                load_image_pool.clear()
+                image_bytes, _ = prepare_image(image_bytes, OLLAMA_MODEL, crop=crop)
+        system, user = data["messages"]
+        response_json = backends.chat({**data, "messages": [system, {**user, "images": [EncodedImage(image_bytes)]}]})
+        content_json = json.loads(response_json["message"]["content"])
+        return parse_probability(content_json.get("probability")), content_json.get("reason")
+    except (requests.exceptions.RequestException, OSError, ValueError, KeyError) as e:
+        return None, f"오류: {e}"
+
+def analyze_gallery(files, question, crop):
+    """이미지들을 동시에 분석하고 (백엔드별 제한 내에서) 결과가 나오는 대로 그리드를 채웁니다.
+
+    확률이 높은 순으로 정렬된 [(이름, 확률, 이유)]를 반환합니다.
+    """
+    search_results = search_context(question, max_results=2)
+    data = chat_request([
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"{question}\n\n관련 정보:\n{search_results}"},
+    ])
+    images = load_image_pool() if st.session_state.optimize_images else None
+    backends = load_backend_pool()
+
+    columns = st.columns(GALLERY_COLUMNS)
+    slots = []
+    for index, file in enumerate(files):
+        with columns[index % GALLERY_COLUMNS]:
+            st.image(file.getvalue(), caption=file.name, use_container_width=True)
+            slots.append(st.empty())
+            slots[index].caption("대기 중...")
+
+    results = []
+    # Threads beyond the backends' capacity just wait for a slot; the pools enforce the limits.
+    with ThreadPoolExecutor(max_workers=min(len(files), GALLERY_MAX_THREADS)) as executor:
+        futures = {executor.submit(analyze_gallery_image, backends, images, file.getvalue(), crop, data): index
+                   for index, file in enumerate(files)}
+        for future in as_completed(futures):
+            index = futures[future]
+            probability, reason = future.result()
+            with slots[index].container():
+                if probability is None:
+                    st.error(reason)
+                else:
+                    if probability >= 50:
+                        st.success(f"✅ 예 ({probability}%)")
+                    else:
+                        st.error(f"❌ 아니요 ({probability}%)")
+                    st.caption(reason)
+            results.append((files[index].name, probability, reason))
+    return sorted(results, key=lambda r: -1 if r[1] is None else r[1], reverse=True)
+
+
+def process_ollama_response(response_json, language):
+    """Ollama API 응답을 처리하고 데이터를 추출합니다. 음성은 시작만 합니다 (TTS_MODE 참고)."""
+    try:
+        content_str = response_json['message']['content']
+        content_json = json.loads(content_str)
+        probability = content_json.get("probability", None)
+        reason = content_json.get("reason", None)
+        summary = content_json.get("spoken_summary") or reason
+
+        if probability is not None:
+            probability = parse_probability(probability)
+
+        return probability, reason, start_speech(summary, language, response_json.get("speech"))
+    except (json.JSONDecodeError, KeyError, ValueError) as e:
+        st.error(f"Ollama 응답 처리 오류: {e}")
+        return None, "오류: Ollama로부터 유효하지 않은 응답.", None
+
+
+# --- Streamlit 앱 ---
+
+st.set_page_config(page_title="해야 할까요...?", page_icon="🤔", layout="wide")
+
+# --- Custom CSS ---
+st.markdown("""
+<style>
+/* (이전 응답의 CSS 스타일 - 변경 없음) */
+/* Main container */
+.main {
+    padding: 2rem;
+    font-family: sans-serif; /* Modern font */
+}
+
+/* Title */
+.title {
+    font-size: 3rem;
+    font-weight: bold;
+    margin-bottom: 1rem;
+    color: #333;  /* Darker title color */
+}
+
+/* Subtitle/Description */
+.subtitle {
+    font-size: 1.25rem;
+    color: #555;
+    margin-bottom: 2rem;
+}
+
+/* Input area */
+.stTextInput, .stFileUploader, .stCameraInput, .stRadio {
+    margin-bottom: 1rem;
+}
+
+/* Buttons */
+.stButton>button {
+    background-color: #007bff; /* Primary blue color */
+    color: white;
+    border: none;
+    padding: 0.75rem 1.5rem;
+    border-radius: 0.5rem; /* Rounded corners */
+    font-weight: bold;
+    transition: background-color 0.2s ease; /* Smooth hover effect */
+}
+.stButton>button:hover {
+    background-color: #0056b3; /* Darker blue on hover */
+}
+.stButton>button:focus {
+    outline: none;  /* Remove the focus outline */
+    box-shadow: 0 0 0 3px rgba(0, 123, 255, 0.25); /* Add a subtle focus ring */
+}
+
+/* Radio buttons */
+.stRadio > div > label { /* Target radio button labels */
+  margin-right: 1rem; /* Add spacing */
+  padding: 0.5rem 1rem;
+  border-radius: 0.5rem; /* Rounded */
+  border: 1px solid #ccc;
+  transition: all 0.2s ease;  /* Smooth transition */
+}
+/* Style the selected radio option */
+.stRadio > div > label[data-baseweb="radio"] > div:first-child {
+    background-color: #007bff !important;  /* Override to ensure color */
+    border-color: #007bff !important;
+}
+.stRadio > div > label[data-baseweb="radio"] {
+    background-color: #f0f2f6;
+    border-color: #f0f2f6;
+}
+
+
+/* Result area */
+.result-area {
+    padding: 1.5rem;
+    border-radius: 0.75rem;
+    background-color: #f8f9fa; /* Light background */
+    border: 1px solid #e9ecef;  /* Subtle border */
+}
+
+/* Success/Error messages */
+.st-success, .st-error {
+    padding: 1rem;
+    border-radius: 0.5rem;
+    margin-bottom: 1rem;
+    font-weight: bold;
+    color: white;
+    display: flex;
+    align-items: center;
+}
+.st-success {
+    background-color: #28a745; /* Green */
+}
+.st-error {
+    background-color: #dc3545; /* Red */
+}
+.st-success svg, .st-error svg { /* Icons within success/error */
+    margin-right: 0.5rem;  /* Space the icon */
+    font-size: 1.2em;
+}
+
+
+/* Expander */
+.st-expander {
+  border: none !important; /* No borders */
+}
+.st-expanderHeader {
+    font-weight: bold;
+    background-color: transparent;
+    padding: 0.5rem 0;
+}
+.st-expanderContent {
+    padding: 0.5rem 0;
+}
+
+/* Gauge/Progress */
+.stProgress > div > div > div > div {
+    background-color: #007bff; /* Consistent blue */
+}
+
+/* Sidebar */
+.sidebar .sidebar-content {
+    padding: 1rem;
+    background-color: #f0f2f6; /* Lighter background */
+}
+</style>
+""", unsafe_allow_html=True)
+
+# --- 세션 상태 ---
+if "language" not in st.session_state:
+    st.session_state["language"] = "ko"  # 기본 언어를 한국어로 설정
+if "max_tokens" not in st.session_state:
+    st.session_state["max_tokens"] = 256
+if "temperature" not in st.session_state:
+    st.session_state["temperature"] = 0.7
+if "search_source" not in st.session_state:
+    st.session_state["search_source"] = "web"
+if "deep_search" not in st.session_state:
+    st.session_state["deep_search"] = False
+if "search_decision" not in st.session_state:
+    st.session_state["search_decision"] = None
+if "optimize_images" not in st.session_state:
+    st.session_state["optimize_images"] = True
+if "image_stats" not in st.session_state:
+    st.session_state["image_stats"] = None
+if "tiles_saved" not in st.session_state:
+    st.session_state["tiles_saved"] = 0
+if "ocr_fast_path" not in st.session_state:
+    st.session_state["ocr_fast_path"] = True
+if "image_route" not in st.session_state:
+    st.session_state["image_route"] = None
+if "ocr_stats" not in st.session_state:
+    st.session_state["ocr_stats"] = None
+if "conversation" not in st.session_state:
+    st.session_state["conversation"] = None
+if "document_stats" not in st.session_state:
+    st.session_state["document_stats"] = None
+if "context_stats" not in st.session_state:
+    st.session_state["context_stats"] = None
+if "speech_rate" not in st.session_state:
+    st.session_state["speech_rate"] = 1.0
+if "browser_voice" not in st.session_state:
+    st.session_state["browser_voice"] = None
+if "browser_voices" not in st.session_state:
+    st.session_state["browser_voices"] = []
+
+# --- 사이드바 ---
+with st.sidebar:
+    st.header("⚙️ 설정")
+    st.session_state.language = st.selectbox("언어", ["ko", "en", "ja", "zh-CN", "fr", "de"], index=0)
+    language_code = st.session_state.language.split("-")[0]
+
+    st.session_state.search_source = st.selectbox(
+        "검색 소스", ["web", "local", "vector"],
+        format_func={"web": "웹 (DuckDuckGo)", "local": "로컬 문서", "vector": "로컬 문서 (의미 검색)"}.get,
+    )
+
+    st.session_state.deep_search = st.checkbox("심층 검색 (결과 페이지 읽기)", value=False, help="상위 결과 페이지를 가져와 더 풍부한 컨텍스트를 사용합니다. 최대 몇 초가 추가됩니다.")
+
+    with st.expander("검색 통계"):
+        gate_stats = search_gate_report()
+        st.write(f"검색 생략 비율: 질문 {gate_stats['questions']}개 중 {gate_stats['skip_rate']:.0%}")
+        st.write(f"절약된 예상 지연 시간: {gate_stats['latency_saved_s']:.1f}초")
+
+    st.session_state.optimize_images = st.checkbox("이미지 최적화", value=True, help="업로드 전에 비전 모델 타일 크기에 맞춰 크기를 조정하고 다시 인코딩합니다.")
+    st.session_state.ocr_fast_path = st.checkbox("OCR 빠른 경로", value=True, help="텍스트 위주 이미지(영수증, 차트, 사양표)를 OCR로 읽고 텍스트 모델로 답변합니다.")
+    with st.expander("이미지 경로 통계"):
+        for route_name, route_stats in ocr_route_report().items():
+            st.write(f"{route_name.upper()}: 이미지의 {route_stats['share']:.0%}, 평균 {route_stats['mean_ms'] / 1000:.1f}초, p95 {route_stats['p95_ms'] / 1000:.1f}초")
+
+    with st.expander("음성 엔진 통계"):
+        for engine_name, engine_stats in tts_engine_report().items():
+            rtf = f"실시간 배율 {engine_stats['rtf']:.2f}" if engine_stats["rtf"] is not None else "아직 음성 없음"
+            st.write(f"{engine_name}: 실행 {engine_stats['runs']}회, 실패 {engine_stats['failures']}회, {rtf}")
+
+    if TTS_MODE == "browser":
+        with st.expander("브라우저 음성"):
+            st.session_state.speech_rate = st.slider("읽기 속도", 0.5, 2.0, 1.0, 0.1)
+            st.session_state.browser_voice = st.selectbox("음성", [None] + st.session_state.browser_voices,
+                                                          format_func=lambda name: name or "기본값",
+                                                          help="이 브라우저에 있는 해당 언어 음성입니다 (첫 결과 이후에 표시).")
+
+    with st.expander("LLM 설정"):
+        st.session_state.max_tokens = st.slider("최대 토큰 수", 1, 2048, 256, 1)
+        st.session_state.temperature = st.slider("온도", 0.1, 4.0, 0.7, 0.1)
+
+# --- 메인 앱 ---
+st.markdown("<h1 class='title'>해야 할까요...? 🤔</h1>", unsafe_allow_html=True)
+st.markdown("<p class='subtitle'>질문을 하고 확률 기반 분석을 받으세요!</p>", unsafe_allow_html=True)
+
+col1, col2 = st.columns([3, 1])
+
+with col1:
+    input_type = st.radio("입력 유형", ["텍스트", "음성", "이미지 업로드", "사진 촬영", "갤러리", "문서"], horizontal=True)
+    question = ""
+
+    if input_type == "텍스트":
+        question = st.text_input("질문을 입력하세요:", placeholder="예: 이 주식을 사야 할까요?")
+
+    elif input_type == "음성":
+        if st.button("🎤 질문 녹음"):
+            question = transcribe_audio(language_code)
+            if question:
+                st.write("당신의 질문:", question)
+
+    search_mode = "auto"
+    if input_type in ("텍스트", "음성"):
+        search_mode = st.radio("웹 검색", ["auto", "always", "never"], horizontal=True,
+                               format_func={"auto": "자동", "always": "항상", "never": "건너뛰기"}.get)
+
+    uploaded_image = None
+    camera_image = None
+
+    if input_type == "이미지 업로드":
+        uploaded_image = st.file_uploader("이미지 업로드", type=["jpg", "jpeg", "png"], label_visibility='collapsed')
+
+    elif input_type == "사진 촬영":
+        camera_image = st.camera_input("사진 촬영", label_visibility="collapsed")
+
+    gallery_images = None
+    if input_type == "갤러리":
+        question = st.text_input("무엇 중에서 고르고 있나요?", placeholder="예: 이 노트북들 중 어떤 것을 사야 할까요?")
+        gallery_images = st.file_uploader("이미지 업로드", type=["jpg", "jpeg", "png"], accept_multiple_files=True, label_visibility='collapsed')
+
+    document = None
+    if input_type == "문서":
+        question = st.text_input("문서에 대해 질문하세요:", placeholder="예: 이 계약서에 서명해야 할까요?")
+        document = st.file_uploader("PDF 업로드", type=["pdf"], label_visibility='collapsed')
+
+    crop = None
+    if input_type in ("이미지 업로드", "사진 촬영", "갤러리") and st.session_state.optimize_images:
+        with st.expander("자르기"):
+            crop_mode = st.radio("자르기 방식", ["auto", "manual", "off"], horizontal=True, help="자동은 타일 수가 줄어들 때 세부 정보가 있는 영역으로 자릅니다.",
+                                 format_func={"auto": "자동", "manual": "수동", "off": "끄기"}.get)
+            if crop_mode == "auto":
+                crop = "auto"
+            elif crop_mode == "manual":
+                left, right = st.slider("가로 범위 (%)", 0, 100, (0, 100))
+                top, bottom = st.slider("세로 범위 (%)", 0, 100, (0, 100))
+                crop = (left / 100, top / 100, right / 100, bottom / 100)
+
+    if st.button("분석", type="primary", use_container_width=True):
+        if not question and input_type in ("텍스트", "음성") and not uploaded_image and not camera_image and not gallery_images and not document:
+            st.warning("질문을 입력하거나, 음성을 녹음하거나, 이미지를 업로드/촬영해주세요.")
+        else:
+            st.session_state.context_stats = None
+            st.session_state.search_decision = None
+            st.session_state.image_stats = None
+            st.session_state.image_route = None
+            st.session_state.ocr_stats = None
+            st.session_state.conversation = None
+            st.session_state.document_stats = None
+            start = time.perf_counter()
+            with st.spinner("분석 중..."):
+                if input_type in ("텍스트", "음성") and question:
+                    probability, reason, audio = analyze_text(question, st.session_state.language, search_mode)
+
+                elif input_type == "이미지 업로드" and uploaded_image:
+                    image_bytes = uploaded_image.getbuffer()
+                    ocr_job = start_ocr(image_bytes)
+                    image_job = preprocess_image(image_bytes, crop)
+                    probability, reason, audio = analyze_image(image_job, question, st.session_state.language, ocr_job)
+
+                elif input_type == "사진 촬영" and camera_image:
+                    image_bytes = camera_image.getbuffer()
+                    ocr_job = start_ocr(image_bytes)
+                    image_job = preprocess_image(image_bytes, crop)
+                    probability, reason, audio = analyze_image(image_job, question, st.session_state.language, ocr_job)
+                elif input_type == "문서" and document:
+                    probability, reason, audio = analyze_document(document.getvalue(), question, st.session_state.language)
+
+                elif input_type == "갤러리" and gallery_images:
+                    ranking = analyze_gallery(gallery_images, question, crop)
+                    st.subheader("순위")
+                    for rank, (name, probability, _) in enumerate(ranking, 1):
+                        st.markdown(f"{rank}. **{name}**: " + (f"{probability}%" if probability is not None else "실패"))
+                    probability, reason, audio = None, None, None
+
+                else:
+                    probability, reason, audio = None, "입력이 제공되지 않았습니다.", None
+
+                elapsed_ms = (time.perf_counter() - start) * 1000
+
+                with col2:
+                    if probability is not None and reason:
+                        st.subheader("분석 결과")
+                        with st.container(border=True):
+
+                            if probability >= 50:
+                                st.success(f"✅ 예! ({probability}%)")
+                            else:
+                                st.error(f"❌ 아니오! ({probability}%)")
+                            st.progress(probability / 100.0)
+                            if TTS_MODE not in ("pipelined", "browser"):  # pipelined: 스트리밍 중에 이미 재생됨
+                                queue_verdict(audio, probability, st.session_state.language)
+
+                            with st.expander("이유", expanded=True):
+                                st.markdown(reason)
+                            audio_slot = st.empty()
+                            decision = st.session_state.search_decision
+                            if decision and not decision[0]:
+                                st.caption(f"웹 검색 생략됨 ({decision[1]})")
+                            if st.session_state.image_route == "ocr":
+                                ocr_stats = st.session_state.ocr_stats
+                                st.caption(f"이미지에서 읽은 텍스트로 답변했습니다 (OCR 빠른 경로): 단어 {ocr_stats['words']}개, 평균 신뢰도 {ocr_stats['confidence']:.0f}%, OCR {ocr_stats['ocr_ms']:.0f} ms")
+                            image_stats = st.session_state.image_stats
+                            if image_stats and st.session_state.image_route != "ocr":   # 비전 모델로 보낸 이미지에 대한 정보
+                                st.caption(f"이미지: 전송 크기 {image_stats['wire_bytes_in'] / 1024:.0f} KiB → {image_stats['wire_bytes_out'] / 1024:.0f} KiB, 전처리 {image_stats['encode_ms']:.0f} ms, 전체 {elapsed_ms / 1000:.1f}초")
+                                if "tiles" in image_stats:
+                                    st.caption(f"타일: {image_stats['tiles_uncropped']} → {image_stats['tiles']} (이번 세션에서 {st.session_state.tiles_saved}개 절약)")
+                            doc_stats = st.session_state.document_stats
+                            if doc_stats:
+                                st.caption(f"문서: 청크 {doc_stats['chunks']}개 (캐시 {doc_stats['cached']}개), 맵 {doc_stats['map_ms'] / 1000:.1f}초, 병합 {doc_stats['reduce_rounds']}회")
+                            stats = st.session_state.context_stats
+                            if stats:
+                                st.caption(f"검색 컨텍스트: {stats['tokens_before']} → {stats['tokens_after']} 프롬프트 토큰 (중복 스니펫 {stats['duplicates']}개 제거)")
+                            st.caption(f"결과까지 {elapsed_ms / 1000:.1f}초 (음성: {TTS_MODE})")
+                            with audio_slot.container():
+                                play_speech(audio)
+                    elif reason:
+                        st.error(reason)
+
+with col1:
+    conversation = st.session_state.conversation
+    if conversation:
+        with st.expander("대화", expanded=True):
+            for turn in conversation["turns"]:
+                show_turn(turn)
+            follow_up = st.text_input("이 이미지에 대해 후속 질문하기:", key="follow_up")
+            if st.button("질문") and follow_up:
+                with st.spinner("분석 중..."):
+                    probability, reason, audio = ask_follow_up(follow_up, st.session_state.language)
+                if probability is None and reason:
+                    st.error(reason)
+                else:
+                    show_turn(conversation["turns"][-1])
+                    play_speech(audio)
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""Search-snippet packing: near-duplicate removal, BM25 ranking and a token budget."""
+
+import hashlib
+import math
+import re
+import struct
+
+# --- Constants ---
+SHINGLE_SIZE = 2          # word shingles used for MinHash
+MINHASH_PERMUTATIONS = 64
+DUPLICATE_THRESHOLD = 0.6  # estimated Jaccard similarity above which a snippet is a duplicate
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Tokens available for search context, per model (the rest is system prompt, question and answer).
+CONTEXT_TOKEN_BUDGETS = {
+    "llama3.2-vision": 768,
+    "llama3.2": 1024,
+}
+DEFAULT_CONTEXT_TOKEN_BUDGET = 512
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿]")
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _make_permutations(count, seed=1):
+    """Deterministic (a, b) coefficients for the MinHash permutations."""
+    permutations = []
+    for i in range(count):
+        digest = hashlib.sha1(f"{seed}:{i}".encode()).digest()
+        a, b = struct.unpack("<QQ", digest[:16])
+        permutations.append((a % (_MERSENNE_PRIME - 1) + 1, b % _MERSENNE_PRIME))
+    return permutations
+
+
+_PERMUTATIONS = _make_permutations(MINHASH_PERMUTATIONS)
+
+
+# --- Tokenization ---
+
+def tokenize(text):
+    """Lowercases and splits text into word tokens (CJK ideographs/kana become one token each)."""
+    tokens = []
+    for word in _WORD_RE.findall(text.lower()):
+        if _CJK_RE.search(word):
+            tokens.extend(word)
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def estimate_tokens(text):
+    """Rough LLM token count: ~4 Latin characters per token, one token per CJK/Hangul character."""
+    count = 0
+    for word in _WORD_RE.findall(text):
+        if word.isascii():
+            count += max(1, math.ceil(len(word) / 4))
+        else:
+            count += len(word)
+    # Punctuation and whitespace are mostly merged into neighbouring tokens.
+    return count + text.count("\n")
+
+
+# --- Near-duplicate removal ---
+
+def minhash_signature(text):
+    """MinHash signature over word shingles of the given text."""
+    words = tokenize(text)
+    if len(words) < SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = [struct.unpack("<I", hashlib.blake2b(s.encode(), digest_size=4).digest())[0] for s in shingles]
+    return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def estimate_similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+def deduplicate(snippets, threshold=DUPLICATE_THRESHOLD):
+    """Drops snippets whose estimated similarity to an earlier snippet exceeds the threshold."""
+    kept, signatures = [], []
+    for snippet in snippets:
+        signature = minhash_signature(snippet)
+        if any(estimate_similarity(signature, other) >= threshold for other in signatures):
+            continue
+        kept.append(snippet)
+        signatures.append(signature)
+    return kept
+
+
+# --- Relevance ---
+
+def bm25_scores(query, documents, k1=BM25_K1, b=BM25_B):
+    """Scores each document against the query with Okapi BM25."""
+    query_terms = set(tokenize(query))
+    doc_tokens = [tokenize(doc) for doc in documents]
+    if not doc_tokens:
+        return []
+    avgdl = sum(len(tokens) for tokens in doc_tokens) / len(doc_tokens) or 1.0
+    n = len(doc_tokens)
+    df = {term: sum(1 for tokens in doc_tokens if term in tokens) for term in query_terms}
+
+    scores = []
+    for tokens in doc_tokens:
+        tf = {}
+        for token in tokens:
+            if token in query_terms:
+                tf[token] = tf.get(token, 0) + 1
+        score = 0.0
+        for term, freq in tf.items():
+            idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * freq * (k1 + 1) / (freq + k1 * (1 - b + b * len(tokens) / avgdl))
+        scores.append(score)
+    return scores
+
+
+# --- Packing ---
+
+def context_budget(model):
+    """Returns the search-context token budget for the given model."""
+    return CONTEXT_TOKEN_BUDGETS.get(model, DEFAULT_CONTEXT_TOKEN_BUDGET)
+
+
+def pack_context(question, snippets, token_budget, separator="\n\n"):
+    """Deduplicates snippets, ranks them against the question and greedily fills the token budget.
+
+    Returns the packed context string and a stats dict with the prompt tokens before and after.
+    """
+    snippets = [s.strip() for s in snippets if s and s.strip()]
+    tokens_before = estimate_tokens(separator.join(snippets))
+    unique = deduplicate(snippets)
+    scores = bm25_scores(question, unique) if question else [0.0] * len(unique)
+
+    # Stable sort keeps the search engine's order among equally relevant snippets.
+    ranked = sorted(range(len(unique)), key=lambda i: -scores[i])
+    if scores and max(scores) > 0:
+        # Snippets sharing no term with the question are noise once anything matches.
+        ranked = [i for i in ranked if scores[i] > 0]
+    chosen, used = [], 0
+    for i in ranked:
+        cost = estimate_tokens(unique[i])
+        if used + cost > token_budget:
+            continue
+        chosen.append(i)
+        used += cost
+    packed = separator.join(unique[i] for i in sorted(chosen))
+
+    stats = {
+        "snippets_in": len(snippets),
+        "duplicates": len(snippets) - len(unique),
+        "snippets_kept": len(chosen),
+        "tokens_before": tokens_before,
+        "tokens_after": estimate_tokens(packed),
+    }
+    return packed, stats
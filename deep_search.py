@@ -0,0 +1,287 @@
+"""Deep-search mode: fetch the top result pages concurrently and extract their main text.
+
+Every page gets a time and byte budget and the whole fetch is capped by a wall-clock budget,
+so deep search adds at most DEEP_SEARCH_BUDGET_S to an analysis. Extracted pages are cached
+on disk by URL and revalidated with their ETag.
+
+    python deep_search.py https://example.com/a https://example.com/b
+    python deep_search.py check     # fetch, extraction, budget and ETag cache against a local fixture server
+"""
+
+import asyncio
+import hashlib
+import html.parser
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+DEEP_SEARCH_BUDGET_S = 4.0     # wall time for the whole fetch
+PAGE_TIMEOUT_S = 3.0           # per page, connect + read
+PAGE_MAX_BYTES = 512 * 1024    # stop reading a page after this many bytes
+PAGE_CACHE_DIR = os.environ.get("PAGE_CACHE_DIR", os.path.join(".cache", "pages"))
+PAGE_CACHE_TTL_S = 6 * 3600    # pages without an ETag are reused for this long
+MIN_BLOCK_CHARS = 60           # shorter blocks are usually navigation or captions
+MAX_LINK_DENSITY = 0.5         # share of block text inside <a> above which a block is boilerplate
+USER_AGENT = "Mozilla/5.0 (compatible; ShouldI/1.0)"
+
+
+# --- Extraction ---
+
+class _BlockExtractor(html.parser.HTMLParser):
+    """Splits HTML into text blocks and tracks how much of each block is link text."""
+
+    SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form",
+                 "template", "svg", "iframe", "button", "select"}
+    BLOCK_TAGS = {"p", "div", "li", "td", "section", "article", "main", "blockquote", "pre",
+                  "h1", "h2", "h3", "h4", "h5", "h6", "br", "tr", "dd", "dt", "figcaption"}
+
+    def __init__(self):
+        super().__init__()
+        self.blocks = []
+        self._text = []
+        self._link_chars = 0
+        self._skip_depth = 0
+        self._link_depth = 0
+
+    def _flush(self):
+        text = " ".join("".join(self._text).split())
+        if text:
+            self.blocks.append((text, self._link_chars))
+        self._text, self._link_chars = [], 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "a":
+            self._link_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "a":
+            self._link_depth = max(0, self._link_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        self._text.append(data)
+        if self._link_depth:
+            self._link_chars += len(data.strip())
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def extract_main_text(markup):
+    """Keeps long, link-poor text blocks and drops menus, footers and link lists."""
+    extractor = _BlockExtractor()
+    extractor.feed(markup)
+    extractor.close()
+    kept = [text for text, link_chars in extractor.blocks
+            if len(text) >= MIN_BLOCK_CHARS and link_chars <= MAX_LINK_DENSITY * len(text)]
+    return "\n\n".join(kept)
+
+
+# --- Page cache ---
+
+def _cache_path(url):
+    return os.path.join(PAGE_CACHE_DIR, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+
+def _cache_get(url):
+    try:
+        with open(_cache_path(url), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_put(url, etag, text):
+    os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+    tmp = _cache_path(url) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"url": url, "etag": etag, "fetched": time.time(), "text": text}, f, ensure_ascii=False)
+    os.replace(tmp, _cache_path(url))
+
+
+# --- Fetching ---
+
+async def _fetch_page(session, url, page_timeout, max_bytes):
+    """Returns (text, source) for one URL where source is 'cache', 'revalidated' or 'network'."""
+    cached = _cache_get(url)
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        elif time.time() - cached["fetched"] < PAGE_CACHE_TTL_S:
+            return cached["text"], "cache"
+
+    timeout = aiohttp.ClientTimeout(total=page_timeout)
+    async with session.get(url, headers=headers, timeout=timeout, allow_redirects=True) as response:
+        if response.status == 304 and cached:
+            return cached["text"], "revalidated"
+        response.raise_for_status()
+        if "html" not in response.headers.get("Content-Type", "text/html"):
+            return "", "network"
+        body = bytearray()
+        async for chunk in response.content.iter_chunked(16384):
+            body.extend(chunk[:max_bytes - len(body)])
+            if len(body) >= max_bytes:
+                break
+        charset = response.charset or "utf-8"
+        text = extract_main_text(body.decode(charset, errors="replace"))
+        etag = response.headers.get("ETag")
+    try:
+        _cache_put(url, etag, text)
+    except OSError as e:   # the cache is only an optimization; keep the page
+        logger.warning("Could not cache %s: %s", url, e)
+    return text, "network"
+
+
+async def fetch_pages(urls, budget_s=DEEP_SEARCH_BUDGET_S, page_timeout=PAGE_TIMEOUT_S, max_bytes=PAGE_MAX_BYTES):
+    """Fetches URLs concurrently; pages not done within budget_s are cancelled and skipped.
+
+    Returns a list of (url, text) in input order for the pages that finished, plus stats.
+    """
+    start = time.perf_counter()
+    stats = {"requested": len(urls), "fetched": 0, "cached": 0, "failed": 0, "timed_out": 0}
+    headers = {"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml"}
+    async with aiohttp.ClientSession(headers=headers) as session:
+        tasks = {asyncio.ensure_future(_fetch_page(session, url, min(page_timeout, budget_s), max_bytes)): url
+                 for url in urls}
+        done, pending = await asyncio.wait(tasks, timeout=budget_s) if tasks else (set(), set())
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    texts = {}
+    for task in done:
+        try:
+            text, source = task.result()
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeError, LookupError) as e:
+            logger.info("Deep search fetch failed for %s: %r", tasks[task], e)
+            stats["failed"] += 1
+            continue
+        stats["cached" if source != "network" else "fetched"] += 1
+        if text:
+            texts[tasks[task]] = text
+    stats["timed_out"] = len(pending)
+    stats["elapsed_s"] = time.perf_counter() - start
+    return [(url, texts[url]) for url in urls if url in texts], stats
+
+
+def fetch_page_texts(urls, **kwargs):
+    """Synchronous wrapper for callers outside an event loop (e.g. the Streamlit script thread)."""
+    return asyncio.run(fetch_pages(urls, **kwargs))
+
+
+# --- Fixture check ---
+
+ARTICLE_TEXT = "The battery lasts about nine hours of mixed use and charges to full in ninety minutes. "
+FIXTURE_PAGES = {
+    "/article": ("<html><head><style>p {color: red}</style></head><body>"
+                 "<nav><a href='/'>Home</a> <a href='/deals'>Deals</a></nav>"
+                 f"<article><h1>Review</h1><p>{ARTICLE_TEXT * 3}</p>"
+                 "<p><a href='/a'>Related review one</a> <a href='/b'>Related review two, with a longer title</a></p>"
+                 "</article><footer>Copyright and cookie notices</footer></body></html>"),
+    "/large": f"<html><body><p>{ARTICLE_TEXT * 20000}</p></body></html>",   # ~1.7 MB, cut at PAGE_MAX_BYTES
+}
+
+
+def _fixture_server(slow_s):
+    """A local server for FIXTURE_PAGES with ETags, plus /slow (answers after slow_s) and /missing (404)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/slow":
+                time.sleep(slow_s)
+            page = FIXTURE_PAGES.get("/article" if self.path == "/slow" else self.path)
+            if page is None:
+                self.send_error(404)
+                return
+            etag = f'"{hashlib.sha1(page.encode("utf-8")).hexdigest()[:12]}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = page.encode("utf-8")
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):   # the client stops reading at max_bytes
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def check(budget_s=1.0):
+    """Runs fetch_page_texts twice against the fixture server and checks the results; returns True if all pass."""
+    global PAGE_CACHE_DIR
+    base, server = _fixture_server(slow_s=budget_s * 3)
+    urls = [base + path for path in ("/article", "/large", "/slow", "/missing")]
+    failures = []
+    live_cache_dir = PAGE_CACHE_DIR
+    with tempfile.TemporaryDirectory() as cache_dir:
+        PAGE_CACHE_DIR = cache_dir
+        try:
+            pages, first = fetch_page_texts(urls, budget_s=budget_s)
+            texts = dict(pages)
+            print(f"cold: {first}")
+            article = texts.get(urls[0], "")
+            if ARTICLE_TEXT.strip() not in article:
+                failures.append("article body was not extracted")
+            if any(noise in article for noise in ("Home", "Copyright", "Related review", "color: red")):
+                failures.append(f"boilerplate kept in article text: {article!r}")
+            if not 0 < len(texts.get(urls[1], "")) <= PAGE_MAX_BYTES:
+                failures.append("large page was not cut at PAGE_MAX_BYTES")
+            if (first["fetched"], first["failed"], first["timed_out"]) != (2, 1, 1):
+                failures.append("expected 2 fetched, 1 failed (404) and 1 timed out (slow)")
+            if first["elapsed_s"] > budget_s + 0.5:
+                failures.append(f"fetch took {first['elapsed_s']:.2f} s, over the {budget_s:.1f} s budget")
+
+            pages, second = fetch_page_texts(urls[:2], budget_s=budget_s)
+            print(f"warm: {second}")
+            if second["cached"] != 2 or dict(pages) != {url: texts[url] for url in urls[:2]}:
+                failures.append("second fetch was not answered from the revalidated cache")
+        finally:
+            PAGE_CACHE_DIR = live_cache_dir
+    server.shutdown()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("ok" if not failures else f"{len(failures)} check(s) failed")
+    return not failures
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] == ["check"]:
+        sys.exit(0 if check() else 1)
+    pages, fetch_stats = fetch_page_texts(sys.argv[1:])
+    for page_url, page_text in pages:
+        print(f"== {page_url} ({len(page_text)} chars)\n{page_text[:300]}\n")
+    print(fetch_stats)
@@ -0,0 +1,180 @@
+"""Map-reduce analysis of uploaded PDFs (contracts, insurance terms, spec sheets).
+
+Pages are extracted one at a time and packed into chunks that fit the text model's context
+window. The map step condenses every chunk into question-independent findings, in parallel
+across the backend pool; the reduce step merges the findings against the question until they
+fit one prompt, and the app makes the final probability/reason call on them.
+
+Page texts and per-chunk findings are cached on disk (keyed by the PDF's and the chunk's
+content hashes), so asking a second question about the same document skips extraction and
+the whole map step: only the reduce and the final call run again.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pypdf
+
+from context_packer import estimate_tokens
+from local_index import split_passages
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+DOC_CACHE_DIR = os.environ.get("DOC_CACHE_DIR", os.path.join(".cache", "documents"))
+DOC_NUM_CTX = 4096            # context window requested for map and reduce calls
+MAP_MAX_TOKENS = 400          # answer budget for one chunk's findings
+PROMPT_OVERHEAD_TOKENS = 250  # system prompt, page markers and chat template
+MAP_PROMPT = (
+    "You are reading one part of a longer document. List the facts someone deciding about this "
+    "document needs: parties, obligations, costs and fees, coverage and exclusions, deadlines, "
+    "penalties, cancellation terms, risks and anything unusual. Quote numbers exactly and cite "
+    "pages as (p. N). Answer with a short bullet list only."
+)
+REDUCE_PROMPT = (
+    "Merge these notes from parts of one document into a shorter bullet list. Keep every point "
+    "relevant to the question below, with its numbers and (p. N) citations; drop repetition."
+)
+# Part of every findings cache key: change it when MAP_PROMPT or the chunking changes.
+MAP_VERSION = "1"
+
+
+def chunk_budget(num_ctx=DOC_NUM_CTX, answer_tokens=MAP_MAX_TOKENS):
+    """Document tokens that fit in one map call."""
+    return num_ctx - answer_tokens - PROMPT_OVERHEAD_TOKENS
+
+
+# --- Extraction and chunking ---
+
+def _cache_path(key, suffix):
+    return os.path.join(DOC_CACHE_DIR, f"{key}.{suffix}.json")
+
+
+def _cache_get(key, suffix):
+    try:
+        with open(_cache_path(key, suffix), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_put(key, suffix, value):
+    os.makedirs(DOC_CACHE_DIR, exist_ok=True)
+    tmp = _cache_path(key, suffix) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(value, f, ensure_ascii=False)
+    os.replace(tmp, _cache_path(key, suffix))
+
+
+def iter_pdf_pages(pdf_bytes):
+    """Yields (page number, text) one page at a time; a fully read document is cached."""
+    key = hashlib.sha1(pdf_bytes).hexdigest()
+    cached = _cache_get(key, "pages")
+    if cached is not None:
+        yield from ((number, text) for number, text in cached)
+        return
+    pages = []
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+        for number, page in enumerate(reader.pages, 1):
+            text = page.extract_text() or ""
+            pages.append((number, text))
+            yield number, text
+    except pypdf.errors.PyPdfError as e:
+        raise ValueError(f"unreadable PDF: {e}") from e
+    _cache_put(key, "pages", pages)
+
+
+def chunk_pages(pages, token_budget):
+    """Packs page passages into chunks of at most token_budget tokens, marking where pages start."""
+    current, tokens = [], 0
+    for number, text in pages:
+        marker = f"[p. {number}]"
+        for passage in split_passages(text.replace("\r", "")):
+            passage_tokens = estimate_tokens(passage)
+            if current and tokens + passage_tokens > token_budget:
+                yield "\n".join(current)
+                current, tokens = [], 0
+            if marker:
+                current.append(marker)
+                marker = None
+            current.append(passage)
+            tokens += passage_tokens
+    if current:
+        yield "\n".join(current)
+
+
+# --- Map and reduce ---
+
+def _request(template, system, user, answer_tokens):
+    """A plain-text chat body built from template (model and generation options of the session)."""
+    data = {key: value for key, value in template.items() if key != "format"}
+    data["messages"] = [{"role": "system", "content": system}, {"role": "user", "content": user}]
+    data["options"] = {**template.get("options", {}), "num_ctx": DOC_NUM_CTX, "num_predict": answer_tokens}
+    return data
+
+
+def _map_chunk(chunk, key, chat, template):
+    response_json = chat(_request(template, MAP_PROMPT, chunk, MAP_MAX_TOKENS))
+    findings = response_json["message"]["content"].strip()
+    _cache_put(key, "findings", findings)
+    return findings
+
+
+def map_chunks(chunks, chat, template, workers):
+    """Condenses every chunk into findings, up to `workers` at once; cached chunks are reused.
+
+    chat(data) -> response dict is called from worker threads. Returns (findings in document
+    order, stats).
+    """
+    start = time.perf_counter()
+    stats = {"chunks": 0, "cached": 0}
+    model = template.get("model", "")
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        # Chunks are submitted as extraction produces them, so mapping overlaps extraction.
+        for chunk in chunks:
+            stats["chunks"] += 1
+            key = hashlib.sha1(f"{MAP_VERSION}\0{model}\0{chunk}".encode("utf-8")).hexdigest()
+            cached = _cache_get(key, "findings")
+            if cached is not None:
+                stats["cached"] += 1
+                results.append(cached)
+            else:
+                results.append(executor.submit(_map_chunk, chunk, key, chat, template))
+        findings = [r if isinstance(r, str) else r.result() for r in results]
+    stats["map_ms"] = (time.perf_counter() - start) * 1000
+    return findings, stats
+
+
+def reduce_findings(findings, question, chat, template, token_budget, workers=1):
+    """Merges findings against the question until they fit token_budget.
+
+    Returns (notes text, number of merge rounds).
+    """
+    rounds = 0
+    while len(findings) > 1 and estimate_tokens("\n\n".join(findings)) > token_budget:
+        rounds += 1
+        groups, current, tokens = [], [], 0
+        for note in findings:
+            note_tokens = estimate_tokens(note)
+            if current and tokens + note_tokens > token_budget:
+                groups.append(current)
+                current, tokens = [], 0
+            current.append(note)
+            tokens += note_tokens
+        groups.append(current)
+        if len(groups) == len(findings):
+            # Every note fills a group on its own: merge pairs so the loop always shrinks.
+            groups = [findings[i:i + 2] for i in range(0, len(findings), 2)]
+        system = f"{REDUCE_PROMPT}\n\nQuestion: {question}"
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            responses = executor.map(
+                lambda group: chat(_request(template, system, "\n\n".join(group), MAP_MAX_TOKENS)), groups)
+            findings = [response_json["message"]["content"].strip() for response_json in responses]
+    return "\n\n".join(findings), rounds
@@ -0,0 +1,111 @@
+"""Change-driven sampling of live camera frames for analysis.
+
+Analyzing every WebRTC frame would flood the Ollama backend with near-identical images. A
+frame is only analyzed when (a) no analysis of this session is in flight, (b) at least
+LIVE_MIN_INTERVAL_S has passed since the last one and (c) its perceptual hash differs from the
+last analyzed frame's by at least LIVE_CHANGE_BITS bits, i.e. the scene actually changed.
+The hash comes from a 32x32 luma thumbnail, so skipped frames cost next to nothing.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+HASH_INPUT = 32             # frames are hashed from a HASH_INPUT x HASH_INPUT luma thumbnail
+HASH_SIZE = 8               # low-frequency DCT block kept for the hash (64 bits)
+LIVE_MIN_INTERVAL_S = 3.0   # at most one analysis per session this often
+LIVE_CHANGE_BITS = 12       # hash bits that must differ for a frame to count as a new scene
+
+
+def _dct_matrix(n):
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT = _dct_matrix(HASH_INPUT)
+
+
+def phash(luma):
+    """64-bit perceptual hash (as a bool array) of a HASH_INPUT x HASH_INPUT luma array."""
+    coefficients = _DCT @ np.asarray(luma, dtype=np.float32) @ _DCT.T
+    block = coefficients[:HASH_SIZE, :HASH_SIZE].ravel()
+    # The DC term only tracks overall brightness, so it is left out of the median.
+    return block > np.median(block[1:])
+
+
+def hash_distance(a, b):
+    """Number of differing bits between two hashes."""
+    return int(np.count_nonzero(a != b))
+
+
+class LiveAnalyzer:
+    """Per-session gate between the video track and the analysis backend.
+
+    offer() is called from the WebRTC frame callback; analyze(jpeg_bytes) runs on a
+    single background thread and its return value becomes `result`.
+    """
+
+    def __init__(self, analyze, min_interval_s=LIVE_MIN_INTERVAL_S, change_bits=LIVE_CHANGE_BITS):
+        self.analyze = analyze
+        self.min_interval_s = min_interval_s
+        self.change_bits = change_bits
+        self.result = None
+        self.stats = {"frames": 0, "analyzed": 0, "skipped_busy": 0, "skipped_rate": 0, "skipped_unchanged": 0}
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        self._in_flight = False
+        self._last_hash = None
+        self._last_time = 0.0
+
+    def offer(self, luma, snapshot):
+        """Considers one frame; snapshot() returns its JPEG bytes and is only called if it is analyzed.
+
+        Returns True if the frame was sent for analysis.
+        """
+        with self._lock:
+            self.stats["frames"] += 1
+            if self._in_flight:
+                self.stats["skipped_busy"] += 1
+                return False
+            if time.monotonic() - self._last_time < self.min_interval_s:
+                self.stats["skipped_rate"] += 1
+                return False
+            frame_hash = phash(luma)
+            if self._last_hash is not None and hash_distance(frame_hash, self._last_hash) < self.change_bits:
+                self.stats["skipped_unchanged"] += 1
+                return False
+            self._in_flight = True
+            self._last_hash = frame_hash
+            self._last_time = time.monotonic()
+            self.stats["analyzed"] += 1
+        try:
+            self._executor.submit(self._run, snapshot())
+        except BaseException:
+            with self._lock:
+                self._in_flight = False
+            raise
+        return True
+
+    def reset(self):
+        """Forgets the last analyzed scene (e.g. after the question changed)."""
+        with self._lock:
+            self._last_hash = None
+            self._last_time = 0.0
+
+    def _run(self, jpeg_bytes):
+        try:
+            self.result = (time.time(), self.analyze(jpeg_bytes))
+        except Exception as e:  # the frame thread has no UI; keep the error for the script to show
+            logger.warning("Live analysis failed: %s", e)
+            self.result = (time.time(), (None, f"{type(e).__name__}: {e}"))
+        finally:
+            with self._lock:
+                self._in_flight = False
@@ -0,0 +1,146 @@
+"""gTTS with its text chunks fetched concurrently.
+
+gTTS splits text into ~100-character pieces and fetches them one after another on a fresh
+connection each, so a long (e.g. Korean) reason costs several sequential HTTPS round-trips.
+ParallelGTTS lets gTTS tokenize and package the pieces exactly as it would, then sends them
+concurrently over one pooled session, at most GTTS_MAX_CONCURRENT at a time across all
+callers, and concatenates the MP3 frames in order. That packaging is private gTTS API
+(gTTS._prepare_requests), so requirements.txt pins the tested gTTS; should it disappear anyway,
+synthesis falls back to stock gTTS.write_to_fp.
+
+Stock gTTS vs this, against a local fake endpoint with injected latency:
+    python gtts_parallel.py bench --latency 0.3 --language ko
+"""
+
+import argparse
+import base64
+import io
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from gtts import gTTS, gTTSError
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+GTTS_MAX_CONCURRENT = 4     # chunk requests in flight at once, across all syntheses
+GTTS_TIMEOUT_S = 10
+_AUDIO = re.compile(r'jQ1olc","\[\\"(.*)\\"]')   # the audio field of a batchexecute response
+
+
+class ParallelGTTS:
+    """Synthesizes with gTTS, fetching the text's chunks concurrently over a pooled session."""
+
+    def __init__(self, max_concurrent=GTTS_MAX_CONCURRENT, timeout=GTTS_TIMEOUT_S, url=None):
+        self.timeout = timeout
+        self.url = url   # overrides the endpoint, e.g. for the benchmark
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrent)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent)
+
+    def synthesize(self, text, language="en", slow=False):
+        """Returns the MP3 bytes for text; raises gTTSError like gTTS does."""
+        # gTTS's own tokenizer and request packaging, so the chunks match stock gTTS exactly.
+        tts = gTTS(text=text, lang=language, slow=slow)
+        try:
+            prepared = tts._prepare_requests()
+        except AttributeError:   # a gTTS release without the private API: fetch sequentially
+            logger.warning("gTTS has no _prepare_requests; falling back to sequential gTTS requests")
+            buffer = io.BytesIO()
+            tts.write_to_fp(buffer)
+            return buffer.getvalue()
+        if self.url:
+            for request in prepared:
+                request.url = self.url
+        return b"".join(self._executor.map(self._fetch, prepared))
+
+    def _fetch(self, request):
+        try:
+            # send() skips the environment (HTTP(S)_PROXY, NO_PROXY, REQUESTS_CA_BUNDLE); merge it like request() does.
+            settings = self._session.merge_environment_settings(request.url, {}, None, None, None)
+            response = self._session.send(request, timeout=self.timeout, **settings)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise gTTSError(f"TTS chunk request failed: {e}") from e
+        parts = []
+        for line in response.iter_lines(chunk_size=1024):
+            line = line.decode("utf-8")
+            if "jQ1olc" in line:
+                match = _AUDIO.search(line)
+                if not match:
+                    raise gTTSError("TTS response without audio")
+                parts.append(base64.b64decode(match.group(1)))
+        return b"".join(parts)
+
+    def close(self):
+        self._executor.shutdown()
+        self._session.close()
+
+
+# --- Benchmark ---
+
+def _fake_endpoint(latency_s):
+    """A local batchexecute stand-in that answers each chunk after latency_s; returns (url, server)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(latency_s)
+            audio = base64.b64encode(b"\xff\xf3" + body[:64]).decode("ascii")
+            payload = f')]}}\'\n\n[["wrb.fr","jQ1olc","[\\"{audio}\\"]",null,null,null,"generic"]]\n'.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/batchexecute", server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stock gTTS vs ParallelGTTS against a fake endpoint.")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per chunk request")
+    parser.add_argument("--language", default="ko")
+    parser.add_argument("--text", default="이 제품은 가격 대비 성능이 뛰어나고 보증 기간도 2년으로 충분합니다. " * 6)
+    args = parser.parse_args()
+
+    import gtts.tts
+
+    if not hasattr(gtts.tts, "_translate_url"):
+        raise SystemExit(f"gTTS {gtts.__version__} has no _translate_url to point at the fake endpoint")
+    url, server = _fake_endpoint(args.latency)
+    gtts.tts._translate_url = lambda tld, path: url   # point stock gTTS at the fake endpoint too
+    stock = gTTS(text=args.text, lang=args.language)
+    chunks = len(stock._prepare_requests())
+
+    expected = io.BytesIO()
+    start = time.perf_counter()
+    stock.write_to_fp(expected)
+    stock_s = time.perf_counter() - start
+
+    engine = ParallelGTTS(url=url)
+    start = time.perf_counter()
+    audio = engine.synthesize(args.text, args.language)
+    parallel_s = time.perf_counter() - start
+    engine.close()
+    server.shutdown()
+
+    print(f"{len(args.text)} chars -> {chunks} chunks at {args.latency * 1000:.0f} ms each")
+    print(f"stock gTTS   {stock_s * 1000:6.0f} ms")
+    print(f"ParallelGTTS {parallel_s * 1000:6.0f} ms ({stock_s / parallel_s:.1f}x), identical bytes: {audio == expected.getvalue()}")
+
+
+if __name__ == "__main__":
+    main()
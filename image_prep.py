@@ -0,0 +1,264 @@
+"""Image preprocessing before encode_image: orient, strip metadata, fit the model's tiles, re-encode.
+
+Vision models downsample to their own tile grid anyway, so sending a 12 MP photo only costs
+upload time and JSON size. Compare wire size and encode time on a folder of images with:
+
+    python image_prep.py bench samples/ --model llama3.2-vision
+
+Optionally the image is cropped to its salient region first (see salient_box), at the scale
+the whole image would have been sent at, so empty borders stop costing tiles. Tiles saved and
+answer agreement with and without the crop, on a folder of fixtures:
+
+    python image_prep.py crop-eval fixtures/ --host http://localhost:11434
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# --- Constants ---
+# Tile edge and the most tiles the model's image encoder uses per image.
+MODEL_IMAGE_GEOMETRY = {
+    "llama3.2-vision": {"tile": 560, "max_tiles": 4},
+    "llava": {"tile": 336, "max_tiles": 1},
+    "llava-llama3": {"tile": 336, "max_tiles": 1},
+    "minicpm-v": {"tile": 448, "max_tiles": 9},
+    "gemma3": {"tile": 896, "max_tiles": 1},
+}
+DEFAULT_GEOMETRY = {"tile": 560, "max_tiles": 4}
+OUTPUT_FORMAT = "JPEG"    # or "WEBP"
+OUTPUT_QUALITY = 85
+PASSTHROUGH_FORMATS = ("JPEG", "PNG", "WEBP")   # uploads the model accepts as they are
+ROI_ANALYSIS_EDGE = 256     # the edge map is computed on a copy this size
+ROI_EDGE_MIN = 12           # gradient (0-255) below which a pixel counts as flat
+ROI_ENERGY_TRIM = 0.01      # share of edge energy allowed outside the box on each side
+ROI_MARGIN = 0.06           # margin added around the box, as a share of the image edge
+ROI_MIN_TILES_SAVED = 1     # auto crop is only applied if it saves at least this many tiles
+
+
+def model_geometry(model):
+    """Tile geometry for a model name, ignoring any ':tag' suffix."""
+    return MODEL_IMAGE_GEOMETRY.get(model.split(":")[0], DEFAULT_GEOMETRY)
+
+
+def tile_count(width, height, tile):
+    """Number of tiles an image of this size covers."""
+    return math.ceil(width / tile) * math.ceil(height / tile)
+
+
+def fit_to_tiles(width, height, tile, max_tiles):
+    """Largest size (never upscaled) whose tile grid stays within max_tiles."""
+    best = None
+    for cols in range(1, max_tiles + 1):
+        rows = max_tiles // cols
+        scale = min(cols * tile / width, rows * tile / height, 1.0)
+        if best is None or scale > best:
+            best = scale
+    return max(1, round(width * best)), max(1, round(height * best))
+
+
+def wire_bytes(raw_size):
+    """Size of the base64 text that goes into the JSON body."""
+    return 4 * math.ceil(raw_size / 3)
+
+
+def salient_box(image):
+    """(left, top, right, bottom) around the image's edge energy plus a margin; None if there is none.
+
+    Flat regions (borders, backdrops, empty canvas) carry no gradient; the box keeps all but
+    ROI_ENERGY_TRIM of the gradient energy along each axis.
+    """
+    small = image.convert("L")
+    small.thumbnail((ROI_ANALYSIS_EDGE, ROI_ANALYSIS_EDGE))
+    pixels = np.asarray(small, dtype=np.float32)
+    edges = np.zeros_like(pixels)
+    edges[:, 1:] += np.abs(np.diff(pixels, axis=1))
+    edges[1:, :] += np.abs(np.diff(pixels, axis=0))
+    # Sensor noise and JPEG artifacts put small gradients everywhere; only clear edges count.
+    edges[edges < max(ROI_EDGE_MIN, 2 * float(np.median(edges)))] = 0
+    total = edges.sum()
+    if not total:
+        return None
+
+    def span(profile):
+        cumulative = np.cumsum(profile) / total
+        low = int(np.searchsorted(cumulative, ROI_ENERGY_TRIM))
+        high = int(np.searchsorted(cumulative, 1 - ROI_ENERGY_TRIM)) + 1
+        return low, min(high, len(profile))
+
+    left, right = span(edges.sum(axis=0))
+    top, bottom = span(edges.sum(axis=1))
+    scale_x, scale_y = image.width / small.width, image.height / small.height
+    margin_x, margin_y = ROI_MARGIN * image.width, ROI_MARGIN * image.height
+    return (max(0, int(left * scale_x - margin_x)), max(0, int(top * scale_y - margin_y)),
+            min(image.width, math.ceil(right * scale_x + margin_x)),
+            min(image.height, math.ceil(bottom * scale_y + margin_y)))
+
+
+def _scaled_size(box, scale):
+    left, top, right, bottom = box
+    return max(1, round((right - left) * scale)), max(1, round((bottom - top) * scale))
+
+
+def prepare_image(image_bytes, model, image_format=OUTPUT_FORMAT, quality=OUTPUT_QUALITY, crop=None):
+    """Returns (processed bytes, stats) ready for encode_image.
+
+    crop is None (whole image), "auto" (salient_box, if it saves tiles) or a manual
+    (left, top, right, bottom) box given as fractions of the oriented image. An upload that
+    already fits the tiles, carries no EXIF and would not shrink is returned unchanged.
+    """
+    start = time.perf_counter()
+    geometry = model_geometry(model)
+    image = Image.open(io.BytesIO(image_bytes))
+    original_size = image.size
+    passthrough = image.format in PASSTHROUGH_FORMATS and not image.getexif()   # EXIF may hold GPS or rotation
+    target = fit_to_tiles(*original_size, geometry["tile"], geometry["max_tiles"])
+    # JPEG can decode at 1/2, 1/4 or 1/8 scale directly, which skips most of the decode work.
+    # Both edges get the longer target edge so a pending EXIF rotation cannot leave one short.
+    image.draft("RGB", (max(target), max(target)))
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    target = fit_to_tiles(*image.size, geometry["tile"], geometry["max_tiles"])
+    tiles_uncropped = tile_count(*target, geometry["tile"])
+    # A crop keeps the scale the whole image would be sent at, so it saves tiles, not detail.
+    scale = target[0] / image.width
+    box = None
+    if crop == "auto":
+        box = salient_box(image)
+        if box and tile_count(*_scaled_size(box, scale), geometry["tile"]) > tiles_uncropped - ROI_MIN_TILES_SAVED:
+            box = None
+    elif crop:
+        left, top, right, bottom = crop
+        box = (round(left * image.width), round(top * image.height),
+               max(round(right * image.width), round(left * image.width) + 1),
+               max(round(bottom * image.height), round(top * image.height) + 1))
+    if box:
+        image = image.crop(box)
+        target = _scaled_size(box, scale)
+    if image.size != target:
+        image = image.resize(target, Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    # No exif/icc arguments: metadata (GPS, camera serials) is dropped on save.
+    image.save(buffer, format=image_format, quality=quality, optimize=True)
+    processed = buffer.getvalue()
+    kept_original = passthrough and box is None and image.size == original_size and len(processed) >= len(image_bytes)
+    if kept_original:   # e.g. a small PNG screenshot, which re-encoding only grows
+        processed = bytes(image_bytes)
+    stats = {
+        "bytes_in": len(image_bytes),
+        "bytes_out": len(processed),
+        "wire_bytes_in": wire_bytes(len(image_bytes)),
+        "wire_bytes_out": wire_bytes(len(processed)),
+        "size_in": original_size,
+        "size_out": image.size,
+        "tiles": tile_count(*image.size, geometry["tile"]),
+        "tiles_uncropped": tiles_uncropped,
+        "crop_box": box,
+        "kept_original": kept_original,
+        "encode_ms": (time.perf_counter() - start) * 1000,
+    }
+    return processed, stats
+
+
+def bench(folder, model, image_format=OUTPUT_FORMAT, quality=OUTPUT_QUALITY):
+    """Prints wire bytes and preprocessing time per image and in total."""
+    total_in = total_out = total_ms = 0
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+            continue
+        with open(os.path.join(folder, name), "rb") as f:
+            data = f.read()
+        _, stats = prepare_image(data, model, image_format, quality)
+        total_in += stats["wire_bytes_in"]
+        total_out += stats["wire_bytes_out"]
+        total_ms += stats["encode_ms"]
+        print(f"{name}: {stats['size_in']} -> {stats['size_out']} ({stats['tiles']} tiles), "
+              f"{stats['wire_bytes_in'] / 1024:.0f} KiB -> {stats['wire_bytes_out'] / 1024:.0f} KiB "
+              f"in {stats['encode_ms']:.0f} ms")
+    if total_in:
+        print(f"total: {total_in / 1024:.0f} KiB -> {total_out / 1024:.0f} KiB on the wire "
+              f"({total_out / total_in:.1%}), {total_ms:.0f} ms preprocessing")
+
+
+EVAL_PROMPT = ('Answer the question about the image as JSON: {"probability": <0-100, how advisable>, '
+               '"reason": "<one sentence>"}')
+
+
+def _ask(host, model, question, image_bytes):
+    """Probability (0-100) the model gives for the question about the image."""
+    import requests
+    from ollama_payload import EncodedImage, post_chat
+
+    data = {"model": model, "stream": False, "format": "json", "options": {"temperature": 0},
+            "messages": [{"role": "system", "content": EVAL_PROMPT},
+                         {"role": "user", "content": question, "images": [EncodedImage(image_bytes)]}]}
+    response = post_chat(requests, f"{host}/api/chat", data, timeout=300)
+    return float(json.loads(response["message"]["content"])["probability"])
+
+
+def crop_eval(folder, model, host=None):
+    """Tiles with and without auto crop per fixture, and (with host) whether the answers agree.
+
+    Questions come from questions.json ({"image name": "question"}) in the folder, if present.
+    Answers agree when both probabilities fall on the same side of 50.
+    """
+    questions_path = os.path.join(folder, "questions.json")
+    questions = {}
+    if os.path.exists(questions_path):
+        with open(questions_path, encoding="utf-8") as f:
+            questions = json.load(f)
+    tiles_full = tiles_cropped = cropped = agreed = asked = 0
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+            continue
+        with open(os.path.join(folder, name), "rb") as f:
+            data = f.read()
+        full, full_stats = prepare_image(data, model)
+        crop, crop_stats = prepare_image(data, model, crop="auto")
+        tiles_full += full_stats["tiles"]
+        tiles_cropped += crop_stats["tiles"]
+        line = f"{name}: {full_stats['tiles']} -> {crop_stats['tiles']} tiles"
+        if crop_stats["crop_box"]:
+            cropped += 1
+            line += f" (box {crop_stats['crop_box']})"
+            if host:
+                question = questions.get(name, "Should I buy this?")
+                p_full, p_crop = _ask(host, model, question, full), _ask(host, model, question, crop)
+                asked += 1
+                agreed += (p_full >= 50) == (p_crop >= 50)
+                line += f", probability {p_full:.0f} vs {p_crop:.0f}"
+        print(line)
+    if tiles_full:
+        print(f"total: {tiles_full} -> {tiles_cropped} tiles ({1 - tiles_cropped / tiles_full:.1%} saved), "
+              f"{cropped} images cropped")
+    if asked:
+        print(f"answer agreement on cropped images: {agreed}/{asked} ({agreed / asked:.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure image preprocessing savings.")
+    parser.add_argument("command", choices=["bench", "crop-eval"])
+    parser.add_argument("folder")
+    parser.add_argument("--model", default="llama3.2-vision")
+    parser.add_argument("--format", default=OUTPUT_FORMAT)
+    parser.add_argument("--quality", type=int, default=OUTPUT_QUALITY)
+    parser.add_argument("--host", help="Ollama host for the crop-eval agreement check")
+    args = parser.parse_args()
+    if args.command == "bench":
+        bench(args.folder, args.model, args.format.upper(), args.quality)
+    else:
+        crop_eval(args.folder, args.model, args.host)
@@ -0,0 +1,154 @@
+"""Process-pool image worker shared by every Streamlit session in the server process.
+
+Decode, resize and re-encode (image_prep.prepare_image) hold the GIL for most of their run, so
+doing them on a session's script thread stalls every other session's reruns. Here the upload
+is copied once into a shared-memory block, a worker process attaches to it by name (no
+pickling of the image), and the caller gets a concurrent.futures.Future back. Submissions
+beyond the pool's queue depth wait up to BUSY_TIMEOUT_S and then raise ImagePoolBusy.
+
+Compare script-thread stalls with inline vs pooled preprocessing:
+    python image_worker.py bench samples/ --sessions 8
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+from image_prep import prepare_image, OUTPUT_FORMAT, OUTPUT_QUALITY
+from ocr_route import read_text
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", os.cpu_count() or 1))
+QUEUE_DEPTH = 2          # queued jobs per worker before submit starts waiting
+BUSY_TIMEOUT_S = 2.0     # how long submit waits for a free slot before giving up
+
+
+class ImagePoolBusy(RuntimeError):
+    """Raised when every worker slot stayed taken for BUSY_TIMEOUT_S."""
+
+
+def _ping():
+    return os.getpid()
+
+
+def _run_shared(function, name, size, *args):
+    """Worker side: calls function(image, *args) on an image held in a shared-memory block."""
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        view = block.buf[:size]
+        try:
+            return function(view, *args)
+        finally:
+            view.release()
+    finally:
+        block.close()
+
+
+class ImageWorkerPool:
+    """Runs prepare_image (and OCR) in worker processes; see the module docstring."""
+
+    def __init__(self, workers=IMAGE_WORKERS, queue_depth=QUEUE_DEPTH):
+        self.workers = workers
+        # spawn everywhere: forking a process that runs Streamlit's threads is not safe.
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self._slots = threading.BoundedSemaphore(workers * queue_depth)
+
+    def warm(self):
+        """Starts the worker processes now so the first upload does not pay for their startup."""
+        for future in [self._executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def submit(self, image_bytes, model, image_format=OUTPUT_FORMAT, quality=OUTPUT_QUALITY, crop=None,
+               timeout=BUSY_TIMEOUT_S):
+        """Queues image_bytes for prepare_image; returns a Future of (processed bytes, stats)."""
+        return self._submit(prepare_image, image_bytes, (model, image_format, quality, crop), timeout)
+
+    def read_text(self, image_bytes, timeout=BUSY_TIMEOUT_S):
+        """Queues image_bytes for ocr_route.read_text; returns a Future of its result dict."""
+        return self._submit(read_text, image_bytes, (), timeout)
+
+    def _submit(self, function, image_bytes, args, timeout):
+        if not self._slots.acquire(timeout=timeout):
+            raise ImagePoolBusy(f"all {self.workers} image workers are busy")
+        block = None
+        try:
+            size = len(image_bytes)
+            block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+            block.buf[:size] = image_bytes
+            future = self._executor.submit(_run_shared, function, block.name, size, *args)
+        except BaseException:
+            if block is not None:
+                block.close()
+                block.unlink()
+            self._slots.release()
+            raise
+
+        def release(_):
+            block.close()
+            block.unlink()
+            self._slots.release()
+
+        future.add_done_callback(release)
+        return future
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Benchmark ---
+
+def _probe(stop, stalls, interval=0.005):
+    """Stands in for another session's script thread: records how late each short sleep wakes."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        time.sleep(interval)
+        stalls.append((time.perf_counter() - start - interval) * 1000)
+
+
+def bench(folder, model, sessions):
+    """Preprocesses every image from `sessions` threads, inline and pooled; prints throughput and stalls."""
+    images = []
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+            with open(os.path.join(folder, name), "rb") as f:
+                images.append(f.read())
+    if not images:
+        raise SystemExit(f"No images in {folder}")
+    pool = ImageWorkerPool()
+    pool.warm()
+    runs = {
+        "inline": lambda data: prepare_image(data, model),
+        "pool": lambda data: pool.submit(data, model, timeout=None).result(),
+    }
+    for mode, run in runs.items():
+        stop, stalls = threading.Event(), []
+        probe = threading.Thread(target=_probe, args=(stop, stalls))
+        probe.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as sessions_pool:
+            list(sessions_pool.map(run, images * sessions))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        probe.join()
+        stalls.sort()
+        p99 = stalls[int(0.99 * (len(stalls) - 1))]
+        print(f"{mode:6s} {len(images) * sessions / elapsed:6.1f} images/s, "
+              f"script-thread stall p99 {p99:.1f} ms, max {stalls[-1]:.1f} ms")
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure pooled vs inline image preprocessing.")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("folder")
+    parser.add_argument("--model", default="llama3.2-vision")
+    parser.add_argument("--sessions", type=int, default=8)
+    args = parser.parse_args()
+    bench(args.folder, args.model, args.sessions)
@@ -0,0 +1,415 @@
+"""Offline BM25 search over a local folder of text, Markdown and HTML files.
+
+Build or update an index (only new or changed files are re-read):
+    python local_index.py build docs/ --index local_index
+Query it:
+    python local_index.py query local_index "should I refinance my mortgage?"
+Merge segments and measure query latency:
+    python local_index.py compact local_index
+    python local_index.py bench local_index
+"""
+
+import argparse
+import html.parser
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import time
+from array import array
+
+import numpy as np
+
+from context_packer import tokenize
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+DOC_EXTENSIONS = (".txt", ".md", ".markdown", ".html", ".htm")
+PASSAGE_WORDS = 120      # target passage length in words
+MAX_SEGMENTS = 8         # compact automatically once an update leaves more segments than this
+MAX_DF_RATIO = 0.25      # skip terms occurring in more than this share of passages (near-zero idf)
+MIN_PASSAGES_FOR_DF_CUT = 100   # below this, a common term is not a stopword, just a small corpus
+BM25_K1 = 1.2
+BM25_B = 0.75
+MANIFEST = "manifest.json"
+
+
+# --- Document reading ---
+
+class _TextExtractor(html.parser.HTMLParser):
+    """Collects visible text from HTML, skipping scripts, styles and page chrome."""
+
+    SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "template"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "section", "article"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(markup):
+    """Returns the visible text of an HTML document."""
+    extractor = _TextExtractor()
+    extractor.feed(markup)
+    extractor.close()
+    return "".join(extractor.parts)
+
+
+def read_document(path):
+    """Reads a supported file as plain text."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    if path.lower().endswith((".html", ".htm")):
+        text = html_to_text(text)
+    return text
+
+
+def split_passages(text, passage_words=PASSAGE_WORDS):
+    """Splits text into passages of about passage_words words, filled paragraph by paragraph."""
+    passages, current = [], []
+    for paragraph in text.split("\n\n"):
+        words = paragraph.split()
+        while words:
+            room = passage_words - len(current)
+            current.extend(words[:room])
+            words = words[room:]
+            if len(current) >= passage_words:
+                passages.append(" ".join(current))
+                current = []
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def iter_document_files(root):
+    """Yields supported document paths under root in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(DOC_EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+
+# --- Segment writing ---
+
+def _write_segment(seg_dir, sources):
+    """Writes one immutable segment from (path, passages) pairs."""
+    os.makedirs(seg_dir, exist_ok=True)
+    postings = {}
+    doc_lengths = array("I")
+    text_offsets = array("Q", [0])
+    ranges = []
+
+    with open(os.path.join(seg_dir, "text.bin"), "wb") as text_file:
+        for path, passages in sources:
+            first = len(doc_lengths)
+            for passage in passages:
+                doc_id = len(doc_lengths)
+                tokens = tokenize(passage)
+                doc_lengths.append(len(tokens))
+                counts = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, tf in counts.items():
+                    entry = postings.get(token)
+                    if entry is None:
+                        entry = postings[token] = (array("I"), array("H"))
+                    entry[0].append(doc_id)
+                    entry[1].append(min(tf, 0xFFFF))
+                data = passage.encode("utf-8")
+                text_file.write(data)
+                text_offsets.append(text_offsets[-1] + len(data))
+            ranges.append([path, first, len(doc_lengths) - first])
+
+    terms, doc_ids, tfs = {}, array("I"), array("H")
+    for term in sorted(postings):
+        ids, freqs = postings[term]
+        terms[term] = [len(doc_ids), len(ids)]
+        doc_ids.extend(ids)
+        tfs.extend(freqs)
+
+    np.save(os.path.join(seg_dir, "postings_docs.npy"), np.frombuffer(doc_ids, dtype=np.uint32))
+    np.save(os.path.join(seg_dir, "postings_tfs.npy"), np.frombuffer(tfs, dtype=np.uint16))
+    np.save(os.path.join(seg_dir, "doc_lengths.npy"), np.frombuffer(doc_lengths, dtype=np.uint32))
+    np.save(os.path.join(seg_dir, "text_offsets.npy"), np.frombuffer(text_offsets, dtype=np.uint64))
+    with open(os.path.join(seg_dir, "terms.json"), "w", encoding="utf-8") as f:
+        json.dump(terms, f, ensure_ascii=False, separators=(",", ":"))
+    with open(os.path.join(seg_dir, "sources.json"), "w", encoding="utf-8") as f:
+        json.dump({"ranges": ranges, "deleted": []}, f, ensure_ascii=False)
+    return len(doc_lengths)
+
+
+def _load_manifest(index_dir):
+    path = os.path.join(index_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {"files": {}, "segments": [], "next_segment": 0}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(index_dir, manifest):
+    tmp = os.path.join(index_dir, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, os.path.join(index_dir, MANIFEST))
+
+
+def _mark_deleted(index_dir, segment, path):
+    """Tombstones every passage of path in the given segment."""
+    sources_path = os.path.join(index_dir, segment, "sources.json")
+    with open(sources_path, encoding="utf-8") as f:
+        sources = json.load(f)
+    for source, first, count in sources["ranges"]:
+        if source == path:
+            sources["deleted"].append([first, count])
+    with open(sources_path, "w", encoding="utf-8") as f:
+        json.dump(sources, f, ensure_ascii=False)
+
+
+def build_index(docs_dir, index_dir):
+    """Creates or incrementally updates the index for docs_dir.
+
+    Unchanged files are skipped; changed and removed files are tombstoned in their old
+    segment and changed or new files are written to a fresh segment.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    manifest = _load_manifest(index_dir)
+    seen, changed = set(), []
+
+    for path in iter_document_files(docs_dir):
+        key = os.path.relpath(path, docs_dir)
+        seen.add(key)
+        stat = os.stat(path)
+        entry = manifest["files"].get(key)
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            continue
+        if entry:
+            _mark_deleted(index_dir, entry["segment"], key)
+        changed.append((key, path, stat))
+
+    for key in set(manifest["files"]) - seen:
+        _mark_deleted(index_dir, manifest["files"].pop(key)["segment"], key)
+
+    if changed:
+        segment = f"seg_{manifest['next_segment']:05d}"
+        manifest["next_segment"] += 1
+        sources = ((key, split_passages(read_document(path))) for key, path, _ in changed)
+        count = _write_segment(os.path.join(index_dir, segment), sources)
+        manifest["segments"].append(segment)
+        for key, _, stat in changed:
+            manifest["files"][key] = {"mtime": stat.st_mtime, "size": stat.st_size, "segment": segment}
+        logger.info("Indexed %d files (%d passages) into %s", len(changed), count, segment)
+
+    _save_manifest(index_dir, manifest)
+    if len(manifest["segments"]) > MAX_SEGMENTS:
+        compact_index(index_dir)
+    return len(changed)
+
+
+def compact_index(index_dir):
+    """Merges all segments into one, dropping tombstoned passages."""
+    manifest = _load_manifest(index_dir)
+    index = LocalIndex(index_dir)
+
+    def live_sources():
+        for seg in index.segments:
+            for path, first, count in seg.ranges:
+                passages = [seg.passage(i) for i in range(first, first + count) if not seg.deleted[i]]
+                if passages:
+                    yield path, passages
+
+    segment = f"seg_{manifest['next_segment']:05d}"
+    manifest["next_segment"] += 1
+    _write_segment(os.path.join(index_dir, segment), live_sources())
+    old_segments = manifest["segments"]
+    manifest["segments"] = [segment]
+    for entry in manifest["files"].values():
+        entry["segment"] = segment
+    _save_manifest(index_dir, manifest)
+    del index
+    for old in old_segments:
+        shutil.rmtree(os.path.join(index_dir, old), ignore_errors=True)
+
+
+# --- Querying ---
+
+class _Segment:
+    """Memory-mapped view of one on-disk segment."""
+
+    def __init__(self, seg_dir):
+        self.docs = np.load(os.path.join(seg_dir, "postings_docs.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(seg_dir, "postings_tfs.npy"), mmap_mode="r")
+        self.doc_lengths = np.load(os.path.join(seg_dir, "doc_lengths.npy"), mmap_mode="r")
+        self.text_offsets = np.load(os.path.join(seg_dir, "text_offsets.npy"), mmap_mode="r")
+        self.text = np.memmap(os.path.join(seg_dir, "text.bin"), dtype=np.uint8, mode="r") \
+            if os.path.getsize(os.path.join(seg_dir, "text.bin")) else np.zeros(0, dtype=np.uint8)
+        with open(os.path.join(seg_dir, "terms.json"), encoding="utf-8") as f:
+            self.terms = json.load(f)
+        with open(os.path.join(seg_dir, "sources.json"), encoding="utf-8") as f:
+            sources = json.load(f)
+        self.ranges = sources["ranges"]
+        self.deleted = np.zeros(len(self.doc_lengths), dtype=bool)
+        for first, count in sources["deleted"]:
+            self.deleted[first:first + count] = True
+        self.size = len(self.doc_lengths)
+        self.live = self.size - int(self.deleted.sum())
+        self.norm = None
+
+    def prepare(self, avgdl, k1, b):
+        """Precomputes the BM25 length normalisation for the current average length."""
+        self.norm = (k1 * (1 - b + b * np.asarray(self.doc_lengths, dtype=np.float32) / avgdl)).astype(np.float32)
+
+    def passage(self, i):
+        start, end = int(self.text_offsets[i]), int(self.text_offsets[i + 1])
+        return self.text[start:end].tobytes().decode("utf-8")
+
+    def source(self, i):
+        for path, first, count in self.ranges:
+            if first <= i < first + count:
+                return path
+        return None
+
+
+class LocalIndex:
+    """BM25 searcher over all live segments of an index directory."""
+
+    def __init__(self, index_dir, k1=BM25_K1, b=BM25_B):
+        manifest = _load_manifest(index_dir)
+        self.segments = [_Segment(os.path.join(index_dir, name)) for name in manifest["segments"]]
+        self.k1, self.b = k1, b
+        self.num_passages = sum(seg.live for seg in self.segments)
+        total_length = sum(int(np.asarray(seg.doc_lengths, dtype=np.uint64)[~seg.deleted].sum())
+                           for seg in self.segments)
+        avgdl = total_length / self.num_passages if self.num_passages else 1.0
+        for seg in self.segments:
+            seg.prepare(avgdl, k1, b)
+
+    def _idf(self, term):
+        # Document frequencies include tombstoned passages until the next compaction.
+        df = sum(seg.terms[term][1] for seg in self.segments if term in seg.terms)
+        if not df:
+            return 0.0, 0
+        return math.log(1 + (self.num_passages - df + 0.5) / (df + 0.5)), df
+
+    def search(self, query, k=5):
+        """Returns up to k (score, passage, source) tuples for the query, best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        found = {}
+        for term in terms:
+            idf, df = self._idf(term)
+            if df:
+                found[term] = (idf, df)
+        if not found:
+            return []
+        # BM25's idf already down-weights common terms; the cut only skips stopword-like terms'
+        # long posting lists on large corpora, and never drops every term of the query.
+        weights = {term: idf for term, (idf, df) in found.items()
+                   if self.num_passages < MIN_PASSAGES_FOR_DF_CUT or df <= MAX_DF_RATIO * self.num_passages}
+        weights = weights or {term: idf for term, (idf, _) in found.items()}
+
+        candidates = []
+        for seg in self.segments:
+            if not seg.live:
+                continue
+            scores = np.zeros(seg.size, dtype=np.float32)
+            touched = []
+            for term, idf in weights.items():
+                entry = seg.terms.get(term)
+                if entry is None:
+                    continue
+                start, count = entry
+                ids = seg.docs[start:start + count]
+                tf = seg.tfs[start:start + count].astype(np.float32)
+                # Doc ids are unique within a posting list, so fancy-index accumulation is safe.
+                scores[ids] += idf * tf * (self.k1 + 1) / (tf + seg.norm[ids])
+                touched.append(ids)
+            if not touched:
+                continue
+            # Rank only passages that matched a term instead of scanning the whole segment.
+            ids = np.unique(np.concatenate(touched))
+            ids = ids[~seg.deleted[ids]]
+            if not len(ids):
+                continue
+            top = min(k, len(ids))
+            best = ids[np.argpartition(-scores[ids], top - 1)[:top]]
+            candidates.extend((float(scores[i]), seg, int(i)) for i in best)
+
+        candidates.sort(key=lambda c: -c[0])
+        return [(score, seg.passage(i), seg.source(i)) for score, seg, i in candidates[:k]]
+
+    def context_for(self, query, k=5):
+        """Returns the top passages as a list of strings, ready for pack_context."""
+        return [passage for _, passage, _ in self.search(query, k)]
+
+
+# --- CLI ---
+
+def bench_index(index_dir, num_queries=200, k=5):
+    """Times random 2-3 term queries drawn from the index vocabulary."""
+    index = LocalIndex(index_dir)
+    vocabulary = [t for seg in index.segments for t in seg.terms]
+    rng = random.Random(0)
+    timings = []
+    for _ in range(num_queries):
+        query = " ".join(rng.sample(vocabulary, min(len(vocabulary), rng.choice((2, 3)))))
+        start = time.perf_counter()
+        index.search(query, k)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"passages={index.num_passages} segments={len(index.segments)} queries={num_queries}")
+    print(f"p50={timings[len(timings) // 2]:.2f} ms  p95={timings[int(len(timings) * 0.95) - 1]:.2f} ms"
+          f"  max={timings[-1]:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local BM25 index for offline search context.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="create or incrementally update an index")
+    build.add_argument("docs_dir")
+    build.add_argument("--index", default="local_index")
+    query = sub.add_parser("query", help="run a query")
+    query.add_argument("index_dir")
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=5)
+    compact = sub.add_parser("compact", help="merge segments and drop deleted passages")
+    compact.add_argument("index_dir")
+    bench = sub.add_parser("bench", help="measure query latency")
+    bench.add_argument("index_dir")
+    bench.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "build":
+        changed = build_index(args.docs_dir, args.index)
+        print(f"{changed} file(s) (re)indexed")
+    elif args.command == "query":
+        for score, passage, source in LocalIndex(args.index_dir).search(args.text, args.k):
+            print(f"[{score:.2f}] {source}: {passage[:200]}")
+    elif args.command == "compact":
+        compact_index(args.index_dir)
+    elif args.command == "bench":
+        bench_index(args.index_dir, args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""OCR-first fast path for text-heavy images (chart screenshots, receipts, spec pages).
+
+A cheap NumPy pre-classifier decides whether an image is text-dominant. Only those images go
+through Tesseract, and only a confident, non-trivial reading is used: the app then sends the
+question plus the extracted text to a fast text model and skips the vision prefill. Every
+routed analysis is logged so the routing share and latency per path can be compared:
+
+    python ocr_route.py report
+"""
+
+import argparse
+import bisect
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+try:
+    import pytesseract
+except ImportError:  # optional; without it every image takes the vision path
+    pytesseract = None
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+OCR_LOG_PATH = os.environ.get("OCR_LOG_PATH", os.path.join(".cache", "ocr_route_log.jsonl"))
+OCR_LANGUAGES = os.environ.get("OCR_LANGUAGES", "eng+kor")
+CLASSIFY_EDGE = 1024          # the pre-classifier looks at a copy this size
+MIN_FLAT_SHARE = 0.45         # documents and screenshots are mostly flat background
+MIN_TEXT_ROW_SHARE = 0.2      # ...and many rows cross glyph strokes
+ROW_TRANSITIONS = 0.03        # black/white changes per pixel that mark a row as text
+OCR_MIN_CONFIDENCE = 70       # mean Tesseract word confidence (0-100) needed to trust the text
+OCR_MIN_WORDS = 8             # fewer words than this is not worth routing on
+OCR_MAX_CHARS = 6000          # cap on the text passed to the text model
+
+
+def text_layout(image):
+    """Returns (flat share, text-row share) for a PIL image; both high means text-dominant."""
+    gray = image.convert("L")
+    gray.thumbnail((CLASSIFY_EDGE, CLASSIFY_EDGE))
+    pixels = np.asarray(gray, dtype=np.int16)
+    gradient = np.abs(np.diff(pixels, axis=1))
+    flat_share = float((gradient < 4).mean())
+    # Otsu threshold, then count black/white changes along each row.
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    if np.count_nonzero(histogram) < 2:   # one flat colour (blank screenshot): no threshold, no text
+        return flat_share, 0.0
+    weights = np.cumsum(histogram)
+    means = np.cumsum(histogram * np.arange(256))
+    total, total_mean = weights[-1], means[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (total_mean * weights / total - means) ** 2 / (weights * (total - weights))
+    threshold = int(np.nanargmax(between))
+    binary = pixels > threshold
+    transitions = np.count_nonzero(binary[:, 1:] != binary[:, :-1], axis=1) / binary.shape[1]
+    return flat_share, float((transitions > ROW_TRANSITIONS).mean())
+
+
+def read_text(image_bytes):
+    """Classifies the image and OCRs it if it looks text-dominant.
+
+    Returns a dict with 'text' (None unless the reading is usable), 'confidence', 'words',
+    'text_dominant' and 'ocr_ms'. Meant to run in the image worker pool.
+    """
+    start = time.perf_counter()
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+    flat_share, text_rows = text_layout(image)
+    result = {"text": None, "confidence": 0.0, "words": 0, "ocr_ms": 0.0,
+              "text_dominant": flat_share >= MIN_FLAT_SHARE and text_rows >= MIN_TEXT_ROW_SHARE}
+    if not result["text_dominant"] or pytesseract is None:
+        return result
+    try:
+        data = pytesseract.image_to_data(image.convert("L"), lang=OCR_LANGUAGES, output_type=pytesseract.Output.DICT)
+    except (pytesseract.TesseractError, OSError) as e:
+        logger.warning("OCR failed: %s", e)
+        return result
+    lines = {}
+    confidences = []
+    for word, conf, block, par, line in zip(data["text"], data["conf"], data["block_num"], data["par_num"], data["line_num"]):
+        if word.strip() and float(conf) >= 0:
+            lines.setdefault((block, par, line), []).append(word)
+            confidences.append(float(conf))
+    result["words"] = len(confidences)
+    result["confidence"] = sum(confidences) / len(confidences) if confidences else 0.0
+    result["ocr_ms"] = (time.perf_counter() - start) * 1000
+    if result["words"] >= OCR_MIN_WORDS and result["confidence"] >= OCR_MIN_CONFIDENCE:
+        result["text"] = "\n".join(" ".join(words) for words in lines.values())[:OCR_MAX_CHARS]
+    return result
+
+
+# --- Routing log ---
+
+def log_route(route, latency_ms, path=OCR_LOG_PATH):
+    """Appends one analysis: route is 'ocr' or 'vision', latency_ms the end-to-end analysis time."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"ts": time.time(), "route": route, "latency_ms": latency_ms}) + "\n")
+
+
+_report_totals = {}   # path -> sorted latencies per route and the log offset they cover
+_report_lock = threading.Lock()
+
+
+def _latencies(path):
+    """Sorted latencies per route, updated from the lines appended since the last call (the log only grows)."""
+    with _report_lock:
+        totals = _report_totals.get(path)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if totals is None or size < totals["offset"]:   # first call, or the log was replaced
+            totals = _report_totals[path] = {"offset": 0, "routes": {}}
+        if size > totals["offset"]:
+            with open(path, "rb") as f:
+                f.seek(totals["offset"])
+                data = f.read(size - totals["offset"])
+            complete = data[:data.rfind(b"\n") + 1]   # a line still being written is read next time
+            for line in complete.decode("utf-8").splitlines():
+                if line.strip():
+                    r = json.loads(line)
+                    bisect.insort(totals["routes"].setdefault(r["route"], []), r["latency_ms"])
+            totals["offset"] += len(complete)
+        return {route: list(latencies) for route, latencies in totals["routes"].items()}
+
+
+def report(path=OCR_LOG_PATH):
+    """Share of analyses per route and their mean and p95 latency.
+
+    Cheap to call on every rerun: only log lines appended since the previous call are parsed.
+    """
+    by_route = _latencies(path)
+    count = sum(len(latencies) for latencies in by_route.values())
+    routes = {}
+    for route in ("ocr", "vision"):
+        latencies = by_route.get(route)
+        if latencies:
+            routes[route] = {
+                "share": len(latencies) / count,
+                "mean_ms": sum(latencies) / len(latencies),
+                "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+            }
+    return routes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR fast-path routing report.")
+    parser.add_argument("command", choices=["report", "classify"])
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--log", default=OCR_LOG_PATH)
+    args = parser.parse_args()
+    if args.command == "report":
+        for route_name, stats in report(args.log).items():
+            print(f"{route_name:6s} share={stats['share']:.1%} mean={stats['mean_ms']:.0f} ms p95={stats['p95_ms']:.0f} ms")
+    else:
+        for image_path in args.images:
+            with Image.open(image_path) as img:
+                flat, rows = text_layout(img)
+            print(f"{image_path}: flat={flat:.2f} text_rows={rows:.2f} "
+                  f"text_dominant={flat >= MIN_FLAT_SHARE and rows >= MIN_TEXT_ROW_SHARE}")
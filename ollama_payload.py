@@ -0,0 +1,191 @@
+"""Copy-light request bodies for Ollama chat calls with images.
+
+The usual path holds an image as bytes, then a base64 str, then inside json.dumps output, then
+inside the encoded request body. Here each image is base64-encoded once, straight into a
+preallocated buffer, the rest of the body is serialized with orjson, and the body is streamed
+to the socket piece by piece with an exact Content-Length.
+
+Peak RSS per concurrent upload, old path vs this one (each mode runs in a fresh process):
+    python ollama_payload.py bench photo.jpg --concurrency 8
+"""
+
+import argparse
+import base64
+import binascii
+import json
+import math
+import subprocess
+import sys
+import threading
+import uuid
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is only slower
+    orjson = None
+
+# --- Constants ---
+ENCODE_CHUNK = 3 * 16384   # multiple of 3 so chunks encode without padding
+SEND_CHUNK = 256 * 1024    # largest slice handed to the socket at once
+
+
+def dumps(obj):
+    """Serializes obj to UTF-8 JSON bytes with the fastest available encoder."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    """Parses JSON bytes with the fastest available decoder."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class EncodedImage:
+    """An image base64-encoded once into a preallocated buffer."""
+
+    def __init__(self, image_bytes):
+        source = memoryview(image_bytes).cast("B")
+        self.buffer = bytearray(4 * math.ceil(len(source) / 3))
+        out = memoryview(self.buffer)
+        position = 0
+        for start in range(0, len(source), ENCODE_CHUNK):
+            encoded = binascii.b2a_base64(source[start:start + ENCODE_CHUNK], newline=False)
+            out[position:position + len(encoded)] = encoded
+            position += len(encoded)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __str__(self):
+        # Only for callers that need a plain str (e.g. debugging); the body path never calls it.
+        return self.buffer.decode("ascii")
+
+
+class _PreEncoded:
+    """Wraps an image that is already a base64 str (legacy callers) without re-encoding it."""
+
+    def __init__(self, text):
+        self.buffer = text.encode("ascii")
+
+
+class ChatBody:
+    """Iterable JSON body for POST /api/chat whose images are streamed from their buffers.
+
+    requests sends an iterable with a __len__ using Content-Length instead of chunked encoding.
+    """
+
+    def __init__(self, data):
+        images = {}
+
+        def swap(message):
+            if not message.get("images"):
+                return message
+            placeholders = []
+            for image in message["images"]:
+                if isinstance(image, str):
+                    image = _PreEncoded(image)
+                elif not isinstance(image, EncodedImage):
+                    image = EncodedImage(image)
+                key = f"__image_{uuid.uuid4().hex}__"
+                images[key] = image
+                placeholders.append(key)
+            return {**message, "images": placeholders}
+
+        skeleton = dumps({**data, "messages": [swap(m) for m in data["messages"]]})
+        # Split the serialized skeleton around each placeholder (quotes stay in the JSON parts).
+        self.parts = []
+        rest = skeleton
+        for key, image in images.items():
+            before, rest = rest.split(key.encode("ascii"), 1)
+            self.parts.append(before)
+            self.parts.append(memoryview(image.buffer))
+        self.parts.append(rest)
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def __iter__(self):
+        for part in self.parts:
+            for start in range(0, len(part), SEND_CHUNK):
+                yield part[start:start + SEND_CHUNK]
+
+
+def post_chat(session_or_requests, url, data, **kwargs):
+    """POSTs a chat request with a streamed body and returns the parsed JSON response."""
+    headers = {"Content-Type": "application/json", **kwargs.pop("headers", {})}
+    response = session_or_requests.post(url, data=ChatBody(data), headers=headers, **kwargs)
+    response.raise_for_status()
+    return loads(response.content)
+
+
+def stream_chat(session_or_requests, url, data, **kwargs):
+    """POSTs a chat request with stream=True and yields each parsed chunk as it arrives."""
+    headers = {"Content-Type": "application/json", **kwargs.pop("headers", {})}
+    with session_or_requests.post(url, data=ChatBody(data), headers=headers, stream=True, **kwargs) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield loads(line)
+
+
+# --- Benchmark ---
+
+def _peak_rss_kib():
+    import resource  # POSIX only; the benchmark is not needed on Windows app hosts
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _run_mode(mode, image_path, concurrency):
+    """Builds and drains `concurrency` bodies at once; prints the peak RSS growth."""
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    baseline = _peak_rss_kib()
+    barrier = threading.Barrier(concurrency)
+    keep = []
+
+    def upload():
+        # Hold every body until all threads have built theirs, like simultaneous uploads would.
+        if mode == "legacy":
+            encoded = base64.b64encode(image_bytes).decode("utf-8")
+            body = json.dumps({"model": "m", "messages": [{"role": "user", "content": "q", "images": [encoded]}]})
+            payload = body.encode("utf-8")
+            keep.append((encoded, body, payload))
+        else:
+            body = ChatBody({"model": "m", "messages": [{"role": "user", "content": "q",
+                                                         "images": [EncodedImage(image_bytes)]}]})
+            keep.append(body)
+            for _ in body:
+                pass
+        barrier.wait()
+
+    threads = [threading.Thread(target=upload) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    growth = _peak_rss_kib() - baseline
+    print(f"{mode:9s} image={len(image_bytes) / 1024:.0f} KiB concurrency={concurrency} "
+          f"peak RSS +{growth / 1024:.1f} MiB ({growth / concurrency / 1024:.1f} MiB per upload)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of request body paths.")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("image")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mode", choices=["legacy", "streaming"])
+    args = parser.parse_args()
+    if args.mode:
+        _run_mode(args.mode, args.image, args.concurrency)
+        return
+    for mode in ("legacy", "streaming"):
+        subprocess.run([sys.executable, __file__, "bench", args.image,
+                        "--concurrency", str(args.concurrency), "--mode", mode], check=True)
+
+
+if __name__ == "__main__":
+    main()
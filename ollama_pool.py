@@ -0,0 +1,72 @@
+"""Ollama backends with a per-backend concurrency limit, shared by every session in the process.
+
+Each backend serves OLLAMA_NUM_PARALLEL requests at once; anything beyond that only queues
+inside Ollama, where it holds a connection and adds nothing. The pool caps in-flight requests
+per backend and sends each request to the least-busy one, so gallery analyses and concurrent
+sessions spread over all configured servers. A conversation can instead pin its host so that
+follow-ups hit the server that already holds its prompt (KV) cache.
+"""
+
+import contextlib
+import threading
+
+import requests
+
+from ollama_payload import post_chat, stream_chat
+
+# --- Constants ---
+MAX_CONCURRENT_PER_BACKEND = 2   # match the server's OLLAMA_NUM_PARALLEL
+REQUEST_TIMEOUT_S = 300
+
+
+class BackendPool:
+    """Least-busy routing over hosts, each limited to max_concurrent in-flight requests."""
+
+    def __init__(self, hosts, max_concurrent=MAX_CONCURRENT_PER_BACKEND):
+        self.hosts = list(dict.fromkeys(host.strip().rstrip("/") for host in hosts))
+        self.max_concurrent = max_concurrent
+        self._slots = {host: threading.BoundedSemaphore(max_concurrent) for host in self.hosts}
+        self._active = {host: 0 for host in self.hosts}
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self):
+        """Requests that can be in flight at once across all backends."""
+        return len(self.hosts) * self.max_concurrent
+
+    def load(self):
+        """In-flight (or waiting) requests per host."""
+        with self._lock:
+            return dict(self._active)
+
+    def least_busy(self):
+        """The host with the fewest in-flight requests right now."""
+        with self._lock:
+            return min(self.hosts, key=self._active.get)
+
+    @contextlib.contextmanager
+    def backend(self, host=None):
+        """Yields a host once it has a free slot.
+
+        host pins the request to that server if it is configured; otherwise the least-busy one is used.
+        """
+        with self._lock:
+            if host not in self._slots:
+                host = min(self.hosts, key=self._active.get)
+            self._active[host] += 1
+        try:
+            with self._slots[host]:
+                yield host
+        finally:
+            with self._lock:
+                self._active[host] -= 1
+
+    def chat(self, data, host=None, timeout=REQUEST_TIMEOUT_S):
+        """POSTs a chat request to a backend with a free slot and returns the parsed response."""
+        with self.backend(host) as host:
+            return post_chat(requests, f"{host}/api/chat", data, timeout=timeout)
+
+    def chat_stream(self, data, host=None, timeout=REQUEST_TIMEOUT_S):
+        """Like chat for a stream=True body: yields the response chunks, holding the slot until the last."""
+        with self.backend(host) as host:
+            yield from stream_chat(requests, f"{host}/api/chat", data, timeout=timeout)
@@ -0,0 +1,257 @@
+"""Decides per question whether a web search is worth its latency.
+
+Keyword rules catch the obvious cases. Skip rules name a specific personal action, so they beat
+the broad search keywords ("rate", "buy"), but never a freshness cue (a date, "today", prices,
+weather): when both match ("take a nap now", "wear a coat today") the model decides, and without
+a confident model the question is searched. Everything else goes to a small multinomial
+naive-Bayes model trained on logged questions. Every decision is appended to a JSONL log, which
+is both the training data and the source of the skip-rate report.
+
+    python search_gate.py train      # fit the model on the decision log
+    python search_gate.py report     # skip rate and estimated latency saved
+    python search_gate.py check      # the keyword rules against RULE_CASES
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import threading
+import time
+
+from context_packer import tokenize
+
+# --- Constants ---
+SEARCH_LOG_PATH = os.environ.get("SEARCH_LOG_PATH", os.path.join(".cache", "search_gate_log.jsonl"))
+SEARCH_MODEL_PATH = os.environ.get("SEARCH_MODEL_PATH", os.path.join(".cache", "search_gate_model.json"))
+MODEL_MIN_CONFIDENCE = 0.7   # below this the model defers to the default (search)
+
+# Freshness cues: dates, prices and conditions that change daily. A skip rule cannot override these.
+FRESH_PATTERNS = [
+    r"\b(today|tonight|tomorrow|now|currently|latest|recent|this (week|month|year)|news|forecast|weather)\b",
+    r"\b(price|prices|stock|stocks|shares|crypto|bitcoin|etf|inflation|market)\b",
+    r"\b(19|20)\d{2}\b",
+    r"(오늘|내일|지금|현재|최근|요즘|이번 ?(주|달|해)|뉴스|날씨|예보)",
+    r"(가격|주식|주가|코인|비트코인|환율|시장)",
+]
+# Products, deals and comparisons: web context helps, unless the question is a personal action.
+SEARCH_PATTERNS = [
+    r"\b(rate|rates|interest)\b",
+    r"\b(buy|sell|invest|review|reviews|vs|versus|compare|release|model|brand|deal|discount|sale)\b",
+    r"(금리|투자|매수|매도|사야|살까|구매|후기|리뷰|비교|출시|할인)",
+]
+# Personal, habitual or timeless choices: the answer does not depend on the web.
+SKIP_PATTERNS = [
+    r"\b(nap|sleep|shower|bath|stretch|meditate|walk|drink water|eat (now|lunch|dinner|breakfast|a snack))\b",
+    r"\b(call|text|message|apologi[sz]e to|forgive|tell) (my|him|her|them)\b",
+    r"\b(go to bed|wake up|take a break|clean my|do (my )?laundry|wear)\b",
+    r"(낮잠|잠을|잘까|자야|샤워|목욕|산책|스트레칭|명상|물을 마|간식|점심|저녁|아침을)",
+    r"(연락|전화|문자|사과|용서)(할까|해야|하는)",
+    r"(쉬어야|쉴까|빨래|청소|입을까)",
+]
+_FRESH_RE = [re.compile(p, re.IGNORECASE) for p in FRESH_PATTERNS]
+_SEARCH_RE = [re.compile(p, re.IGNORECASE) for p in SEARCH_PATTERNS]
+_SKIP_RE = [re.compile(p, re.IGNORECASE) for p in SKIP_PATTERNS]
+
+# (question, expected rule decision); None means the rules defer to the model.
+RULE_CASES = [
+    ("Should I wear a coat today?", None),
+    ("Should I call my broker to sell my stocks today?", None),
+    ("Is the bitcoin price going up this week?", True),
+    ("Should I buy the 2024 model or wait?", True),
+    ("Should I take a nap now?", None),
+    ("Should I take a nap?", False),
+    ("Should I call my mom to apologize?", False),
+    ("Should I text her about the sale?", False),
+    ("오늘 산책할까?", None),
+    ("요즘 금리가 오를까?", True),
+    ("낮잠을 잘까?", False),
+    ("Is this a good idea?", None),
+]
+
+
+# --- Naive Bayes ---
+
+def train_model(examples, alpha=1.0):
+    """Fits multinomial naive Bayes on (question, needs_search) pairs; returns a JSON-able dict."""
+    counts = {True: {}, False: {}}
+    totals = {True: 0, False: 0}
+    docs = {True: 0, False: 0}
+    for question, label in examples:
+        docs[label] += 1
+        for token in tokenize(question):
+            counts[label][token] = counts[label].get(token, 0) + 1
+            totals[label] += 1
+    vocabulary = set(counts[True]) | set(counts[False])
+    size = len(vocabulary) + 1
+    model = {"prior": {}, "log_prob": {}, "unseen": {}}
+    for label in (True, False):
+        key = "search" if label else "skip"
+        model["prior"][key] = math.log((docs[label] + 1) / (docs[True] + docs[False] + 2))
+        denominator = totals[label] + alpha * size
+        model["log_prob"][key] = {t: math.log((counts[label].get(t, 0) + alpha) / denominator) for t in vocabulary}
+        model["unseen"][key] = math.log(alpha / denominator)
+    return model
+
+
+def predict(model, question):
+    """Returns P(needs search) for the question under the model."""
+    scores = {}
+    for key in ("search", "skip"):
+        log_prob = model["log_prob"][key]
+        unseen = model["unseen"][key]
+        scores[key] = model["prior"][key] + sum(log_prob.get(t, unseen) for t in tokenize(question))
+    top = max(scores.values())
+    odds = {k: math.exp(v - top) for k, v in scores.items()}
+    return odds["search"] / (odds["search"] + odds["skip"])
+
+
+_model_cache = {"mtime": None, "model": None}
+
+
+def load_model(path=SEARCH_MODEL_PATH):
+    """Loads the trained model, reloading when the file changes; None if it was never trained."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _model_cache["mtime"] != mtime:
+        with open(path, encoding="utf-8") as f:
+            _model_cache["model"] = json.load(f)
+        _model_cache["mtime"] = mtime
+    return _model_cache["model"]
+
+
+# --- Decision ---
+
+def rule_decision(question):
+    """Returns True/False when the keyword rules decide, None when they defer to the model."""
+    fresh = any(r.search(question) for r in _FRESH_RE)
+    skip = any(r.search(question) for r in _SKIP_RE)
+    if fresh and skip:   # "take a nap now" vs "wear a coat today": too close for keywords
+        return None
+    if fresh:
+        return True
+    if skip:
+        return False
+    if any(r.search(question) for r in _SEARCH_RE):
+        return True
+    return None
+
+
+def needs_search(question, mode="auto"):
+    """Returns (search?, source) where source is 'override', 'rule', 'model' or 'default'.
+
+    mode is the per-request override: 'auto', 'always' or 'never'.
+    """
+    if mode == "always":
+        return True, "override"
+    if mode == "never":
+        return False, "override"
+    decision = rule_decision(question)
+    if decision is not None:
+        return decision, "rule"
+    model = load_model()
+    if model:
+        p = predict(model, question)
+        if max(p, 1 - p) >= MODEL_MIN_CONFIDENCE:
+            return p >= 0.5, "model"
+    return True, "default"
+
+
+def log_decision(question, searched, source, search_ms=None, path=SEARCH_LOG_PATH):
+    """Appends one decision to the log (search_ms is the measured search latency, if searched)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    record = {"ts": time.time(), "question": question, "searched": searched, "source": source, "search_ms": search_ms}
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _read_log(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+_report_totals = {}   # path -> running counts and the log offset they cover
+_report_lock = threading.Lock()
+
+
+def _totals(path):
+    """Counts over the log, updated from the lines appended since the last call (the log only grows)."""
+    with _report_lock:
+        totals = _report_totals.get(path)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if totals is None or size < totals["offset"]:   # first call, or the log was replaced
+            totals = _report_totals[path] = {"offset": 0, "questions": 0, "skipped": 0,
+                                             "latency_ms": 0.0, "timed": 0, "by_source": {}}
+        if size > totals["offset"]:
+            with open(path, "rb") as f:
+                f.seek(totals["offset"])
+                data = f.read(size - totals["offset"])
+            complete = data[:data.rfind(b"\n") + 1]   # a line still being written is read next time
+            for line in complete.decode("utf-8").splitlines():
+                if not line.strip():
+                    continue
+                r = json.loads(line)
+                totals["questions"] += 1
+                totals["skipped"] += not r["searched"]
+                if r["searched"] and r.get("search_ms") is not None:
+                    totals["latency_ms"] += r["search_ms"]
+                    totals["timed"] += 1
+                totals["by_source"][r["source"]] = totals["by_source"].get(r["source"], 0) + 1
+            totals["offset"] += len(complete)
+        return {**totals, "by_source": dict(totals["by_source"])}
+
+
+def report(path=SEARCH_LOG_PATH):
+    """Summarises skip rate and the search latency the skipped questions would have cost.
+
+    Cheap to call on every rerun: only log lines appended since the previous call are parsed.
+    """
+    totals = _totals(path)
+    mean_ms = totals["latency_ms"] / totals["timed"] if totals["timed"] else 0.0
+    return {
+        "questions": totals["questions"],
+        "skip_rate": totals["skipped"] / totals["questions"] if totals["questions"] else 0.0,
+        "mean_search_ms": mean_ms,
+        "latency_saved_s": totals["skipped"] * mean_ms / 1000,
+        "by_source": totals["by_source"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search/skip classifier for analyze_text.")
+    parser.add_argument("command", choices=["train", "report", "check"])
+    parser.add_argument("--log", default=SEARCH_LOG_PATH)
+    parser.add_argument("--model", default=SEARCH_MODEL_PATH)
+    args = parser.parse_args()
+
+    if args.command == "check":
+        failures = 0
+        for question, expected in RULE_CASES:
+            got = rule_decision(question)
+            failures += got != expected
+            print(f"{'ok  ' if got == expected else 'FAIL'} {question!r}: {got} (expected {expected})")
+        if failures:
+            raise SystemExit(f"{failures} case(s) failed")
+    elif args.command == "train":
+        # Overrides are the strongest labels; rule decisions add weak but plentiful ones.
+        examples = [(r["question"], r["searched"]) for r in _read_log(args.log) if r["source"] in ("override", "rule")]
+        if not examples:
+            raise SystemExit("No labelled questions in the log yet.")
+        os.makedirs(os.path.dirname(args.model) or ".", exist_ok=True)
+        with open(args.model, "w", encoding="utf-8") as f:
+            json.dump(train_model(examples), f, ensure_ascii=False)
+        print(f"Trained on {len(examples)} questions -> {args.model}")
+    else:
+        stats = report(args.log)
+        print(f"questions={stats['questions']} skip_rate={stats['skip_rate']:.1%} "
+              f"mean_search={stats['mean_search_ms']:.0f} ms latency_saved={stats['latency_saved_s']:.1f} s")
+        print("decisions by source:", stats["by_source"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""Text-to-speech kept off the analysis result path.
+
+Synthesizing the reason used to happen inside process_ollama_response, so the probability and
+reason were withheld until gTTS had finished a network round-trip per ~100-character chunk,
+even for users who never press play. A SpeechJob is created with the result instead and
+synthesized according to TTS_MODE (set per deployment):
+
+- "eager": right away, before the result is returned (the old behaviour);
+- "background": on a shared thread pool; the audio player attaches once it is ready;
+- "on_demand": only when the user asks for audio;
+- "pipelined": sentence by sentence (SentenceSpeech), each sentence as soon as it is complete
+  in the streamed answer, so the first audio plays within one sentence's synthesis time;
+- "browser": not on the server at all; the text goes to the browser_tts component, which reads
+  it with the Web Speech API, and only a browser without a voice for the language gets server audio.
+
+What is read aloud is the answer's optional one-sentence "spoken_summary" (the reason if there
+is none), announced by the verdict ("Yes, 75 percent"), which is assembled from clips rendered
+ahead of time (VerdictClips) and plays as soon as the probability is known.
+
+    python speech.py bench "Text to speak" --language en
+    python speech.py verdicts --languages en,ko   # pre-renders the verdict clips
+    python speech.py sentences                    # checks the sentence splitter (en/ja/zh)
+"""
+
+import argparse
+import base64
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import tts_engines
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+TTS_MODES = ("eager", "background", "on_demand", "pipelined", "browser")
+TTS_MODE = os.environ.get("TTS_MODE", "background")
+TTS_WORKERS = 4   # background syntheses at once, across all sessions of the process
+MIN_SENTENCE_CHARS = 12   # shorter pieces ("Yes.", "e.g.") are spoken with the next sentence
+# ASCII terminators end a sentence only before whitespace ("3.5", "e.g."); Japanese and Chinese
+# put no space after 。！？, so those end one wherever they appear.
+SENTENCE_END = re.compile(r"[.!?…][\"')\]]*(?=\s)|[。！？][」』）\"')\]]*")
+SENTENCE_CASES = [   # (text, complete sentences) for `python speech.py sentences`
+    ("Yes, buy it now. The price is 3.5% lower than last week. Still", ["Yes, buy it now.", " The price is 3.5% lower than last week."]),
+    ("はい、今が買い時です。価格は先週より下がっています。まだ", ["はい、今が買い時です。価格は先週より下がっています。"]),
+    ("是的，现在是买入的好时机。价格比上周低了百分之三。但是", ["是的，现在是买入的好时机。", "价格比上周低了百分之三。"]),
+    ("「買うべきです！」と専門家は言います。", ["「買うべきです！」と専門家は言います。"]),
+]
+BROWSER_TTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "browser_tts")   # Streamlit component
+BROWSER_RATES = {"slow": 0.75, "normal": 1.0, "fast": 1.25}   # the apps' speed settings as Web Speech rates
+VERDICT_DIR = os.environ.get("VERDICT_DIR", os.path.join(".cache", "verdicts"))
+VERDICT_WORDS = {   # (yes, no, probability phrase) per app language
+    "en": ("Yes", "No", "{} percent"),
+    "ko": ("예", "아니오", "{}퍼센트"),
+    "ja": ("はい", "いいえ", "{}パーセント"),
+    "zh-CN": ("是", "否", "百分之{}"),
+    "fr": ("Oui", "Non", "{} pour cent"),
+    "de": ("Ja", "Nein", "{} Prozent"),
+}
+
+if TTS_MODE not in TTS_MODES:   # a typo would otherwise silently turn off every speech path
+    logger.warning("Unknown TTS_MODE %r (expected one of %s); using 'background'", TTS_MODE, ", ".join(TTS_MODES))
+    TTS_MODE = "background"
+
+
+def split_sentences(text, min_chars=MIN_SENTENCE_CHARS):
+    """Splits off the complete sentences of text; returns (sentences, unfinished rest)."""
+    sentences, start = [], 0
+    for match in SENTENCE_END.finditer(text):
+        if match.end() - start >= min_chars:
+            sentences.append(text[start:match.end()])
+            start = match.end()
+    return sentences, text[start:]
+
+
+def text_to_speech(text, language="en", slow=False):
+    """Synthesizes text with the engines configured for language (see tts_engines) and returns MP3 bytes."""
+    return tts_engines.synthesize(text, language, slow)[0]
+
+
+class SpeechJob:
+    """Speech for one result text, synthesized at most once, whenever it is first started."""
+
+    def __init__(self, text, language, slow=False):
+        self.text = text
+        self.language = language
+        self.slow = slow
+        self.id = uuid.uuid4().hex
+        self.synth_ms = None
+        self.engine = None
+        self.rtf = None
+        self._future = None
+
+    @property
+    def started(self):
+        return self._future is not None
+
+    @property
+    def done(self):
+        return self._future is not None and self._future.done()
+
+    @property
+    def failed(self):
+        return self.done and self._future.exception() is not None
+
+    def start(self, executor=None):
+        """Starts synthesis on executor, or runs it right here if executor is None; no-op once started."""
+        if self._future is None:
+            if executor is not None:
+                self._future = executor.submit(self._synthesize)
+            else:
+                self._future = Future()
+                try:
+                    self._future.set_result(self._synthesize())
+                except Exception as e:
+                    self._future.set_exception(e)
+        return self
+
+    def audio(self, timeout=None):
+        """MP3 bytes, synthesizing them here if the job was never started; re-raises synthesis errors."""
+        return self.start()._future.result(timeout)
+
+    def _synthesize(self):
+        start = time.perf_counter()
+        audio, self.engine, self.rtf = tts_engines.synthesize(self.text, self.language, self.slow)
+        self.synth_ms = (time.perf_counter() - start) * 1000
+        return audio
+
+
+# --- Sentence pipeline ---
+
+class JsonStringField:
+    """Incrementally decodes one string value (e.g. "reason") out of streamed JSON text."""
+
+    _START = re.compile(r'"(?P<key>[^"\\]*)"\s*:\s*"')
+
+    def __init__(self, key):
+        self.key = key
+        self._buffer = ""
+        self._position = None   # index in _buffer of the next undecoded character of the value
+        self._closed = False
+
+    def feed(self, chunk):
+        """Adds streamed text and returns the newly decoded part of the value ("" if none yet)."""
+        if self._closed:
+            return ""
+        self._buffer += chunk
+        if self._position is None:
+            for match in self._START.finditer(self._buffer):
+                if match.group("key") == self.key:
+                    self._position = match.end()
+                    break
+            else:
+                return ""
+        decoded = []
+        buffer, i = self._buffer, self._position
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self._closed = True
+                break
+            if char != "\\":
+                decoded.append(char)
+                i += 1
+                continue
+            # An escape split across chunks is decoded once the rest of it has arrived.
+            length = 6 if buffer[i + 1:i + 2] == "u" else 2
+            if i + length > len(buffer):
+                break
+            decoded.append(json.loads(f'"{buffer[i:i + length]}"'))
+            i += length
+        self._position = i
+        return "".join(decoded)
+
+
+def json_number(text, key):
+    """The number value of key in streamed (possibly incomplete) JSON text once it is complete, else None."""
+    match = re.search(rf'"{re.escape(key)}"\s*:\s*(-?\d+(?:\.\d+)?)\s*[,}}]', text)
+    return float(match.group(1)) if match else None
+
+
+class SentenceSpeech:
+    """Speech synthesized sentence by sentence on executor, each as soon as the sentence is complete.
+
+    Text arrives through feed() (streamed) or finish(text) (final text only); the clips come
+    back in order from ready_clips() (non-blocking) and clips() (blocking).
+    """
+
+    def __init__(self, language, executor, slow=False):
+        self.id = uuid.uuid4().hex   # names this answer's queue in the browser
+        self.language = language
+        self.slow = slow
+        self.first_audio_ms = None
+        self._executor = executor
+        self._start = time.perf_counter()
+        self._pending = ""
+        self._fed = False
+        self._finished = False
+        self._jobs = []
+        self._emitted = 0
+
+    @property
+    def started(self):
+        return True
+
+    @property
+    def sentences(self):
+        return [job.text for job in self._jobs]
+
+    def feed(self, text):
+        """Adds streamed text; every sentence it completes is submitted for synthesis."""
+        if not text or self._finished:
+            return
+        self._fed = True
+        sentences, self._pending = split_sentences(self._pending + text)
+        for sentence in sentences:
+            self._submit(sentence)
+
+    def finish(self, text=None):
+        """Ends the text; text is the whole text if nothing was streamed in. Returns self."""
+        if not self._fed and text:
+            self.feed(text)
+        if not self._finished:
+            self._finished = True
+            self._submit(self._pending)
+            self._pending = ""
+        return self
+
+    def _submit(self, sentence):
+        if sentence.strip():
+            self._jobs.append(SpeechJob(sentence.strip(), self.language, self.slow).start(self._executor))
+
+    def ready_clips(self):
+        """(index, MP3 bytes) of the clips finished since the last call, in order; never blocks.
+
+        Stops at the first failed clip; clips() re-raises its error.
+        """
+        ready = []
+        while self._emitted < len(self._jobs) and self._jobs[self._emitted].done:
+            if self._jobs[self._emitted].failed:
+                break
+            ready.append(self._emit(self._jobs[self._emitted]))
+        return ready
+
+    def clips(self, timeout=None):
+        """Yields the remaining (index, MP3 bytes) in order, waiting for each; call after finish()."""
+        while self._emitted < len(self._jobs):
+            yield self._emit(self._jobs[self._emitted], timeout)
+
+    def _emit(self, job, timeout=None):
+        audio = job.audio(timeout)
+        if self.first_audio_ms is None:
+            self.first_audio_ms = (time.perf_counter() - self._start) * 1000
+        self._emitted += 1
+        return self._emitted - 1, audio
+
+    def audio(self, timeout=None):
+        """All clips as one MP3 (MP3 frames concatenate), e.g. for replaying the whole answer."""
+        return b"".join(job.audio(timeout) for job in self._jobs)
+
+
+def verdict_phrases(language):
+    """{clip name: text} of the clips a language's verdicts are assembled from."""
+    yes, no, probability = VERDICT_WORDS[language]
+    return {"yes": yes, "no": no, **{str(percent): probability.format(percent) for percent in range(101)}}
+
+
+class VerdictClips:
+    """"Yes"/"No" and "N percent" clips per language, rendered ahead of time and kept on disk.
+
+    A language whose clips are missing is rendered on executor (one task per clip, so they run
+    TTS_WORKERS at a time) the first time it is asked for; until then its verdicts are silent
+    rather than delaying the result.
+    """
+
+    def __init__(self, directory=VERDICT_DIR, executor=None):
+        self.directory = directory
+        self._executor = executor
+        self._clips = {}
+        self._rendering = set()
+        self._lock = threading.Lock()
+
+    def verdict(self, language, probability):
+        """MP3 bytes of e.g. "Yes, 75 percent" (MP3 frames concatenate), or None if not rendered yet."""
+        if language not in VERDICT_WORDS:
+            return None
+        clips = [self._load(language, name) for name in ("yes" if probability >= 50 else "no", str(round(probability)))]
+        if None in clips:
+            self._render_later(language)
+            return None
+        return b"".join(clips)
+
+    def render(self, language):
+        """Renders and saves every missing clip of a language, TTS_WORKERS at a time; returns how many."""
+        missing = self._missing(language)
+        with ThreadPoolExecutor(max_workers=TTS_WORKERS) as executor:
+            list(executor.map(lambda item: self._render_clip(language, *item), missing))
+        return len(missing)
+
+    def _missing(self, language):
+        os.makedirs(os.path.join(self.directory, language), exist_ok=True)
+        return [(name, text) for name, text in verdict_phrases(language).items()
+                if not os.path.exists(self._path(language, name))]
+
+    def _render_clip(self, language, name, text):
+        path = self._path(language, name)
+        with open(path + ".tmp", "wb") as f:
+            f.write(text_to_speech(text, language))
+        os.replace(path + ".tmp", path)
+
+    def _path(self, language, name):
+        return os.path.join(self.directory, language, f"{name}.mp3")
+
+    def _load(self, language, name):
+        with self._lock:
+            if (language, name) not in self._clips:
+                try:
+                    with open(self._path(language, name), "rb") as f:
+                        self._clips[language, name] = f.read()
+                except FileNotFoundError:
+                    return None
+            return self._clips[language, name]
+
+    def _render_later(self, language):
+        with self._lock:
+            if self._executor is None or language in self._rendering:
+                return
+            self._rendering.add(language)
+        try:
+            missing = self._missing(language)
+        except OSError as e:
+            missing = []
+            logger.warning("Rendering verdict clips for %s failed: %s", language, e)
+        if not missing:
+            with self._lock:
+                self._rendering.discard(language)
+            return
+        # Not one task that renders the clips in turn: each clip is its own task on the shared pool.
+        pending = {"clips": len(missing), "failed": 0}
+
+        def done(future):
+            with self._lock:
+                pending["clips"] -= 1
+                pending["failed"] += future.exception() is not None
+                finished = not pending["clips"]
+                if finished:
+                    self._rendering.discard(language)   # a later verdict retries the failed clips
+            if finished:
+                logger.info("Rendered %d verdict clips for %s (%d failed)",
+                            len(missing) - pending["failed"], language, pending["failed"])
+
+        for name, text in missing:
+            self._executor.submit(self._render_clip, language, name, text).add_done_callback(done)
+
+
+def clip_player_html(queue_id, index, mp3_bytes):
+    """A zero-height component that schedules one clip gaplessly on the page's shared Web Audio queue.
+
+    Every clip of a queue_id plays right after the previous index; a new queue_id stops the old one.
+    index None is a lead clip (the verdict): it plays right away and the numbered clips follow it.
+    """
+    return f"""<script>
+const w = window.parent;
+const q = w.__speechQueue || (w.__speechQueue = {{ctx: new (w.AudioContext || w.webkitAudioContext)(), id: null}});
+if (q.id !== {json.dumps(str(queue_id))}) {{
+  (q.sources || []).forEach(source => source.stop());
+  Object.assign(q, {{id: {json.dumps(str(queue_id))}, next: 0, end: 0, decoded: {{}}, sources: []}});
+}}
+q.ctx.resume();
+const bytes = Uint8Array.from(atob("{base64.b64encode(mp3_bytes).decode("ascii")}"), c => c.charCodeAt(0));
+function play(buffer) {{
+  const source = q.ctx.createBufferSource();
+  source.buffer = buffer;
+  source.connect(q.ctx.destination);
+  const at = Math.max(q.ctx.currentTime + 0.05, q.end);
+  source.start(at);
+  q.end = at + buffer.duration;
+  q.sources.push(source);
+}}
+q.ctx.decodeAudioData(bytes.buffer).then(buffer => {{
+  const index = {json.dumps(index)};
+  if (index === null) return play(buffer);
+  q.decoded[index] = buffer;
+  while (q.decoded[q.next]) {{
+    play(q.decoded[q.next]);
+    delete q.decoded[q.next++];
+  }}
+}});
+</script>"""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time speech synthesis, i.e. what eager TTS adds to time-to-result.")
+    parser.add_argument("command", choices=["bench", "verdicts", "sentences"])
+    parser.add_argument("text", nargs="?", default="")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--languages", default=",".join(VERDICT_WORDS), help="verdicts: languages to pre-render")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    if args.command == "sentences":
+        failures = 0
+        for case_text, expected in SENTENCE_CASES:
+            got = split_sentences(case_text)[0]
+            failures += got != expected
+            print(f"{'ok  ' if got == expected else 'FAIL'} {case_text!r} -> {got}")
+        raise SystemExit(1 if failures else 0)
+    elif args.command == "verdicts":
+        verdict_clips = VerdictClips()
+        for verdict_language in args.languages.split(","):
+            start = time.perf_counter()
+            count = verdict_clips.render(verdict_language)
+            print(f"{verdict_language}: {count} clips rendered in {time.perf_counter() - start:.1f} s -> {VERDICT_DIR}")
+    elif not args.text:
+        parser.error("bench needs the text to speak")
+    else:
+        timings = []
+        for _ in range(args.runs):
+            job = SpeechJob(args.text, args.language).start()
+            size = len(job.audio())
+            timings.append(job.synth_ms)
+        print(f"{len(args.text)} chars -> {size / 1024:.0f} KiB MP3; synthesis "
+              f"mean={sum(timings) / len(timings):.0f} ms max={max(timings):.0f} ms "
+              "(added to time-to-result in eager mode, 0 ms in background/on_demand)")
@@ -0,0 +1,272 @@
+"""Pluggable speech engines with per-language fallback.
+
+speech.text_to_speech dispatches through synthesize(), which tries the engines configured
+for the language in order (TTS_ENGINES, e.g. "ko=gtts,espeak;*=espeak" for an air-gapped
+host) and falls back to the next one when an engine is missing or fails:
+
+- "gtts": Google Translate TTS over the internet (chunks fetched concurrently);
+- "espeak": espeak-ng (packages.txt), fully offline. A few synthesizer processes per voice are
+  started ahead of time, so the voice data is already loaded when a request arrives; the
+  PCM they stream back is encoded to MP3 by a worker while synthesis is still running.
+
+Real-time factor (synthesis time / audio duration) is tracked per engine:
+    python tts_engines.py bench "Text to speak" --language en
+"""
+
+import argparse
+import io
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    import av
+except ImportError:  # optional; without it espeak-ng is unavailable and gTTS is the only engine
+    av = None
+
+try:
+    from gtts_parallel import ParallelGTTS
+except ImportError:  # gTTS not installed (e.g. an espeak-only host); the gtts engine is unavailable
+    ParallelGTTS = None
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+TTS_ENGINES = os.environ.get("TTS_ENGINES", "*=gtts,espeak")   # language=engine,...;... ("*" for any)
+ESPEAK_BINARY = os.environ.get("ESPEAK_BINARY", "espeak-ng")
+ESPEAK_WARM = 2                       # idle synthesizer processes kept per voice
+ESPEAK_SPEED = {False: 175, True: 130}   # words per minute, normal / slow
+ESPEAK_VOICES = {"zh-CN": "cmn", "zh-TW": "cmn", "zh-HK": "yue"}   # app language codes espeak-ng names differently (zh-TW is Mandarin)
+ENCODE_WORKERS = 2
+MP3_BITRATE = 48000
+READ_CHUNK = 16384
+WAV_HEADER_BYTES = 44
+
+
+def engine_order(language, config=TTS_ENGINES):
+    """Engine names to try for language, from a "lang=engine,...;*=engine,..." string."""
+    rules = {}
+    for rule in filter(None, (part.strip() for part in config.split(";"))):
+        key, _, names = rule.partition("=")
+        rules[key.strip()] = [name.strip() for name in names.split(",") if name.strip()]
+    return rules.get(language) or rules.get(language.split("-")[0]) or rules.get("*", ["gtts"])
+
+
+# --- MP3 helpers ---
+
+_BITRATES = {  # kbps by (MPEG-1?, bitrate index), layer III
+    True: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    False: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def mp3_duration(data):
+    """Duration in seconds of layer III MP3 data, by walking its frame headers."""
+    position, seconds = 0, 0.0
+    if data[:3] == b"ID3":
+        position = 10 + int.from_bytes(bytes(b & 0x7F for b in data[6:10]), "big")
+    while position + 4 <= len(data):
+        header = int.from_bytes(data[position:position + 4], "big")
+        version, bitrate_index, rate_index = (header >> 19) & 3, (header >> 12) & 15, (header >> 10) & 3
+        if header >> 21 != 0x7FF or version == 1 or bitrate_index in (0, 15) or rate_index == 3:
+            position += 1   # not a frame header: resync
+            continue
+        mpeg1 = version == 3
+        sample_rate = _SAMPLE_RATES[version][rate_index]
+        samples = 1152 if mpeg1 else 576
+        length = samples // 8 * _BITRATES[mpeg1][bitrate_index] * 1000 // sample_rate + ((header >> 9) & 1)
+        seconds += samples / sample_rate
+        position += length
+    return seconds
+
+
+def encode_mp3(sample_rate, pcm_chunks):
+    """Encodes mono s16 PCM chunks (any sizes, as they arrive) to MP3 bytes."""
+    buffer = io.BytesIO()
+    with av.open(buffer, "w", format="mp3") as container:
+        stream = container.add_stream("libmp3lame", rate=sample_rate, layout="mono")
+        stream.bit_rate = MP3_BITRATE
+        remainder = b""
+        for chunk in pcm_chunks:
+            chunk = remainder + chunk
+            usable = len(chunk) - len(chunk) % 2
+            chunk, remainder = chunk[:usable], chunk[usable:]
+            if not chunk:
+                continue
+            frame = av.AudioFrame.from_ndarray(np.frombuffer(chunk, dtype=np.int16).reshape(1, -1),
+                                               format="s16", layout="mono")
+            frame.sample_rate = sample_rate
+            container.mux(stream.encode(frame))
+        container.mux(stream.encode(None))
+    return buffer.getvalue()
+
+
+# --- Engines ---
+
+class GTTSEngine:
+    """Google Translate TTS; needs internet access."""
+
+    name = "gtts"
+    available = ParallelGTTS is not None
+
+    def __init__(self):
+        self._client = ParallelGTTS() if self.available else None
+
+    def synthesize(self, text, language, slow=False):
+        """Returns (MP3 bytes, audio seconds)."""
+        audio = self._client.synthesize(text, language, slow)
+        return audio, mp3_duration(audio)
+
+
+class EspeakEngine:
+    """espeak-ng with warm synthesizer processes per voice; offline."""
+
+    name = "espeak"
+
+    def __init__(self, binary=ESPEAK_BINARY, warm=ESPEAK_WARM):
+        self.binary = shutil.which(binary)
+        self.warm = warm
+        self._idle = {}   # (voice, speed) -> processes initialized and waiting for text on stdin
+        self._lock = threading.Lock()
+        self._encoders = ThreadPoolExecutor(max_workers=ENCODE_WORKERS)
+
+    @property
+    def available(self):
+        return self.binary is not None and av is not None
+
+    def _spawn(self, voice, speed):
+        return subprocess.Popen([self.binary, "-v", voice, "-s", str(speed), "--stdout"],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def _take(self, voice, speed):
+        """An idle process for the voice; the pool is topped up so the next request finds one too."""
+        with self._lock:
+            idle = self._idle.setdefault((voice, speed), [])
+            process = None
+            while idle and process is None:
+                candidate = idle.pop(0)
+                if candidate.poll() is None:
+                    process = candidate
+            while len(idle) < self.warm:
+                idle.append(self._spawn(voice, speed))
+        return process or self._spawn(voice, speed)
+
+    def synthesize(self, text, language, slow=False):
+        """Returns (MP3 bytes, audio seconds)."""
+        process = self._take(ESPEAK_VOICES.get(language, language), ESPEAK_SPEED[bool(slow)])
+        try:
+            process.stdin.write(text.encode("utf-8"))
+            process.stdin.close()
+            header = process.stdout.read(WAV_HEADER_BYTES)
+            if len(header) < WAV_HEADER_BYTES or header[:4] != b"RIFF":
+                raise RuntimeError(f"espeak-ng produced no audio (exit code {process.wait()})")
+            sample_rate = int.from_bytes(header[24:28], "little")
+            pcm = queue.Queue()
+            encoded = self._encoders.submit(encode_mp3, sample_rate, iter(pcm.get, None))
+            pcm_bytes = 0
+            try:
+                # PCM is handed to the encoder as espeak-ng writes it (the WAV header has no usable length).
+                for chunk in iter(lambda: process.stdout.read1(READ_CHUNK), b""):
+                    pcm_bytes += len(chunk)
+                    pcm.put(chunk)
+            finally:
+                pcm.put(None)
+            audio = encoded.result()
+        finally:
+            process.stdout.close()
+            process.wait()
+        return audio, pcm_bytes / 2 / sample_rate
+
+    def close(self):
+        with self._lock:
+            for process in (p for idle in self._idle.values() for p in idle):
+                process.kill()
+            self._idle.clear()
+        self._encoders.shutdown()
+
+
+_ENGINES = {}
+_engines_lock = threading.Lock()
+_stats = {}
+
+
+def get_engine(name):
+    """The process-wide engine instance for name (created on first use)."""
+    with _engines_lock:
+        if name not in _ENGINES:
+            _ENGINES[name] = {"gtts": GTTSEngine, "espeak": EspeakEngine}[name]()
+        return _ENGINES[name]
+
+
+def _record(name, synth_s=0.0, audio_s=0.0, failed=False):
+    with _engines_lock:
+        entry = _stats.setdefault(name, {"runs": 0, "failures": 0, "synth_s": 0.0, "audio_s": 0.0})
+        entry["failures" if failed else "runs"] += 1
+        entry["synth_s"] += synth_s
+        entry["audio_s"] += audio_s
+
+
+def synthesize(text, language="en", slow=False):
+    """Synthesizes with the first configured engine for language that works.
+
+    Returns (MP3 bytes, engine name, real-time factor); raises RuntimeError if every engine failed.
+    """
+    errors = []
+    for name in engine_order(language):
+        engine = get_engine(name)
+        if not engine.available:
+            errors.append(f"{name}: not installed")
+            continue
+        start = time.perf_counter()
+        try:
+            audio, audio_s = engine.synthesize(text, language, slow)
+        except Exception as e:  # any engine failure falls through to the next engine
+            logger.warning("TTS engine %s failed for %s: %s", name, language, e)
+            _record(name, failed=True)
+            errors.append(f"{name}: {e}")
+            continue
+        synth_s = time.perf_counter() - start
+        _record(name, synth_s, audio_s)
+        return audio, name, synth_s / audio_s if audio_s else 0.0
+    raise RuntimeError(f"no TTS engine worked for {language!r} ({'; '.join(errors)})")
+
+
+def report():
+    """Per engine: runs, failures and the real-time factor over all runs (below 1 is faster than real time)."""
+    with _engines_lock:
+        return {name: {"runs": entry["runs"], "failures": entry["failures"],
+                       "rtf": entry["synth_s"] / entry["audio_s"] if entry["audio_s"] else None}
+                for name, entry in _stats.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Real-time factor of each speech engine.")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("text")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--engines", default="gtts,espeak")
+    args = parser.parse_args()
+    for engine_name in args.engines.split(","):
+        engine = get_engine(engine_name)
+        if not engine.available:
+            print(f"{engine_name:7s} not installed")
+            continue
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            try:
+                _, seconds = engine.synthesize(args.text, args.language)
+            except Exception as e:
+                print(f"{engine_name:7s} failed: {e}")
+                break
+            _record(engine_name, time.perf_counter() - start, seconds)
+    for engine_name, row in report().items():
+        print(f"{engine_name:7s} runs={row['runs']} rtf={row['rtf']:.3f}")
@@ -0,0 +1,375 @@
+"""Semantic retrieval over local documents with Ollama embeddings.
+
+Embeddings live in a memory-mapped float16 matrix next to an ID table (chunks.jsonl).
+Building is resumable: re-running `build` only embeds chunks that are not stored yet.
+
+    python vector_index.py build docs/ --index vector_index --host http://localhost:11434
+    python vector_index.py query vector_index "should I switch insurance?"
+    python vector_index.py quantize vector_index      # adds an int8 copy of the matrix
+    python vector_index.py ivf vector_index           # adds IVF coarse partitions
+    python vector_index.py bench vector_index         # recall@k and latency per mode
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import requests
+
+from local_index import iter_document_files, read_document, split_passages
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+EMBED_MODEL = "nomic-embed-text"
+CHUNK_WORDS = 200
+EMBED_BATCH_SIZE = 32
+EMBED_CONCURRENCY = 4      # simultaneous embedding requests per build
+FLUSH_EVERY = 50           # batches between explicit flushes of the memory map
+SCAN_BLOCK_ROWS = 65536    # rows scored per block so float16 -> float32 never copies the whole matrix
+IVF_MIN_ROWS = 2_000_000   # `query` uses IVF partitions automatically above this size
+IVF_NPROBE = 16
+
+
+# --- Embedding ---
+
+def embed_texts(host, model, texts, session=None, timeout=120):
+    """Returns L2-normalised float32 embeddings for texts from Ollama's /api/embed endpoint."""
+    post = (session or requests).post
+    response = post(f"{host}/api/embed", json={"model": model, "input": texts}, timeout=timeout)
+    response.raise_for_status()
+    vectors = np.asarray(response.json()["embeddings"], dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+# --- Building ---
+
+def _paths(index_dir):
+    return {
+        "meta": os.path.join(index_dir, "meta.json"),
+        "chunks": os.path.join(index_dir, "chunks.jsonl"),
+        "matrix": os.path.join(index_dir, "embeddings.f16"),
+        "filled": os.path.join(index_dir, "filled.u8"),
+        "int8": os.path.join(index_dir, "embeddings.i8"),
+        "scales": os.path.join(index_dir, "scales.f32.npy"),
+        "ivf": os.path.join(index_dir, "ivf.npz"),
+    }
+
+
+def index_version(index_dir):
+    """Modification times of the index files; changes whenever build, quantize or ivf rewrites one.
+
+    For cache keys: meta.json alone is not rewritten by quantize, ivf or a resumed build.
+    """
+    return tuple(os.path.getmtime(path) if os.path.exists(path) else None for path in _paths(index_dir).values())
+
+
+def _write_chunks(docs_dir, chunks_path):
+    """Chunks every document into the ID table and returns the chunk count."""
+    count = 0
+    with open(chunks_path, "w", encoding="utf-8") as f:
+        for path in iter_document_files(docs_dir):
+            source = os.path.relpath(path, docs_dir)
+            for n, chunk in enumerate(split_passages(read_document(path), CHUNK_WORDS)):
+                f.write(json.dumps({"id": f"{source}#{n}", "source": source, "text": chunk}, ensure_ascii=False) + "\n")
+                count += 1
+    return count
+
+
+def _drop_derived(paths):
+    """Deletes the int8 copy and IVF lists, which only cover the rows filled when they were built."""
+    stale = [paths[name] for name in ("int8", "scales", "ivf") if os.path.exists(paths[name])]
+    for path in stale:
+        os.remove(path)
+    if stale:
+        logger.warning("New rows embedded; removed the stale int8/IVF files, re-run `quantize`/`ivf`")
+
+
+def build_index(docs_dir, index_dir, host, model=EMBED_MODEL, concurrency=EMBED_CONCURRENCY,
+                batch_size=EMBED_BATCH_SIZE):
+    """Chunks docs_dir and embeds every chunk that is not yet in the matrix.
+
+    The chunk table is written once; delete the index directory to re-chunk changed documents.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    paths = _paths(index_dir)
+    if os.path.exists(paths["meta"]):
+        with open(paths["meta"], encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["model"] != model:
+            raise ValueError(f"Index was built with {meta['model']}, not {model}")
+    else:
+        count = _write_chunks(docs_dir, paths["chunks"])
+        with open(paths["chunks"], encoding="utf-8") as f:
+            probe = json.loads(f.readline())["text"] if count else "probe"
+        dim = embed_texts(host, model, [probe]).shape[1]
+        meta = {"model": model, "count": count, "dim": dim}
+        np.memmap(paths["matrix"], dtype=np.float16, mode="w+", shape=(max(count, 1), dim)).flush()
+        np.memmap(paths["filled"], dtype=np.uint8, mode="w+", shape=(max(count, 1),)).flush()
+        with open(paths["meta"], "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    count, dim = meta["count"], meta["dim"]
+    if not count:
+        return 0
+    matrix = np.memmap(paths["matrix"], dtype=np.float16, mode="r+", shape=(count, dim))
+    filled = np.memmap(paths["filled"], dtype=np.uint8, mode="r+", shape=(count,))
+
+    pending = np.flatnonzero(filled == 0)
+    if not len(pending):
+        return 0
+    texts = {}
+    with open(paths["chunks"], encoding="utf-8") as f:
+        wanted = set(pending.tolist())
+        for row, line in enumerate(f):
+            if row in wanted:
+                texts[row] = json.loads(line)["text"]
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    done = 0
+    start = time.perf_counter()
+
+    def embed_batch(rows):
+        return rows, embed_texts(host, model, [texts[int(r)] for r in rows], session=session)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(embed_batch, rows) for rows in batches]
+        for n, future in enumerate(as_completed(futures), 1):
+            try:
+                rows, vectors = future.result()
+            except requests.exceptions.RequestException as e:
+                # Unfilled rows are picked up again by the next build run.
+                logger.warning("Embedding batch failed: %s", e)
+                continue
+            matrix[rows] = vectors.astype(np.float16)
+            filled[rows] = 1
+            done += len(rows)
+            if n % FLUSH_EVERY == 0:
+                matrix.flush()
+                filled.flush()
+    matrix.flush()
+    filled.flush()
+    if done:
+        _drop_derived(paths)
+    elapsed = time.perf_counter() - start
+    logger.info("Embedded %d/%d chunks in %.1fs (%.1f chunks/s)", done, len(pending), elapsed, done / max(elapsed, 1e-9))
+    return done
+
+
+def quantize_index(index_dir):
+    """Writes a symmetric per-row int8 copy of the embedding matrix."""
+    index = VectorIndex(index_dir)
+    paths = _paths(index_dir)
+    out = np.memmap(paths["int8"], dtype=np.int8, mode="w+", shape=index.matrix.shape)
+    scales = np.zeros(len(index.matrix), dtype=np.float32)
+    for start in range(0, len(index.matrix), SCAN_BLOCK_ROWS):
+        block = np.asarray(index.matrix[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+        block_scales = np.maximum(np.abs(block).max(axis=1), 1e-12) / 127.0
+        out[start:start + len(block)] = np.round(block / block_scales[:, None]).astype(np.int8)
+        scales[start:start + len(block)] = block_scales
+    out.flush()
+    np.save(paths["scales"], scales)
+
+
+def _assign(vectors, centroids):
+    """Index of the nearest centroid for each row, computed in blocks to bound memory."""
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS // 8):
+        block = np.asarray(vectors[start:start + SCAN_BLOCK_ROWS // 8], dtype=np.float32)
+        assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+def _kmeans(vectors, k, iterations=10, seed=0):
+    """Spherical k-means on a sample; returns unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        # Empty clusters keep their previous centroid.
+        nonempty = np.bincount(assign, minlength=k) > 0
+        centroids[nonempty] = sums[nonempty]
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+def build_ivf(index_dir, nlist=None, sample_size=100_000):
+    """Partitions rows into nlist coarse clusters so queries only scan the closest ones."""
+    index = VectorIndex(index_dir)
+    count = len(index.matrix)
+    nlist = nlist or max(1, int(4 * math.sqrt(count)))
+    rng = np.random.default_rng(0)
+    sample_rows = np.sort(rng.choice(count, size=min(sample_size, count), replace=False))
+    centroids = _kmeans(np.asarray(index.matrix[sample_rows], dtype=np.float32), min(nlist, len(sample_rows)))
+
+    assign = _assign(index.matrix, centroids)
+    order = np.argsort(assign, kind="stable").astype(np.int64)
+    offsets = np.searchsorted(assign[order], np.arange(len(centroids) + 1)).astype(np.int64)
+    np.savez(_paths(index_dir)["ivf"], centroids=centroids, order=order, offsets=offsets)
+
+
+# --- Querying ---
+
+def _top_k(scores, k):
+    k = min(k, len(scores))
+    if not k:
+        return np.zeros(0, dtype=np.int64)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best])]
+
+
+class VectorIndex:
+    """Memory-mapped embedding matrix with flat, int8 and IVF top-k search."""
+
+    def __init__(self, index_dir):
+        paths = _paths(index_dir)
+        with open(paths["meta"], encoding="utf-8") as f:
+            self.meta = json.load(f)
+        count, dim = self.meta["count"], self.meta["dim"]
+        self.matrix = np.memmap(paths["matrix"], dtype=np.float16, mode="r", shape=(count, dim))
+        self.filled = np.memmap(paths["filled"], dtype=np.uint8, mode="r", shape=(count,))
+        self.int8 = self.scales = self.ivf = None
+        if os.path.exists(paths["int8"]):
+            self.int8 = np.memmap(paths["int8"], dtype=np.int8, mode="r", shape=(count, dim))
+            self.scales = np.load(paths["scales"])
+        if os.path.exists(paths["ivf"]):
+            self.ivf = dict(np.load(paths["ivf"]))
+        self._chunks_path = paths["chunks"]
+        self._line_offsets = None
+
+    def _scan(self, rows, query, quantized):
+        """Scores rows (a slice or an index array) against the query, block by block."""
+        if isinstance(rows, slice):
+            rows = np.arange(rows.start, rows.stop)
+        scores = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), SCAN_BLOCK_ROWS):
+            block_rows = rows[start:start + SCAN_BLOCK_ROWS]
+            contiguous = len(block_rows) and block_rows[-1] - block_rows[0] == len(block_rows) - 1
+            picker = slice(int(block_rows[0]), int(block_rows[-1]) + 1) if contiguous else block_rows
+            if quantized:
+                block = np.asarray(self.int8[picker], dtype=np.float32)
+                scores[start:start + len(block_rows)] = (block @ query) * self.scales[block_rows]
+            else:
+                block = np.asarray(self.matrix[picker], dtype=np.float32)
+                scores[start:start + len(block_rows)] = block @ query
+        return scores
+
+    def search_vector(self, query, k=5, quantized=None, use_ivf=None, nprobe=IVF_NPROBE):
+        """Returns (row ids, scores) of the k nearest rows to a unit-norm query vector."""
+        query = np.asarray(query, dtype=np.float32)
+        quantized = self.int8 is not None if quantized is None else quantized
+        if use_ivf is None:
+            use_ivf = self.ivf is not None and len(self.matrix) >= IVF_MIN_ROWS
+        if use_ivf:
+            lists = _top_k(self.ivf["centroids"] @ query, nprobe)
+            offsets = self.ivf["offsets"]
+            rows = np.sort(np.concatenate([self.ivf["order"][offsets[c]:offsets[c + 1]] for c in lists]))
+        else:
+            rows = np.arange(len(self.matrix))
+        scores = self._scan(rows, query, quantized)
+        scores[self.filled[rows] == 0] = -np.inf
+        best = _top_k(scores, k)
+        return rows[best], scores[best]
+
+    def chunk(self, row):
+        """Returns the ID table entry (id, source, text) for a row."""
+        if self._line_offsets is None:
+            offsets, position = [], 0
+            with open(self._chunks_path, "rb") as f:
+                for line in f:
+                    offsets.append(position)
+                    position += len(line)
+            self._line_offsets = np.asarray(offsets, dtype=np.int64)
+        with open(self._chunks_path, "rb") as f:
+            f.seek(self._line_offsets[int(row)])
+            return json.loads(f.readline())
+
+    def search(self, host, query, k=5, **kwargs):
+        """Embeds the query with the index's model and returns the top chunk texts."""
+        vector = embed_texts(host, self.meta["model"], [query])[0]
+        rows, _ = self.search_vector(vector, k, **kwargs)
+        return [self.chunk(row)["text"] for row in rows]
+
+
+# --- Benchmark ---
+
+def bench_index(index_dir, num_queries=100, k=10, noise=0.05):
+    """Reports recall@k against exact float32 search and query latency for each available mode."""
+    index = VectorIndex(index_dir)
+    rng = np.random.default_rng(0)
+    filled_rows = np.flatnonzero(index.filled)
+    picks = rng.choice(filled_rows, size=min(num_queries, len(filled_rows)), replace=False)
+    queries = np.asarray(index.matrix[picks], dtype=np.float32)
+    queries += rng.normal(scale=noise, size=queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    truth = [set(index.search_vector(q, k, quantized=False, use_ivf=False)[0].tolist()) for q in queries]
+    modes = [("flat-f16", dict(quantized=False, use_ivf=False))]
+    if index.int8 is not None:
+        modes.append(("flat-int8", dict(quantized=True, use_ivf=False)))
+    if index.ivf is not None:
+        modes.append(("ivf-f16", dict(quantized=False, use_ivf=True)))
+        if index.int8 is not None:
+            modes.append(("ivf-int8", dict(quantized=True, use_ivf=True)))
+
+    print(f"rows={len(index.matrix)} dim={index.meta['dim']} queries={len(queries)} k={k}")
+    for name, options in modes:
+        timings, hits = [], 0
+        for q, expected in zip(queries, truth):
+            start = time.perf_counter()
+            rows, _ = index.search_vector(q, k, **options)
+            timings.append((time.perf_counter() - start) * 1000)
+            hits += len(expected & set(rows.tolist()))
+        timings.sort()
+        print(f"{name:10s} recall@{k}={hits / (k * len(queries)):.3f}"
+              f"  p50={timings[len(timings) // 2]:.2f} ms  p95={timings[int(len(timings) * 0.95) - 1]:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local dense-vector index for semantic search context.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="chunk documents and embed (resumes if interrupted)")
+    build.add_argument("docs_dir")
+    build.add_argument("--index", default="vector_index")
+    build.add_argument("--host", default="http://localhost:11434")
+    build.add_argument("--model", default=EMBED_MODEL)
+    build.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY)
+    query = sub.add_parser("query", help="run a query")
+    query.add_argument("index_dir")
+    query.add_argument("text")
+    query.add_argument("--host", default="http://localhost:11434")
+    query.add_argument("-k", type=int, default=5)
+    for name, help_text in (("quantize", "write an int8 copy of the matrix"),
+                            ("ivf", "build IVF coarse partitions"),
+                            ("bench", "measure recall and latency")):
+        sub.add_parser(name, help=help_text).add_argument("index_dir")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "build":
+        build_index(args.docs_dir, args.index, args.host, args.model, args.concurrency)
+    elif args.command == "query":
+        for text in VectorIndex(args.index_dir).search(args.host, args.text, args.k):
+            print("-", text[:200])
+    elif args.command == "quantize":
+        quantize_index(args.index_dir)
+    elif args.command == "ivf":
+        build_ivf(args.index_dir)
+    elif args.command == "bench":
+        bench_index(args.index_dir)
+
+
+if __name__ == "__main__":
+    main()
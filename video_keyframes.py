@@ -0,0 +1,109 @@
+"""Scene-change keyframe extraction for uploaded videos.
+
+The video is decoded frame by frame with PyAV; nothing but a few small luma thumbnails and
+at most VIDEO_MAX_KEYFRAMES + 1 candidate images is ever held. Frames are sampled at
+SAMPLE_FPS, a new scene starts when the sampled frame's 32x32 luma drifts far enough from
+the scene's first frame (this catches slow pans as well as hard cuts), and each scene is
+represented by its sharpest sampled frame. The longest scenes are kept.
+
+    python video_keyframes.py walkaround.mp4
+"""
+
+import io
+import sys
+import time
+
+import av
+import numpy as np
+
+# --- Constants ---
+SAMPLE_FPS = 2.0             # sampled frames per second of video
+THUMB_EDGE = 32              # scene comparison thumbnail (luma)
+SHARPNESS_EDGE = 128         # sharpness is measured on a luma thumbnail this size
+SCENE_CHANGE = 0.12          # mean absolute luma difference (0-1) that starts a new scene
+VIDEO_MAX_KEYFRAMES = 6
+KEYFRAME_EDGE = 1120         # longest edge of the keyframe images handed to the model
+
+
+def sharpness(luma):
+    """Variance of the Laplacian of a luma array; blurred (moving) frames score low."""
+    luma = np.asarray(luma, dtype=np.float32)
+    laplacian = (luma[1:-1, :-2] + luma[1:-1, 2:] + luma[:-2, 1:-1] + luma[2:, 1:-1] - 4 * luma[1:-1, 1:-1])
+    return float(laplacian.var())
+
+
+class KeyframeSelector:
+    """Splits a stream of sampled frames into scenes and keeps the best frame of the longest ones."""
+
+    def __init__(self, max_keyframes=VIDEO_MAX_KEYFRAMES, scene_change=SCENE_CHANGE):
+        self.max_keyframes = max_keyframes
+        self.scene_change = scene_change
+        self.scenes = []          # closed scenes: dicts with start, end, time, score, image
+        self._current = None
+        self._reference = None
+
+    def add(self, timestamp, thumb, score, image):
+        """Adds one sampled frame; image() is only called if the frame becomes a scene's best so far."""
+        thumb = np.asarray(thumb, dtype=np.float32) / 255
+        if self._reference is None or float(np.abs(thumb - self._reference).mean()) >= self.scene_change:
+            self._close()
+            self._reference = thumb
+            self._current = {"start": timestamp, "end": timestamp, "time": timestamp, "score": score, "image": image()}
+            return
+        self._current["end"] = timestamp
+        if score > self._current["score"]:
+            self._current.update(time=timestamp, score=score, image=image())
+
+    def _close(self):
+        if self._current is None:
+            return
+        self.scenes.append(self._current)
+        if len(self.scenes) > self.max_keyframes:
+            # Drop the shortest scene so only max_keyframes images stay in memory.
+            self.scenes.remove(min(self.scenes, key=lambda scene: scene["end"] - scene["start"]))
+
+    def finish(self):
+        """Returns the kept scenes in time order."""
+        self._close()
+        self._current = None
+        return sorted(self.scenes, key=lambda scene: scene["start"])
+
+
+def _to_jpeg(image):
+    image.thumbnail((KEYFRAME_EDGE, KEYFRAME_EDGE))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def extract_keyframes(source, max_keyframes=VIDEO_MAX_KEYFRAMES, sample_fps=SAMPLE_FPS):
+    """Decodes source (path or file object) and returns ([(timestamp_s, jpeg bytes)], stats)."""
+    start = time.perf_counter()
+    selector = KeyframeSelector(max_keyframes)
+    stats = {"frames": 0, "sampled": 0, "duration_s": 0.0}
+    next_sample = 0.0
+    with av.open(source) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        for frame in container.decode(stream):
+            stats["frames"] += 1
+            if frame.time is None or frame.time < next_sample:
+                continue
+            next_sample = frame.time + 1 / sample_fps
+            stats["sampled"] += 1
+            stats["duration_s"] = frame.time
+            # Downscaling and the gray conversion happen in libswscale, not in Python.
+            thumb = frame.reformat(width=THUMB_EDGE, height=THUMB_EDGE, format="gray").to_ndarray()
+            detail = frame.reformat(width=SHARPNESS_EDGE, height=SHARPNESS_EDGE, format="gray").to_ndarray()
+            selector.add(frame.time, thumb, sharpness(detail), lambda: frame.to_image())
+    scenes = selector.finish()
+    stats["scenes_kept"] = len(scenes)
+    stats["decode_ms"] = (time.perf_counter() - start) * 1000
+    return [(scene["time"], _to_jpeg(scene["image"])) for scene in scenes], stats
+
+
+if __name__ == "__main__":
+    keyframes, keyframe_stats = extract_keyframes(sys.argv[1])
+    for keyframe_time, jpeg in keyframes:
+        print(f"{keyframe_time:7.2f} s  {len(jpeg) / 1024:.0f} KiB")
+    print(keyframe_stats)
@@ -0,0 +1,159 @@
+"""Cross-session batching of Zonos TTS generation.
+
+When several sessions finish their analyses together, separate generate() calls serialize on
+a CPU or a single accelerator, while one batched call costs little more than a single one
+(each decode step is bound by reading the weights, not by the batch). The service collects
+pending requests for up to max_wait_ms after the first one, runs up to max_batch of them
+through one generate() (texts left-padded as Zonos batches them) and one autoencoder.decode(),
+and splits the audio back per request.
+
+Throughput and latency under a synthetic concurrent load, per max batch size:
+    python zonos_batching.py bench --clients 8 --requests 32
+"""
+
+import argparse
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import torch
+
+from zonos_cpu import use_compile
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+TTS_MAX_BATCH = int(os.environ.get("ZONOS_MAX_BATCH", "4"))   # default and cap of generate()'s batch_size (memory grows with it)
+TTS_MAX_WAIT_MS = 15
+
+
+def _code_lengths(codes):
+    """Frames per row of generate() output; rows that finished early are zero-filled to the end."""
+    active = (codes != 0).any(dim=1)   # (batch, frames)
+    frames = torch.arange(1, codes.shape[-1] + 1)
+    return (active * frames).max(dim=-1).values.tolist()
+
+
+class BatchingService:
+    """One worker thread that batches synthesis requests from every session.
+
+    model_getter() returns the model to use (e.g. ModelRegistry.get); cache is a
+    zonos_voice.ConditioningCache. max_batch is clamped to TTS_MAX_BATCH (env ZONOS_MAX_BATCH).
+    """
+
+    def __init__(self, model_getter, cache, max_batch=TTS_MAX_BATCH, max_wait_ms=TTS_MAX_WAIT_MS):
+        self.model_getter = model_getter
+        self.cache = cache
+        self.max_batch = max(1, min(max_batch, TTS_MAX_BATCH))
+        self.max_wait_s = max_wait_ms / 1000
+        self.stats = {"requests": 0, "batches": 0}
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, text, settings):
+        """Queues a synthesis; the Future resolves to (waveform (channels, samples), sampling rate)."""
+        future = Future()
+        self._queue.put((text, settings, future))
+        return future
+
+    def synthesize(self, text, settings, timeout=None):
+        """submit() and wait for the result."""
+        return self.submit(text, settings).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [item for item in self._collect() if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self._synthesize_batch([(text, settings) for text, settings, _ in batch])
+            except Exception as e:  # every request of the batch gets the error
+                logger.warning("Batched TTS failed: %s", e)
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+
+    @torch.inference_mode()
+    def _synthesize_batch(self, requests):
+        model = self.model_getter()
+        prefix = self.cache.prefix_conditioning(model, requests)
+        codes = model.generate(prefix, batch_size=len(requests), progress_bar=False,
+                               disable_torch_compile=not use_compile(model))
+        wavs = model.autoencoder.decode(codes).cpu()
+        samples_per_frame = wavs.shape[-1] // codes.shape[-1]
+        sampling_rate = model.autoencoder.sampling_rate
+        return [(wav[:, :frames * samples_per_frame], sampling_rate)
+                for wav, frames in zip(wavs, _code_lengths(codes))]
+
+
+# --- Benchmark ---
+
+def _percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput vs latency of batched Zonos TTS under concurrent load.")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--batches", default="1,2,4,8", help="max batch sizes to compare (1 = no batching; capped by ZONOS_MAX_BATCH)")
+    parser.add_argument("--max-wait-ms", type=float, default=TTS_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    from zonos_registry import ModelRegistry
+    from zonos_voice import ConditioningCache, SpeakerStore, VoiceSettings
+
+    model = ModelRegistry().get()
+    cache = ConditioningCache(SpeakerStore())
+    sentences = ["Yes, this looks like a good buy.", "The chart shows a steady upward trend.",
+                 "Reviews mention a noisy fan under load.", "The warranty covers two years of repairs."]
+    settings = VoiceSettings("en-us", "neutral", 1.0, 0.5, 44000, 0.7, None)
+    BatchingService(lambda: model, cache, max_batch=1).synthesize("Warm up.", settings)
+
+    print(f"{args.clients} clients, {args.requests} requests, max wait {args.max_wait_ms:.0f} ms")
+    for max_batch in map(int, args.batches.split(",")):
+        service = BatchingService(lambda: model, cache, max_batch, args.max_wait_ms)
+        latencies, audio_s = [], []
+
+        def client(index):
+            time.sleep(random.uniform(0, 0.05))   # sessions finish at nearly, not exactly, the same time
+            start = time.perf_counter()
+            wav, sampling_rate = service.synthesize(sentences[index % len(sentences)], settings)
+            latencies.append(time.perf_counter() - start)
+            audio_s.append(wav.shape[-1] / sampling_rate)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as executor:
+            list(executor.map(client, range(args.requests)))
+        elapsed = time.perf_counter() - start
+        print(f"max_batch={service.max_batch}: {args.requests / elapsed:.2f} req/s, {sum(audio_s) / elapsed:.2f} audio s/s, "
+              f"latency p50 {_percentile(latencies, 0.5):.2f} s p95 {_percentile(latencies, 0.95):.2f} s, "
+              f"mean batch {service.stats['requests'] / service.stats['batches']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
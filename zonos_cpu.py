@@ -0,0 +1,160 @@
+"""CPU inference mode for Zonos TTS.
+
+Most app nodes have no GPU. On the CPU the model runs in fp32 (bf16 matmuls take slow paths
+on most CPUs), the backbone's Linear layers, where autoregressive decoding spends its time,
+are dynamically quantized to int8, intra-op threads are pinned (ZONOS_CPU_THREADS) and
+inter-op parallelism is turned off, since a decode step is one chain of small matmuls.
+torch.compile of the decode step is off by default on the CPU: it costs a long compile on
+first use and only pays off for long reasons, so enable it (ZONOS_CPU_COMPILE=1) where the
+benchmark shows it helps.
+
+Real-time factor, peak memory and audio difference against the fp32 baseline per mode, for
+short, medium and long reasons (each mode runs in a fresh process):
+    python zonos_cpu.py bench
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+ZONOS_CPU_QUANTIZE = os.environ.get("ZONOS_CPU_QUANTIZE", "1") == "1"
+ZONOS_CPU_COMPILE = os.environ.get("ZONOS_CPU_COMPILE", "0") == "1"
+ZONOS_CPU_THREADS = int(os.environ.get("ZONOS_CPU_THREADS", "0"))   # 0: torch's default (physical cores)
+BENCH_MODES = ("fp32", "int8", "int8-compile")
+BENCH_TEXTS = {
+    "short": "Yes, this looks like a good buy at the current price.",
+    "medium": ("The chart shows a steady upward trend over the last three quarters with rising volume. "
+               "Analysts expect earnings to grow, although the valuation is already above the sector average."),
+    "long": ("The product has strong reviews for build quality and battery life, and the price is about ten "
+             "percent below comparable models. The warranty covers two years of repairs. On the other hand, "
+             "several owners report a noisy fan under load, and the manufacturer has been slow to ship firmware "
+             "updates. If you mostly use it for light work, it is a good choice; for long heavy workloads, "
+             "consider the next model up."),
+}
+
+_threads_tuned = False
+
+
+def tune_threads(threads=ZONOS_CPU_THREADS):
+    """Sets the intra-op thread count and turns off inter-op parallelism (once per process)."""
+    global _threads_tuned
+    if _threads_tuned:
+        return
+    _threads_tuned = True
+    if threads:
+        torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:  # only possible before the first parallel op; keep torch's setting then
+        logger.info("Inter-op threads already in use; left at %d", torch.get_num_interop_threads())
+
+
+def optimize_for_cpu(model, quantize=ZONOS_CPU_QUANTIZE, threads=ZONOS_CPU_THREADS):
+    """Prepares a loaded Zonos model for CPU inference; returns it."""
+    tune_threads(threads)
+    model = model.float()
+    if quantize:
+        model.backbone = torch.ao.quantization.quantize_dynamic(model.backbone, {torch.nn.Linear}, dtype=torch.qint8)
+    return model.eval()
+
+
+def use_compile(model):
+    """Whether generate() should torch.compile its decode step for this model."""
+    return next(model.parameters()).device.type != "cpu" or ZONOS_CPU_COMPILE
+
+
+# --- Benchmark ---
+
+def _peak_rss_kib():
+    import resource  # POSIX only; the benchmark is not needed on Windows app hosts
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _run_mode(mode, model_id, out_dir, threads):
+    """Synthesizes every bench text in one mode; prints a JSON line per text and saves the audio."""
+    from zonos.model import Zonos
+    from zonos_voice import ConditioningCache, SpeakerStore, VoiceSettings, synthesize
+
+    tune_threads(threads)
+    baseline = _peak_rss_kib()
+    start = time.perf_counter()
+    model = Zonos.from_pretrained(model_id, device="cpu")
+    model = optimize_for_cpu(model, quantize=mode != "fp32", threads=threads)
+    load_s = time.perf_counter() - start
+    cache = ConditioningCache(SpeakerStore(out_dir))
+    settings = VoiceSettings("en-us", "neutral", 1.0, 0.5, 44000, 0.7, None)
+    compile_step = mode == "int8-compile"
+    start = time.perf_counter()
+    synthesize(model, cache, "Warm up.", settings, compile=compile_step)   # compiles, fills caches
+    warmup_s = time.perf_counter() - start
+    for name, text in BENCH_TEXTS.items():
+        torch.manual_seed(0)
+        start = time.perf_counter()
+        wav, sampling_rate = synthesize(model, cache, text, settings, compile=compile_step)
+        synth_s = time.perf_counter() - start
+        torch.save((wav, sampling_rate), os.path.join(out_dir, f"{mode}-{name}.pt"))
+        audio_s = wav.shape[-1] / sampling_rate
+        print(json.dumps({"mode": mode, "text": name, "synth_s": synth_s, "audio_s": audio_s,
+                          "rtf": synth_s / audio_s, "load_s": load_s, "warmup_s": warmup_s,
+                          "peak_rss_mib": (_peak_rss_kib() - baseline) / 1024}), flush=True)
+
+
+def spectral_distance_db(a, b, n_fft=2048):
+    """RMS difference (dB) of two clips' time-averaged log spectra; sampled audio never matches
+    sample for sample, but a dulled, noisy or band-limited voice shows up here."""
+    spectra = []
+    for wav in (a, b):
+        window = torch.hann_window(n_fft)
+        magnitude = torch.stft(wav.mean(0), n_fft, window=window, return_complex=True).abs()
+        spectra.append(20 * torch.log10(magnitude.mean(-1) + 1e-6))
+    return float((spectra[0] - spectra[1]).pow(2).mean().sqrt())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zonos CPU modes: real-time factor, peak memory, audio vs fp32.")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--model", default="Zyphra/Zonos-v0.1-transformer")
+    parser.add_argument("--threads", type=int, default=ZONOS_CPU_THREADS)
+    parser.add_argument("--modes", default=",".join(BENCH_MODES))
+    parser.add_argument("--mode", choices=BENCH_MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        _run_mode(args.mode, args.model, args.out, args.threads)
+        return
+    with tempfile.TemporaryDirectory() as out_dir:
+        rows = []
+        for mode in args.modes.split(","):
+            result = subprocess.run([sys.executable, __file__, "bench", "--model", args.model, "--threads",
+                                     str(args.threads), "--mode", mode, "--out", out_dir],
+                                    check=True, capture_output=True, text=True)
+            rows += [json.loads(line) for line in result.stdout.splitlines() if line.startswith("{")]
+        print(f"{'mode':13s} {'text':7s} {'audio':>7s} {'RTF':>6s} {'peak RSS':>9s} {'vs fp32':>9s} {'length':>7s}")
+        for row in rows:
+            difference = length = ""
+            baseline = os.path.join(out_dir, f"fp32-{row['text']}.pt")
+            if row["mode"] != "fp32" and os.path.exists(baseline):
+                wav, _ = torch.load(os.path.join(out_dir, f"{row['mode']}-{row['text']}.pt"))
+                reference, _ = torch.load(baseline)
+                difference = f"{spectral_distance_db(wav, reference):.1f} dB"
+                length = f"{wav.shape[-1] / reference.shape[-1]:.2f}x"
+            print(f"{row['mode']:13s} {row['text']:7s} {row['audio_s']:6.1f}s {row['rtf']:6.2f} "
+                  f"{row['peak_rss_mib']:7.0f} MiB {difference:>9s} {length:>7s}")
+        for mode in dict.fromkeys(row["mode"] for row in rows):
+            first = next(row for row in rows if row["mode"] == mode)
+            print(f"{mode}: load {first['load_s']:.1f} s, first synthesis (incl. compile) {first['warmup_s']:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
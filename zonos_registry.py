@@ -0,0 +1,169 @@
+"""Process-wide registry of Zonos TTS models.
+
+Streamlit re-executes the script on every interaction, so a model loaded at the top of the
+script was reloaded (several GB) on every slider move. Models are loaded here lazily, on first
+TTS use, once per process, on the best available device: CUDA, else Apple MPS, else the CPU.
+The hybrid model needs the mamba-ssm CUDA kernels, so off CUDA the transformer variant is
+used, and a failed GPU load falls back to the CPU. Models idle for ZONOS_IDLE_S, or the least
+recently used ones once the loaded models exceed ZONOS_MEMORY_BUDGET_MB, are unloaded; a
+background sweep does this even when no session asks for a model. A load runs outside the
+registry lock, so other sessions (and stats()) are not held up by it.
+"""
+
+import gc
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+
+from zonos_cpu import optimize_for_cpu
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+ZONOS_HYBRID = "Zyphra/Zonos-v0.1-hybrid"
+ZONOS_TRANSFORMER = "Zyphra/Zonos-v0.1-transformer"
+ZONOS_MODEL_ID = os.environ.get("ZONOS_MODEL_ID")   # None: chosen per device
+ZONOS_MEMORY_BUDGET_MB = int(os.environ.get("ZONOS_MEMORY_BUDGET_MB", "12000"))
+ZONOS_IDLE_S = 900
+ZONOS_SWEEP_S = 60   # how often idle models are looked for
+
+
+def pick_device():
+    """The best available torch device name."""
+    if torch.cuda.is_available():
+        return "cuda"
+    if getattr(torch.backends, "mps", None) is not None and torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def default_model_id(device):
+    """The hybrid model on CUDA (its mamba kernels need it), the transformer model elsewhere."""
+    return ZONOS_HYBRID if device == "cuda" else ZONOS_TRANSFORMER
+
+
+def model_size_mb(model):
+    """Memory held by the model's parameters and buffers."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors) / 2**20
+
+
+def load_zonos(model_id, device):
+    """Loads a Zonos model for inference (int8 CPU mode on the CPU, see zonos_cpu)."""
+    from zonos.model import Zonos
+
+    model = Zonos.from_pretrained(model_id, device=device)
+    if device == "cpu":
+        return optimize_for_cpu(model)
+    return model.eval()
+
+
+class ModelRegistry:
+    """Lazily loaded models keyed by (model id, device), unloaded when idle or over budget."""
+
+    def __init__(self, memory_budget_mb=ZONOS_MEMORY_BUDGET_MB, idle_s=ZONOS_IDLE_S, loader=load_zonos,
+                 sweep_s=ZONOS_SWEEP_S):
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_s = idle_s
+        self._loader = loader
+        self._entries = {}   # (model id, device) -> dict(model, size_mb, load_s, last_used, uses)
+        self._loading = {}   # (model id, device) -> Future resolved when its load finishes
+        self._fallbacks = {}  # keys that failed to load -> the CPU key used instead
+        self._lock = threading.Lock()
+        if sweep_s:
+            threading.Thread(target=self._sweep, args=(sweep_s,), daemon=True).start()
+
+    def get(self, model_id=None, device=None):
+        """Returns the model, loading it on first use; device None picks the best one available.
+
+        Concurrent callers of a model that is loading wait for that one load.
+        """
+        device = device or pick_device()
+        model_id = model_id or ZONOS_MODEL_ID or default_model_id(device)
+        while True:
+            with self._lock:
+                self._unload(self._idle_keys())
+                key = self._fallbacks.get((model_id, device), (model_id, device))
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry["last_used"] = time.monotonic()
+                    entry["uses"] += 1
+                    return entry["model"]
+                loading = self._loading.get(key)
+                owner = loading is None
+                if owner:
+                    loading = self._loading[key] = Future()
+            if not owner:
+                loading.result()   # re-raises the load's error
+                continue
+            try:
+                self._load(*key)
+                loading.set_result(key)
+            except BaseException as e:
+                loading.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    del self._loading[key]
+
+    def _load(self, model_id, device):
+        """Loads a model (without holding the lock) and adds it, or records the CPU fallback."""
+        start = time.perf_counter()
+        try:
+            model = self._loader(model_id, device)
+        except (RuntimeError, ImportError, OSError) as e:
+            if device == "cpu":
+                raise
+            logger.warning("Loading %s on %s failed (%s); falling back to the CPU", model_id, device, e)
+            with self._lock:
+                self._fallbacks[(model_id, device)] = (ZONOS_MODEL_ID or default_model_id("cpu"), "cpu")
+            return
+        key = (model_id, device)
+        entry = {"model": model, "size_mb": model_size_mb(model), "uses": 0,
+                 "load_s": time.perf_counter() - start, "last_used": time.monotonic()}
+        logger.info("Loaded %s on %s in %.1f s", model_id, device, entry["load_s"])
+        with self._lock:
+            self._entries[key] = entry
+            self._fit_budget(keep=key)
+
+    def _sweep(self, interval_s):
+        while True:
+            time.sleep(interval_s)
+            self.unload_idle()
+
+    def _idle_keys(self):
+        now = time.monotonic()
+        return [key for key, entry in self._entries.items() if now - entry["last_used"] > self.idle_s]
+
+    def _fit_budget(self, keep):
+        """Unloads the least recently used other models until the loaded ones fit the budget."""
+        others = sorted((key for key in self._entries if key != keep), key=lambda k: self._entries[k]["last_used"])
+        while others and sum(e["size_mb"] for e in self._entries.values()) > self.memory_budget_mb:
+            self._unload([others.pop(0)])
+
+    def _unload(self, keys):
+        for key in keys:
+            logger.info("Unloading %s on %s", *key)
+            del self._entries[key]
+        if keys:
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def unload_idle(self):
+        """Unloads models idle for longer than idle_s (get() also does this)."""
+        with self._lock:
+            self._unload(self._idle_keys())
+
+    def stats(self):
+        """Per loaded model: model_id, device, size_mb, load_s, idle_s and uses (unloads idle models first)."""
+        now = time.monotonic()
+        with self._lock:
+            self._unload(self._idle_keys())
+            return [{"model_id": model_id, "device": device, "size_mb": entry["size_mb"], "load_s": entry["load_s"],
+                     "idle_s": now - entry["last_used"], "uses": entry["uses"]}
+                    for (model_id, device), entry in self._entries.items()]
@@ -0,0 +1,174 @@
+"""Speaker profiles and cached conditioning for Zonos TTS.
+
+The old text_to_speech built a random dummy clip and ran make_speaker_embedding on every
+call (a different voice every time), then ran every conditioner from scratch. Here a speaker
+embedding is computed once per reference clip and persisted to SPEAKER_DIR; without a clip the
+model's learned unconditional speaker is used, which is deterministic. The outputs of all
+non-text conditioners (speaker, emotion, speed, pitch, max frequency, quality, language id) are
+cached per VoiceSettings, so a synthesis only runs the phoneme (text) conditioner. The prefix
+builder takes several texts at once, which the batching service uses.
+"""
+
+import collections
+import hashlib
+import io
+import os
+import threading
+import weakref
+
+import torch
+import torchaudio
+from zonos.conditioning import make_cond_dict
+
+from zonos_cpu import use_compile
+
+# --- Constants ---
+SPEAKER_DIR = os.environ.get("SPEAKER_DIR", os.path.join(".cache", "speakers"))
+SPEAKER_VERSION = "v0.1"        # part of every embedding's file name: change with the embedding model
+CONDITIONING_CACHE_SIZE = 64    # settings tuples kept per model
+TEXT_CONDITIONER = "espeak"
+BASE_SPEAKING_RATE = 15.0       # phonemes per second at speed 1.0 (Zonos default)
+BASE_PITCH_STD = 40.0           # pitch_std at pitch variation 1.0 (0.5 gives the Zonos default, 20)
+# Emotion weights in Zonos order: happiness, sadness, disgust, fear, surprise, anger, other, neutral.
+EMOTIONS = {
+    "neutral": [0.3077, 0.0256, 0.0256, 0.0256, 0.0256, 0.0256, 0.2564, 0.3077],
+    "happy": [0.6, 0.02, 0.02, 0.02, 0.1, 0.02, 0.1, 0.12],
+    "sad": [0.02, 0.6, 0.02, 0.05, 0.02, 0.02, 0.1, 0.17],
+    "angry": [0.02, 0.05, 0.1, 0.02, 0.02, 0.6, 0.07, 0.12],
+    "fearful": [0.02, 0.1, 0.02, 0.6, 0.1, 0.02, 0.07, 0.07],
+}
+
+VoiceSettings = collections.namedtuple(
+    "VoiceSettings", "language emotion speed pitch_variation max_frequency audio_quality speaker")
+VoiceSettings.__doc__ = "The app's TTS settings; speaker is a SpeakerStore key or None for the default voice."
+
+
+class SpeakerStore:
+    """Speaker embeddings computed once per reference clip, persisted to disk and kept in memory."""
+
+    def __init__(self, directory=SPEAKER_DIR):
+        self.directory = directory
+        self._embeddings = {}
+        self._lock = threading.Lock()
+
+    def add(self, model, clip_bytes):
+        """Returns the key for a reference clip, computing and saving its embedding the first time."""
+        key = f"{SPEAKER_VERSION}-{hashlib.sha1(clip_bytes).hexdigest()}"
+        with self._lock:
+            if key in self._embeddings or os.path.exists(self._path(key)):
+                return key
+        wav, sampling_rate = torchaudio.load(io.BytesIO(clip_bytes))
+        with torch.inference_mode():
+            embedding = model.make_speaker_embedding(wav, sampling_rate)
+        os.makedirs(self.directory, exist_ok=True)
+        torch.save(embedding.cpu(), self._path(key) + ".tmp")
+        os.replace(self._path(key) + ".tmp", self._path(key))
+        with self._lock:
+            self._embeddings[key] = embedding
+        return key
+
+    def get(self, key, device, dtype=None):
+        """The embedding for a key from add() (None for the default voice), in the model's dtype."""
+        if key is None:
+            return None
+        with self._lock:
+            if key not in self._embeddings:
+                self._embeddings[key] = torch.load(self._path(key), map_location=device)
+            # Embeddings come out in bf16; a CPU (fp32) model needs them converted.
+            return self._embeddings[key].to(device, dtype)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pt")
+
+
+def cond_dict(settings, speaker, text="", device="cpu"):
+    """Maps the app's settings onto a Zonos conditioning dict."""
+    unconditional_keys = {"dnsmos_ovrl"} | ({"speaker"} if speaker is None else set())
+    return make_cond_dict(
+        text=text,
+        language=settings.language,
+        speaker=speaker,
+        emotion=EMOTIONS.get(settings.emotion, EMOTIONS["neutral"]),
+        fmax=min(settings.max_frequency / 2, 24000.0),
+        pitch_std=BASE_PITCH_STD * settings.pitch_variation,
+        speaking_rate=BASE_SPEAKING_RATE * settings.speed,
+        vqscore_8=[0.6 + 0.25 * settings.audio_quality] * 8,
+        unconditional_keys=unconditional_keys,
+        device=device,
+    )
+
+
+class ConditioningCache:
+    """Per model, the non-text conditioner outputs of recently used VoiceSettings."""
+
+    def __init__(self, speakers, max_entries=CONDITIONING_CACHE_SIZE):
+        self.speakers = speakers
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._per_model = weakref.WeakKeyDictionary()   # unloaded models drop their entries
+        self._lock = threading.Lock()
+
+    def _parts(self, model, settings):
+        """{conditioner name: (conditional output, unconditional output)} for the non-text conditioners."""
+        with self._lock:
+            cache = self._per_model.setdefault(model, collections.OrderedDict())
+            if settings in cache:
+                cache.move_to_end(settings)
+                self.hits += 1
+                return cache[settings]
+            self.misses += 1
+        prefix_conditioner = model.prefix_conditioner
+        dtype = next(prefix_conditioner.parameters()).dtype
+        values = cond_dict(settings, self.speakers.get(settings.speaker, model.device, dtype), device=model.device)
+        parts = {}
+        for conditioner in prefix_conditioner.conditioners:
+            if conditioner.name == TEXT_CONDITIONER:
+                continue
+            value = values.get(conditioner.name)
+            # prepare_conditioning's unconditional pass only keeps the required keys.
+            parts[conditioner.name] = (conditioner(value),
+                                       conditioner(value if conditioner.name in prefix_conditioner.required_keys else None))
+        with self._lock:
+            cache[settings] = parts
+            while len(cache) > self.max_entries:
+                cache.popitem(last=False)
+        return parts
+
+    @torch.inference_mode()
+    def prefix_conditioning(self, model, requests):
+        """The prefix for model.generate(batch_size=len(requests)) from [(text, VoiceSettings)].
+
+        Equivalent to prepare_conditioning(make_cond_dict(...)) per request, with the requests'
+        phonemes left-padded to one length the way Zonos batches texts.
+        """
+        prefix_conditioner = model.prefix_conditioner
+        parts = [self._parts(model, settings) for _, settings in requests]
+        batch = len(requests)
+        conditional, unconditional = [], []
+        for conditioner in prefix_conditioner.conditioners:
+            if conditioner.name == TEXT_CONDITIONER:
+                text = conditioner(([text for text, _ in requests], [settings.language for _, settings in requests]))
+                conditional.append(text)
+                required = conditioner.name in prefix_conditioner.required_keys
+                unconditional.append(text if required else conditioner(None).expand(batch, -1, -1))
+            else:
+                conditional.append(torch.cat([part[conditioner.name][0] for part in parts]).expand(batch, -1, -1))
+                unconditional.append(torch.cat([part[conditioner.name][1] for part in parts]).expand(batch, -1, -1))
+
+        def finish(outputs):
+            return prefix_conditioner.norm(prefix_conditioner.project(torch.cat(outputs, dim=-2)))
+
+        return torch.cat([finish(conditional), finish(unconditional)])
+
+
+def synthesize(model, cache, text, settings, compile=None):
+    """Returns (waveform tensor (channels, samples) on the CPU, sampling rate) for one text.
+
+    compile overrides whether the decode step is torch.compiled (see zonos_cpu.use_compile).
+    """
+    compile = use_compile(model) if compile is None else compile
+    with torch.inference_mode():
+        prefix = cache.prefix_conditioning(model, [(text, settings)])
+        codes = model.generate(prefix, progress_bar=False, disable_torch_compile=not compile)
+        return model.autoencoder.decode(codes).cpu()[0], model.autoencoder.sampling_rate